@@ -0,0 +1,66 @@
+"""Model-build benchmark for solve_instance.
+
+Times `allowed_arcs` and `build_model` on random 1k- and 5k-village
+instances with a fixed number of allowed arcs per village, and fails if
+the build time per arc grows by more than `--max-ratio` between sizes,
+i.e. if construction stops scaling linearly with the number of arcs.
+
+    python benchmarks/bench_model_build.py --sizes 1000 5000 --degree 20
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from game_assistant.optimal import allowed_arcs, build_model
+
+def random_arcs(n: int, degree: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    tail = np.repeat(np.arange(n), degree)
+    head = (tail + rng.integers(1, n, size=len(tail))) % n
+    return tail, head
+
+def bench(n: int, degree: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    production = rng.integers(-50, 60, size=n).tolist()
+    tail, head = random_arcs(n, degree, rng)
+
+    start = time.perf_counter()
+    problem, x = build_model(production, tail, head)
+    build = time.perf_counter() - start
+
+    names = [f"V{i}" for i in range(n)]
+    start = time.perf_counter()
+    arcs, _ = allowed_arcs(names, set())
+    enumerate_all = time.perf_counter() - start
+
+    return {
+        "villages": n,
+        "arcs": len(x),
+        "constraints": len(problem.constraints),
+        "build_s": build,
+        "build_us_per_arc": build / len(x) * 1e6,
+        "allowed_arcs_all_pairs_s": enumerate_all,
+        "all_pairs": len(arcs),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--degree', type=int, default=20, help='Allowed arcs per village.')
+    parser.add_argument('--max-ratio', type=float, default=2.0, help='Allowed growth of per-arc build time.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = [bench(n, args.degree, args.seed) for n in args.sizes]
+    for r in results:
+        print(f"n={r['villages']:>6} arcs={r['arcs']:>8} constraints={r['constraints']:>6} "
+              f"build={r['build_s']:.3f}s ({r['build_us_per_arc']:.1f} us/arc) "
+              f"all-pairs arcs={r['all_pairs']} in {r['allowed_arcs_all_pairs_s']:.3f}s")
+
+    ratio = results[-1]['build_us_per_arc'] / results[0]['build_us_per_arc']
+    print(f"per-arc build time ratio {args.sizes[-1]}/{args.sizes[0]}: {ratio:.2f}")
+    return 0 if ratio <= args.max_ratio else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
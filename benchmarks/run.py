@@ -0,0 +1,285 @@
+"""End-to-end benchmark suite.
+
+Times each stage separately on generated instances: loading the JSON, NDJSON
+and snapshot files, building the routes matrix, presolving the arcs, building
+the PuLP model over the presolved arcs, solving with each backend (over all
+arcs, and over k-nearest candidate arcs with the distance objective on PuLP),
+solving every resource of a multi-resource
+instance with one `solve_resources` call against one `solve_instance` per
+resource, rendering `/`, a sorted `/api/villages` page, a `/api/routes/tile` tile and
+`/solution.json`, posting every route as one `/api/batch`, and importing the
+app in a fresh interpreter (once, at the smallest size). Results are
+written as JSON; with `--baseline` the run fails when a stage is slower than
+the stored baseline by more than `--threshold`, or when its time grows faster
+with the instance size than in the baseline by more than `--slope-tolerance`.
+
+Timings are compared relative to a fixed calibration workload, timed again
+before each size so it follows the machine's load through the run. A baseline
+recorded on one machine can thus be checked on another, and the scaling slopes
+(log time over log size) do not depend on the machine at all.
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.5
+    python benchmarks/run.py --sizes 10 100 --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from game_assistant.app import app
+from game_assistant.generate import generate_instance
+from game_assistant.models import Instance, Village
+from game_assistant.optimal import (allowed_arcs, build_model, candidate_arcs, presolve, solve_arcs, solve_instance,
+                                    solve_resources)
+from game_assistant.spatial import SpatialIndex
+from game_assistant.storage import load_ndjson, load_snapshot, save_ndjson, save_snapshot
+
+# Largest instance each stage runs on by default; bigger sizes are skipped.
+MAX_SIZES = {
+    "load_instance": None,
+    "load_ndjson": None,
+    "load_snapshot": None,
+    "routes_matrix": None,
+    "presolve": 2000,
+    "model_build": 500,
+    "solve_pulp": 200,
+    "solve_mincostflow": 2000,
+    "candidate_arcs": None,
+    "solve_knn_distance": 1000,
+    "solve_resources": 2000,
+    "solve_resources_separate": 2000,
+    "render_index": None,
+    "render_api_villages": None,
+    "render_api_tile": None,
+    "render_solution_json": 2000,
+    "api_batch": None,
+    "import_app": 10,
+}
+
+def calibration_workload() -> None:
+    """Fixed mix of NumPy sorting and Python dict and list work, like the stages do."""
+    values = np.random.default_rng(0).integers(0, 1 << 30, size=200_000)
+    np.sort(values)
+    index = {value: i for i, value in enumerate(values[:100_000].tolist())}
+    sorted(index, key=index.get)
+
+def best_of(repeat: int, fn) -> float:
+    times = []
+    for _ in range(repeat):
+        # Garbage left by the previous stage would otherwise be collected on this one's time.
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run_size(n: int, args: argparse.Namespace, max_sizes: dict) -> list[dict]:
+    instance, forbidden = generate_instance(n, route_density=min(args.routes_per_village / max(n - 1, 1), 1.0),
+                                            forbidden_density=args.forbidden_density, seed=args.seed,
+                                            map_size=args.map_size)
+    # The same villages with a production per resource, and one single-resource instance per resource.
+    multi, _ = generate_instance(n, forbidden_density=args.forbidden_density, seed=args.seed, map_size=args.map_size,
+                                 resources=tuple(args.resources))
+    single = [Instance(villages=[Village(name=village.name, production=village.resources.get(resource, 0),
+                                         coordinates=village.coordinates) for village in multi.villages])
+              for resource in args.resources]
+    names = [village.name for village in instance.villages]
+    production = [village.production for village in instance.villages]
+    solution = {village.name: dict(village.routes) for village in instance.villages}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "instance.json")
+        Instance.save_instance_to_file(instance, path)
+        save_ndjson(instance, os.path.join(tmp, "instance.ndjson"))
+        save_snapshot(instance, os.path.join(tmp, "instance.snap"))
+        client = app.test_client()
+
+        def render(url: str):
+            app.config['INSTANCE'] = instance
+            app.config['OPTIMAL_ROUTES'] = solution
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+
+        def presolved_arcs():
+            tail, head = allowed_arcs(names, forbidden)
+            kept, _ = presolve(names, production, tail, head)
+            return tail[kept], head[kept]
+
+        # Rewrites every route with its own amount, so repeats do the same work.
+        batch = [{"op": "update_route", "from_village": source, "to_village": target, "amount": amount}
+                 for source, routes in solution.items() for target, amount in routes.items()]
+
+        def post_batch():
+            app.config['INSTANCE'] = instance
+            response = client.post('/api/batch', json=batch)
+            assert response.status_code == 200, response.get_json()
+
+        # Compile the templates before timing anything.
+        render('/')
+        calibration = best_of(5, calibration_workload)
+        print(f"{n:>6} {'calibration':<24} {calibration * 1000:10.2f} ms", file=sys.stderr)
+        stages = {
+            "load_instance": lambda: Instance.load_instance_from_file(path),
+            "load_ndjson": lambda: load_ndjson(os.path.join(tmp, "instance.ndjson")),
+            "load_snapshot": lambda: load_snapshot(os.path.join(tmp, "instance.snap")),
+            "routes_matrix": instance._calculate_routes_matrix,
+            "presolve": lambda: presolve(names, production, *allowed_arcs(names, forbidden)),
+            "model_build": lambda: build_model(production, *presolved_arcs()),
+            "solve_pulp": lambda: solve_arcs(names, production, *allowed_arcs(names, forbidden), backend='pulp'),
+            "solve_mincostflow": lambda: solve_arcs(names, production, *allowed_arcs(names, forbidden), backend='mincostflow'),
+            "candidate_arcs": lambda: candidate_arcs(names, SpatialIndex(instance.coordinates), forbidden, args.neighbours),
+            "solve_knn_distance": lambda: solve_instance(instance, forbidden, backend='pulp', objective='distance',
+                                                         neighbours=args.neighbours),
+            "solve_resources": lambda: solve_resources(multi, forbidden_routes=forbidden, backend='mincostflow'),
+            "solve_resources_separate": lambda: [solve_instance(one, forbidden, backend='mincostflow') for one in single],
+            "render_index": lambda: render('/'),
+            "render_api_villages": lambda: render(f'/api/villages?sort=name&offset={n // 2}'),
+            "render_api_tile": lambda: render(f'/api/routes/tile?row={n // 2}&col={n // 2}&size=256'),
+            "render_solution_json": lambda: render('/solution.json'),
+            "api_batch": post_batch,
+            "import_app": lambda: subprocess.run([sys.executable, '-c', 'import game_assistant.app'], check=True),
+        }
+
+        results = []
+        for stage, fn in stages.items():
+            if args.stages and stage not in args.stages:
+                continue
+            limit = max_sizes.get(stage)
+            if limit is not None and n > limit:
+                results.append({"size": n, "stage": stage, "seconds": None, "skipped": True})
+                continue
+            try:
+                seconds = best_of(args.repeat, fn)
+                results.append({"size": n, "stage": stage, "seconds": seconds, "skipped": False,
+                                "calibration_seconds": calibration})
+            except ValueError as e:
+                results.append({"size": n, "stage": stage, "seconds": None, "skipped": True, "error": str(e)})
+            print(f"{n:>6} {stage:<24} {format_seconds(results[-1])}", file=sys.stderr)
+    return results
+
+def format_seconds(result: dict) -> str:
+    if result["seconds"] is None:
+        return result.get("error", "skipped")
+    return f"{result['seconds'] * 1000:10.2f} ms"
+
+def slope(n0: int, t0: float, n1: int, t1: float) -> float:
+    return float(np.log(t1 / t0) / np.log(n1 / n0))
+
+def calibrated(result: dict) -> float:
+    """A stage's time in units of the calibration workload timed at its size, when there is one."""
+    return result["seconds"] / result.get("calibration_seconds", 1.0)
+
+def scaling_slopes(results: list[dict], min_seconds: float) -> dict[str, tuple[int, int, float]]:
+    """Per stage, its two largest sizes timed above `min_seconds` and the slope of log time over log size between them."""
+    timings: dict[str, list[tuple[int, float]]] = {}
+    for r in results:
+        if r["seconds"] is not None and r["seconds"] >= min_seconds:
+            timings.setdefault(r["stage"], []).append((r["size"], calibrated(r)))
+    slopes = {}
+    for stage, points in timings.items():
+        if len(points) >= 2:
+            (n0, t0), (n1, t1) = sorted(points)[-2:]
+            slopes[stage] = (n0, n1, slope(n0, t0, n1, t1))
+    return slopes
+
+def compare(report: dict, baseline: dict, threshold: float, min_seconds: float, slope_tolerance: float) -> list[str]:
+    """Regressions of `report` against `baseline`, both as written by this script.
+
+    A baseline time is first scaled by the ratio of the calibration times at its
+    size; a baseline without them is taken as recorded on this machine. Slopes
+    are compared between the same two sizes in both runs.
+    """
+    reference = {(r["size"], r["stage"]): r for r in baseline["results"] if r["seconds"] is not None}
+    regressions = []
+    for result in report["results"]:
+        before = reference.get((result["size"], result["stage"]))
+        after = result["seconds"]
+        if before is None or after is None or after < min_seconds:
+            continue
+        calibration = before.get("calibration_seconds")
+        expected = before["seconds"] * (result["calibration_seconds"] / calibration if calibration else 1.0)
+        if after > expected * (1 + threshold):
+            regressions.append(f"{result['stage']} at {result['size']} villages: "
+                               f"{expected * 1000:.2f} ms expected -> {after * 1000:.2f} ms (+{(after / expected - 1) * 100:.0f}%)")
+    for stage, (n0, n1, after) in scaling_slopes(report["results"], min_seconds).items():
+        t0, t1 = (calibrated(reference[n, stage]) if (n, stage) in reference else None for n in (n0, n1))
+        if t0 and t1 and after > slope(n0, t0, n1, t1) + slope_tolerance:
+            regressions.append(f"{stage} from {n0} to {n1} villages: scales as size^{after:.2f}, "
+                               f"was size^{slope(n0, t0, n1, t1):.2f}")
+    return regressions
+
+def parse_max_sizes(values: list[str]) -> dict:
+    max_sizes = dict(MAX_SIZES)
+    for value in values:
+        stage, _, size = value.partition('=')
+        if stage not in MAX_SIZES:
+            raise SystemExit(f"Unknown stage '{stage}', expected one of {sorted(MAX_SIZES)}.")
+        max_sizes[stage] = None if size in ('', 'none') else int(size)
+    return max_sizes
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--stages', type=str, nargs='+', default=None, choices=sorted(MAX_SIZES))
+    parser.add_argument('--max-size', type=str, nargs='*', default=[], metavar='STAGE=N',
+                        help='Override the largest size a stage runs on ("none" for no limit).')
+    parser.add_argument('--routes-per-village', type=float, default=3.0)
+    parser.add_argument('--forbidden-density', type=float, default=0.01)
+    parser.add_argument('--map-size', type=int, default=200, help='Villages get coordinates in [-N, N].')
+    parser.add_argument('--neighbours', type=int, default=8, help='Candidate arcs per village for the spatial stages.')
+    parser.add_argument('--resources', type=str, nargs='+', default=['wood', 'clay', 'iron'],
+                        help='Resources of the instance for the solve_resources stages.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare against this results file.')
+    parser.add_argument('--save-baseline', type=str, default=None, help='Write results to this baseline file.')
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='Allowed relative slowdown per stage, after scaling by the calibration times.')
+    parser.add_argument('--slope-tolerance', type=float, default=0.5,
+                        help='Allowed increase of a stage\'s scaling slope (log time over log size).')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='Ignore stages faster than this.')
+    args = parser.parse_args()
+    max_sizes = parse_max_sizes(args.max_size)
+
+    warnings.simplefilter('ignore')
+    results = []
+    for n in args.sizes:
+        results.extend(run_size(n, args, max_sizes))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'save_baseline')},
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold, args.min_seconds, args.slope_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+import itertools
+import threading
+
+import numpy as np
+
+from game_assistant.models import Instance
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_TILE_SIZE = 256
+SORT_KEYS = ('id', 'name', 'production')
+
+class _VersionCache:
+    """Values computed from recent instance versions, such as sorted village orders, so paging through them is linear overall."""
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple, tuple[Instance, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, instance: Instance, key: str, compute: Callable[[Instance], Any]) -> Any:
+        cache_key = (id(instance), instance.version, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] is instance:
+                self._entries.move_to_end(cache_key)
+                return entry[1]
+        value = compute(instance)
+        with self._lock:
+            self._entries[cache_key] = (instance, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+_CACHE = _VersionCache()
+
+_ORDERS = {
+    'name': lambda instance: np.argsort(np.array(_names(instance)), kind='stable'),
+    'production': lambda instance: np.argsort(instance.production, kind='stable'),
+}
+
+def _names(instance: Instance) -> list[str]:
+    # After removals `instance.names` is a new list, so it is kept for the version.
+    return _CACHE.get(instance, 'names', lambda instance: instance.names)
+
+def village_order(instance: Instance, sort: str = 'id') -> np.ndarray:
+    """Village ids in the requested order: a key of SORT_KEYS, prefixed with '-' for descending."""
+    key = sort[1:] if sort.startswith('-') else sort
+    if key not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}', expected one of {list(SORT_KEYS)}, optionally prefixed with '-'.")
+    order = np.arange(len(_names(instance))) if key == 'id' else _CACHE.get(instance, key, _ORDERS[key])
+    return order[::-1] if sort.startswith('-') else order
+
+def village_page(instance: Instance, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE, sort: str = 'id') -> dict:
+    """One page of villages with their outgoing and incoming routes.
+
+    Villages are looked up by name, so the cost is proportional to the page and
+    its routes. Only the village order (a sort, or the names list after removals)
+    is computed over the whole instance, once per instance version.
+    """
+    _check_page(offset, limit)
+    order = village_order(instance, sort)
+    names = _names(instance)
+    page = []
+    for i in order[offset:offset + limit].tolist():
+        village = instance.get_village(names[i])
+        page.append({
+            "id": i,
+            "name": village.name,
+            "production": village.production,
+            "coordinates": list(village.coordinates) if village.coordinates is not None else None,
+            "routes": [[target, amount] for target, amount in village.route_items()],
+            "incoming": [[source, amount] for source, amount in instance.incoming_routes(village.name).items()],
+        })
+    return {"total": len(names), "offset": offset, "limit": limit, "sort": sort, "villages": page}
+
+def solution_page(solution: dict[str, dict[str, int]], offset: int = 0, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """One page of a solution's sending villages with their routes, in solution order.
+
+    Skips to `offset` without copying the solution, so the cost is proportional to `offset + limit`.
+    """
+    _check_page(offset, limit)
+    page = [{"name": source, "routes": [[target, amount] for target, amount in routes.items()]}
+            for source, routes in itertools.islice(solution.items(), offset, offset + limit)]
+    return {"total": len(solution), "offset": offset, "limit": limit, "routes": page}
+
+def _check_page(offset: int, limit: int) -> None:
+    if offset < 0:
+        raise ValueError(f"Offset must be non-negative, got {offset}.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"Limit must be between 1 and {MAX_PAGE_SIZE}, got {limit}.")
+
+def routes_tile(instance: Instance, row: int = 0, col: int = 0, size: int = 64) -> dict:
+    """Non-zero routes matrix entries in `[row, row + size) x [col, col + size)`, as `[i, j, amount]`."""
+    if row < 0 or col < 0:
+        raise ValueError(f"Tile origin must be non-negative, got ({row}, {col}).")
+    if not 1 <= size <= MAX_TILE_SIZE:
+        raise ValueError(f"Tile size must be between 1 and {MAX_TILE_SIZE}, got {size}.")
+    names = instance.names
+    matrix = instance.routes_matrix
+    n = len(names)
+    rows, cols = range(row, min(row + size, n)), range(col, min(col + size, n))
+    entries = [[i, j, amount] for i in rows for j, amount in matrix.row(i).items() if col <= j < col + size]
+    return {
+        "total": n, "row": row, "col": col, "size": size,
+        "row_names": [names[i] for i in rows],
+        "col_names": [names[j] for j in cols],
+        "entries": sorted(entries),
+    }
+
+def parse_int(value: Optional[str], default: int, what: str) -> int:
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{what} must be an integer, got '{value}'.") from None
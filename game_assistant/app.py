@@ -1,39 +1,216 @@
-from flask import Flask, render_template, redirect, url_for, flash, current_app, jsonify, request
+from flask import Flask, render_template, redirect, url_for, flash, current_app, jsonify, request, g, session, Response
 import argparse
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from typing import Optional
 
+from game_assistant.api import DEFAULT_PAGE_SIZE, parse_int, routes_tile, solution_page, village_page
+from game_assistant.cache import PayloadCache, SolutionCache, VersionedRoutes, solution_delta
+from game_assistant.jobs import FINISHED, JobManager, JobQueueFull, format_sse
+from game_assistant.journal import open_journal
+from game_assistant.metrics import REGISTRY, report_progress
 from game_assistant.models import Instance, Village
-from game_assistant.optimal import solve_instance
-from game_assistant.forms import VillageForm, RouteForm
-from game_assistant.paste import get_instance_from_input
+from game_assistant.paste import format_errors, parse_paste
+from game_assistant.startup import format_import_profile, import_profile, warm_up
+from game_assistant.state import ConflictError, open_store
+from game_assistant.storage import load_instance
+# The solver (game_assistant.optimal and PuLP) and the forms (WTForms) are imported
+# where they are used, so that starting the app and serving read pages does not load them.
 
 app = Flask(__name__)
 
 app.config['SECRET_KEY'] = 'keyofgod'  # Replace with a secure key in production
+app.config['SOLUTION_CACHE'] = SolutionCache()
+app.config['PAYLOAD_CACHE'] = PayloadCache()
+app.config['JOBS'] = JobManager()
+app.config['PROFILE_DIR'] = os.environ.get('GAME_ASSISTANT_PROFILE_DIR')
+# Shared state for running several worker processes, e.g. under gunicorn; None keeps it in this process.
+app.config['STATE_STORE'] = open_store(os.environ.get('GAME_ASSISTANT_STATE'))
+# Journal of every edit to the in-process instance, replayed on restart; for a single worker only.
+app.config['JOURNAL'] = None
+if os.environ.get('GAME_ASSISTANT_JOURNAL'):
+    app.config['JOURNAL'], app.config['INSTANCE'] = open_journal(
+        os.environ['GAME_ASSISTANT_JOURNAL'], lambda: load_instance(os.environ.get('GAME_ASSISTANT_INSTANCE', '')))
+    app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
+elif os.environ.get('GAME_ASSISTANT_INSTANCE'):
+    app.config['INSTANCE'] = load_instance(os.environ['GAME_ASSISTANT_INSTANCE'])
+    app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
+# Load and probe the solver on a job worker at startup rather than on the first solve.
+if os.environ.get('GAME_ASSISTANT_PREWARM'):
+    app.config['JOBS'].prewarm(warm_up, os.environ['GAME_ASSISTANT_PREWARM'])
+
+# Comment lines sent on idle event streams, so proxies keep them open.
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Serializes syncing and mutating the worker's copy of the state between its threads.
+_STATE_LOCK = threading.RLock()
+
+def _sync_state() -> None:
+    """Reload INSTANCE and OPTIMAL_ROUTES when the shared store moved past the version this worker holds.
+
+    An empty store is seeded with the worker's current state. Requests of a
+    worker whose copy is current cost one version lookup.
+    """
+    store = current_app.config.get('STATE_STORE')
+    if store is None:
+        return
+    with _STATE_LOCK:
+        version = store.version()
+        if version == 0:
+            try:
+                current_app.config['STATE_VERSION'] = store.commit(0, current_app.config.setdefault('INSTANCE', Instance()),
+                                                                   current_app.config.get('OPTIMAL_ROUTES') or {})
+                return
+            except ConflictError:
+                pass  # another worker seeded it first
+        if version != current_app.config.get('STATE_VERSION'):
+            version, instance, solution = store.load()
+            current_app.config['INSTANCE'] = instance
+            current_app.config['OPTIMAL_ROUTES'] = VersionedRoutes(solution)
+            current_app.config['STATE_VERSION'] = version
+
+def _state_marker() -> tuple:
+    instance = current_app.config.get('INSTANCE')
+    routes = current_app.config.get('OPTIMAL_ROUTES')
+    return id(instance), getattr(instance, 'version', None), id(routes), getattr(routes, 'version', None)
+
+def mutates_state(view):
+    """Commit the state a view changed to the shared store, on top of the version it started from.
+
+    If another worker committed in the meantime, the local changes are
+    dropped and ConflictError is raised, so nothing is silently overwritten.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        store = current_app.config.get('STATE_STORE')
+        if store is None:
+            response = view(*args, **kwargs)
+            journal = current_app.config.get('JOURNAL')
+            instance = current_app.config.get('INSTANCE')
+            if journal is not None and instance is not None and journal.instance is not instance:
+                journal.attach(instance)  # e.g. a pasted instance replaced the journaled one
+            return response
+        with _STATE_LOCK:
+            _sync_state()
+            before = _state_marker()
+            response = view(*args, **kwargs)
+            if _state_marker() != before:
+                try:
+                    current_app.config['STATE_VERSION'] = store.commit(
+                        current_app.config['STATE_VERSION'], current_app.config['INSTANCE'],
+                        current_app.config.get('OPTIMAL_ROUTES') or {})
+                except ConflictError:
+                    current_app.config['STATE_VERSION'] = None
+                    raise
+            return response
+    return wrapper
+
+@app.errorhandler(ConflictError)
+def state_conflict(e):
+    session.pop('_flashes', None)
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        return jsonify({"error": str(e)}), 409
+    flash(f"Your change was not saved: {e}", 'error')
+    return redirect(url_for('index'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    _sync_state()
+    if current_app.config.get('PROFILE_DIR') and request.args.get('profile') == '1':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_time(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{request.endpoint or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.prof")
+        profiler.dump_stats(path)
+        response.headers['X-Profile-Path'] = path
+    start = g.pop('request_start', None)
+    if start is not None:
+        REGISTRY.observe("game_assistant_request_seconds", time.perf_counter() - start, "Time spent handling HTTP requests.",
+                         endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    cache = current_app.config['SOLUTION_CACHE'].info()
+    REGISTRY.set("game_assistant_solution_cache_hits", cache["hits"], "Solution cache hits since start.")
+    REGISTRY.set("game_assistant_solution_cache_misses", cache["misses"], "Solution cache misses since start.")
+    REGISTRY.set("game_assistant_solution_cache_size", cache["size"], "Entries in the solution cache.")
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     instance = current_app.config['INSTANCE']
-    optimal_routes = current_app.config.get('OPTIMAL_ROUTES', {})
-    villages = instance.villages
-    villages_js = [
-        {
-            "name": v.name,
-            "production": v.production,
-            "routes": [{"target": target, "amount": amount} for target, amount in v.routes.items()] if v.routes else []
-        }
-        for v in villages
-    ]
-    list_transposed = instance.routes_matrix.transpose().tolist() if instance.routes_matrix is not None else []
+    # Villages, routes and the optimal routes are fetched page by page from
+    # /api/villages, /api/routes/tile and /api/solution.
     return render_template("index.html",
-                            villages=villages,
-                            villages_js=villages_js,
-                            list_transposed=list_transposed,
-                            mapping=instance.villages_map,
-                            optimal_routes=optimal_routes)
+                            village_count=len(instance.names),
+                            page_size=DEFAULT_PAGE_SIZE,
+                            has_solution=bool(current_app.config.get('OPTIMAL_ROUTES')))
+
+@app.route('/api/villages')
+def api_villages():
+    instance = current_app.config['INSTANCE']
+    try:
+        page = village_page(instance,
+                            offset=parse_int(request.args.get('offset'), 0, "Offset"),
+                            limit=parse_int(request.args.get('limit'), DEFAULT_PAGE_SIZE, "Limit"),
+                            sort=request.args.get('sort', 'id'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+@app.route('/api/solution')
+def api_solution():
+    try:
+        page = solution_page(current_app.config.get('OPTIMAL_ROUTES', {}),
+                             offset=parse_int(request.args.get('offset'), 0, "Offset"),
+                             limit=parse_int(request.args.get('limit'), DEFAULT_PAGE_SIZE, "Limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+@app.route('/api/routes/tile')
+def api_routes_tile():
+    instance = current_app.config['INSTANCE']
+    try:
+        tile = routes_tile(instance,
+                           row=parse_int(request.args.get('row'), 0, "Row"),
+                           col=parse_int(request.args.get('col'), 0, "Column"),
+                           size=parse_int(request.args.get('size'), 64, "Size"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(tile)
+
+@app.route('/api/batch', methods=['POST'])
+@mutates_state
+def api_batch():
+    data = request.get_json(silent=True)
+    ops = data.get("ops") if isinstance(data, dict) else data
+    if not isinstance(ops, list):
+        return jsonify({"error": "Expected a JSON list of ops, or an object with an 'ops' list."}), 400
+    try:
+        summary = current_app.config['INSTANCE'].apply_batch(ops)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary)
 
 
 @app.route('/add_village', methods=['GET','POST'])
+@mutates_state
 def add_village():
+    from game_assistant.forms import VillageForm
     instance = current_app.config['INSTANCE']
     form = VillageForm()
     if form.validate_on_submit():
@@ -50,21 +227,30 @@ def add_village():
     return render_template('add_village.html', form=form)
 
 @app.route('/edit_village/<string:name>', methods=['GET', 'POST'])
+@mutates_state
 def edit_village(name):
+    from game_assistant.forms import VillageForm
     instance = current_app.config['INSTANCE']
     village = instance.get_village(name)
     if not village:
         flash(f"Village '{name}' does not exist.", 'error')
     form = VillageForm(obj=village)
     if form.validate_on_submit():
-        village.name = form.name.data
-        village.production = form.production.data
-        flash(f"Village '{name}' updated successfully.", 'success')
+        try:
+            # Checked first, so a failing rename does not leave the production change applied.
+            if form.name.data != name and instance.get_village(form.name.data) is not None:
+                raise ValueError(f"Village '{form.name.data}' already exists.")
+            instance.update_village(name, form.production.data)
+            instance.rename_village(name, form.name.data)
+            flash(f"Village '{name}' updated successfully.", 'success')
+        except ValueError as e:
+            flash(str(e), 'error')
         return redirect(url_for('index'))
     current_app.config['INSTANCE'] = instance
     return render_template('edit_village.html', form=form, village=village)
 
 @app.route('/remove_village/<string:name>')
+@mutates_state
 def remove_village(name):
     instance = current_app.config['INSTANCE']
     try:
@@ -75,25 +261,169 @@ def remove_village(name):
         flash(str(e), 'error')
     return redirect(url_for('index'))
 
+def _publish_solution(config, instance: Instance, instance_version: int, state_version: Optional[int],
+                      solution: dict[str, dict[str, int]]) -> None:
+    """Make `solution` the current one, if `instance` is still current and unchanged since `instance_version`.
+
+    Solving runs outside `_STATE_LOCK`, so requests are not held up by it;
+    only this takes it. With a state store, the solution is committed on top
+    of `state_version`. Raises ConflictError when the solution is stale.
+    """
+    with _STATE_LOCK:
+        if config.get('INSTANCE') is not instance or instance.version != instance_version:
+            raise ConflictError(instance_version, instance.version)
+        store = config.get('STATE_STORE')
+        if store is not None:
+            try:
+                config['STATE_VERSION'] = store.commit(state_version, instance, solution)
+            except ConflictError:
+                config['STATE_VERSION'] = None
+                raise
+        config['OPTIMAL_ROUTES'] = VersionedRoutes(solution)
+
 @app.route('/solve_instance', methods=['GET'], endpoint='solve_instance_route')
 def solve_instance_route():
-    instance = current_app.config['INSTANCE']
-    optimal_routes = current_app.config.get('OPTIMAL_ROUTES', {})
+    from game_assistant.optimal import resolve_instance, solve_instance, solve_within
+    config = current_app.config
+    cache = config['SOLUTION_CACHE']
+    with _STATE_LOCK:
+        instance = config['INSTANCE']
+        instance_version, state_version = instance.version, config.get('STATE_VERSION')
+        # The live instance keeps its content hash cached per version; a copy would rehash every village.
+        key = cache.key(instance)
+        solution = cache.get(key)
+        if solution is None:
+            snapshot = Instance.from_dict(instance.to_dict())
+            previous = {source: dict(routes) for source, routes in config.get('OPTIMAL_ROUTES', {}).items()}
+    deadline = request.args.get('deadline', type=float)
+    gap = request.args.get('gap', type=float)
     try:
-        solution = solve_instance(instance)
-        optimal_routes.clear()
-        optimal_routes.update(solution)
-        current_app.config['OPTIMAL_ROUTES'] = optimal_routes
-        flash("Instance solved successfully.", 'success')
-        return redirect(url_for('index'))
+        if solution is not None:
+            flash("Instance solved successfully.", 'success')
+        elif deadline is not None or gap is not None:
+            solution, report = solve_within(snapshot, deadline=deadline, gap=gap)
+            if report["status"] == 'optimal':
+                cache.put(key, solution)
+            flash(_describe_report(report), 'success')
+        elif request.args.get('incremental'):
+            solution, report = resolve_instance(snapshot, previous=previous or None)
+            cache.put(key, solution)
+            flash(f"Instance re-solved incrementally via {report['path']} "
+                  f"(repair {report['repair_seconds']:.3f}s, solve {report['solve_seconds']:.3f}s).", 'success')
+        else:
+            solution = solve_instance(snapshot)
+            cache.put(key, solution)
+            flash("Instance solved successfully.", 'success')
     except Exception as e:
         flash(str(e), 'error')
-        optimal_routes.clear()
-        return redirect(url_for('index'))
+        solution = {}
+    _publish_solution(config, instance, instance_version, state_version, solution)
+    return redirect(url_for('index'))
+
+def _describe_report(report: dict) -> str:
+    if report["status"] == 'optimal':
+        return f"Instance solved to optimality in {report['seconds']:.2f}s."
+    return (f"Good-enough solution after {report['seconds']:.2f}s: objective {report['objective']:g}, "
+            f"within {report['gap']:.1%} of the lower bound {report['bound']:g}.")
+
+@app.route('/solve_instance', methods=['POST'], endpoint='solve_instance_async')
+def solve_instance_async():
+    optimal_routes = current_app.config.setdefault('OPTIMAL_ROUTES', VersionedRoutes())
+    timeout = request.values.get('timeout', type=float)
+    deadline = request.values.get('deadline', type=float)
+    gap = request.values.get('gap', type=float)
+    if (deadline is not None and deadline <= 0) or (gap is not None and gap < 0):
+        return jsonify({"error": "Deadline must be positive and gap must not be negative."}), 400
+    config = current_app.config
+    cache = config['SOLUTION_CACHE']
+    with _STATE_LOCK:
+        instance = config['INSTANCE']
+        version = config.get('STATE_VERSION')
+        instance_version = instance.version
+        key = cache.key(instance)
+        snapshot = Instance.from_dict(instance.to_dict())
+        previous = {source: dict(routes) for source, routes in optimal_routes.items()}
+
+    def solve(snapshot):
+        from game_assistant.optimal import solve_instance, solve_within
+        if deadline is None and gap is None:
+            solution = cache.get(key)
+            if solution is None:
+                solution = solve_instance(snapshot)
+                cache.put(key, solution)
+        else:
+            # Its `incumbent` events carry the objective, bound and gap; only proven optima are cached.
+            solution, report = solve_within(snapshot, deadline=deadline, gap=gap)
+            if report["status"] == 'optimal':
+                cache.put(key, solution)
+        # Lets /jobs/<id>/events clients patch the graph they hold instead of reloading it.
+        report_progress({"type": "delta", **solution_delta(snapshot, previous, solution)})
+        return solution
+
+    def store_solution(solution):
+        try:
+            # With a store, the other workers pick the solution up on their next request.
+            _publish_solution(config, instance, instance_version, version, solution)
+        except ConflictError:
+            pass  # the instance changed while solving, so the solution is stale
+
+    try:
+        job = current_app.config['JOBS'].submit(solve, snapshot, timeout=timeout, on_done=store_solution)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(job.to_dict()), 202, {"Location": url_for('job_status', job_id=job.id)}
+
+@app.route('/jobs/<string:job_id>')
+def job_status(job_id):
+    job = current_app.config['JOBS'].get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<string:job_id>/events')
+def job_events(job_id):
+    """Server-sent events of a job: its progress events, then its final status.
+
+    Solve jobs report `phase` start/end events, `groups` events as
+    independent groups finish, `incumbent` events with the objective, bound
+    and gap of deadline-bounded solves, and a `delta` against the solution
+    current when they were submitted. Events carry their index as id, so a client
+    reconnecting with Last-Event-ID only gets the events it missed.
+    """
+    jobs = current_app.config['JOBS']
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' does not exist."}), 404
+    start = request.headers.get('Last-Event-ID', -1, type=int) + 1
+
+    def stream():
+        sent = start
+        while True:
+            events = job.wait_events(sent, timeout=SSE_KEEPALIVE_SECONDS)
+            for event in events:
+                yield format_sse(event["type"], event, sent)
+                sent += 1
+            if not events:
+                jobs.get(job_id)  # expires the job once its timeout has passed
+                if job.status in FINISHED and sent >= len(job.events):
+                    yield format_sse(job.status, job.to_dict(), sent)
+                    return
+                yield ": keepalive\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<string:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = current_app.config['JOBS'].cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict())
 
 
 @app.route('/add_route', methods=['GET', 'POST'])
+@mutates_state
 def add_route():
+    from game_assistant.forms import RouteForm
     instance = current_app.config['INSTANCE']
     form = RouteForm()
     form.from_village.choices = [(v.name, v.name) for v in instance.villages]
@@ -118,7 +448,9 @@ def add_route():
     return render_template('add_route.html', form=form, villages=instance.villages)
 
 @app.route('/edit_route/<string:from_village>/<string:to_village>', methods=['GET', 'POST'])
+@mutates_state
 def edit_route(from_village, to_village):
+    from game_assistant.forms import RouteForm
     instance = current_app.config['INSTANCE']
     village = instance.get_village(from_village)
     if not village or to_village not in village.routes:
@@ -137,6 +469,7 @@ def edit_route(from_village, to_village):
     return render_template('edit_route.html', form=form, from_village=from_village, to_village=to_village)
 
 @app.route('/remove_route/<string:from_village>/<string:to_village>', methods=['POST'])
+@mutates_state
 def remove_route(from_village, to_village):
     instance = current_app.config['INSTANCE']
     try:
@@ -154,41 +487,43 @@ def solution_json():
     if not result or not instance:
         return jsonify({"error": "No solution found"})
 
-    nodes = []
-    name_to_balance = {}
-    for v in instance.villages:
-        incoming = sum(result.get(src, {}).get(v.name, 0) for src in result)
-        outgoing = sum(result.get(v.name, {}).values())
-        balance = v.production + incoming - outgoing
-        nodes.append({"id": v.name, "balance": balance})
-        name_to_balance[v.name] = balance
-
-    links = []
-    for src, dests in result.items():
-        for dst, amount in dests.items():
-            links.append({"source": src, "target": dst, "amount": amount})
-
-    return jsonify({"nodes": nodes, "links": links})
+    payload = current_app.config['PAYLOAD_CACHE'].get(instance, result)
+    if request.if_none_match.contains_weak(payload.etag):
+        response = Response(status=304)
+    else:
+        encoding = next((e for e in payload.encodings() if e in request.accept_encodings), None)
+        response = Response(payload.encoded(encoding) if encoding else payload.body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    # Weak, since the compressed and identity bodies share it.
+    response.set_etag(payload.etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/graph')
 def graph():
     return render_template('graph.html')
 
 @app.route('/paste', methods=['POST'])
+@mutates_state
 def paste():
     input_str = request.form.get('instance_data', '')
     if not input_str:
         flash("No input provided.", 'error')
         return redirect(url_for('index'))
-    try:
-        instance = get_instance_from_input(input_str)
-        current_app.config['INSTANCE'] = instance
-        flash("Instance loaded successfully.", 'success')
-    except Exception as e:
-        flash(f"Error loading instance: {str(e)}", 'error')
+    instance, errors = parse_paste(input_str)
+    if not instance.villages:
+        flash(f"Error loading instance: {format_errors(errors) if errors else 'no villages found.'}", 'error')
+        return redirect(url_for('index'))
+    current_app.config['INSTANCE'] = instance
+    flash(f"Instance loaded successfully with {len(instance.villages)} villages.", 'success')
+    if errors:
+        flash(f"Skipped {format_errors(errors)}", 'warning')
     return redirect(url_for('index'))
 
 @app.route('/set_routes_to_optimal', methods=['POST'])
+@mutates_state
 def set_routes_to_optimal():
     instance = current_app.config['INSTANCE']
     optimal_routes = current_app.config.get('OPTIMAL_ROUTES', {})
@@ -197,12 +532,12 @@ def set_routes_to_optimal():
         return redirect(url_for('index'))
     
     try:
-        instance.clear_routes()
-        for from_village, routes in optimal_routes.items():
-            for to_village, amount in routes.items():
-                instance.add_route(from_village, to_village, amount)
+        instance.apply_batch([{"op": "clear_routes"}] + [
+            {"op": "add_route", "from_village": from_village, "to_village": to_village, "amount": amount}
+            for from_village, routes in optimal_routes.items() for to_village, amount in routes.items()
+        ])
         current_app.config['INSTANCE'] = instance
-        current_app.config['OPTIMAL_ROUTES'] = {}
+        current_app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
         flash("Routes set to optimal successfully.", 'success')
     except Exception as e:
         flash(f"Error setting routes to optimal: {str(e)}", 'error')
@@ -212,19 +547,64 @@ def set_routes_to_optimal():
 
 def main():
     parser = argparse.ArgumentParser(description="Game Assistant")
-    parser.add_argument('--instance', type=str, default='instance.json', help='Path to the instance file.')
+    parser.add_argument('--instance', type=str, default='instance.json', help='Path to the instance file (JSON, NDJSON or .snap snapshot).')
+    parser.add_argument('--profile-dir', type=str, default=None,
+                        help='Allow per-request cProfile dumps into this directory with ?profile=1.')
+    persistence = parser.add_mutually_exclusive_group()
+    persistence.add_argument('--state', type=str, default=None,
+                             help='SQLite file shared by app workers for the instance and solution (seeded from --instance when empty).')
+    persistence.add_argument('--journal', type=str, default=None,
+                             help='Directory journaling every edit; the instance is recovered from it on restart (seeded from --instance when empty).')
+    parser.add_argument('--prewarm', action='store_true',
+                        help='Load and probe the solver on a job worker at startup instead of on the first solve.')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Print how long importing the app and warming up the solver take, then exit.')
+    parser.add_argument('--backend', type=str, default='pulp', help='Solver backend to prewarm or profile.')
+    subparsers = parser.add_subparsers(dest='command')
+    scenarios_parser = subparsers.add_parser('scenarios', help='Solve what-if scenarios against the instance and compare them.')
+    scenarios_parser.add_argument('scenarios', type=str, help='Path to a JSON file with a list of scenario patches.')
+    # Without a default of its own, so `--backend` before `scenarios` still applies.
+    scenarios_parser.add_argument('--backend', type=str, default=argparse.SUPPRESS, help='Solver backend.')
+    scenarios_parser.add_argument('--workers', type=int, default=None, help='Number of worker processes.')
+    scenarios_parser.add_argument('--output', type=str, default=None, help='Write the full results as JSON to this file.')
     args = parser.parse_args()
-    try:
-        instance = Instance().load_instance_from_file(args.instance)
-    except FileNotFoundError:
-        print(f"Error: File '{args.instance}' not found, using default instance.")
-        instance = Instance()
-    except ValueError as e:
-        print(f"Error loading instance: {e}, using default instance.")
-        instance = Instance()
 
+    def read_instance() -> Instance:
+        try:
+            return load_instance(args.instance)
+        except FileNotFoundError:
+            print(f"Error: File '{args.instance}' not found, using default instance.")
+        except ValueError as e:
+            print(f"Error loading instance: {e}, using default instance.")
+        return Instance()
+
+    if args.profile_startup:
+        print(format_import_profile(import_profile()))
+        print(f"{'solver warm-up (' + args.backend + ')':<40} {'':>9} {warm_up(args.backend) * 1000:9.1f}")
+        return
+
+    if args.command == 'scenarios':
+        from game_assistant.scenarios import format_table, load_scenarios, solve_scenarios
+        rows = solve_scenarios(read_instance(), load_scenarios(args.scenarios), backend=args.backend, max_workers=args.workers)
+        print(format_table(rows))
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(rows, file, indent=4)
+        return
+
+    if args.journal:
+        # The instance file only seeds an empty journal.
+        app.config['JOURNAL'], instance = open_journal(args.journal, read_instance)
+    else:
+        instance = read_instance()
     app.config['INSTANCE'] = instance
-    app.config['OPTIMAL_ROUTES'] = {}
+    app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
+    if args.profile_dir:
+        app.config['PROFILE_DIR'] = args.profile_dir
+    if args.state:
+        app.config['STATE_STORE'] = open_store(args.state)
+    if args.prewarm:
+        app.config['JOBS'].prewarm(warm_up, args.backend)
     app.run(host = "0.0.0.0", debug=True)
 
 
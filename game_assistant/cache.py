@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from typing import Optional
+import gzip
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # Optional: without it, responses fall back to gzip.
+    brotli = None
+
+from game_assistant.models import Instance
+
+def solve_instance(instance: Instance, **kwargs) -> dict[str, dict[str, int]]:
+    """`optimal.solve_instance`, imported on the first solve so that serving pages does not load PuLP."""
+    from game_assistant.optimal import solve_instance
+    return solve_instance(instance, **kwargs)
+
+def forbidden_routes_hash(forbidden_routes: set) -> str:
+    digest = hashlib.sha256()
+    for a, b in sorted(forbidden_routes):
+        digest.update(f"{len(a)}:{a}:{len(b)}:{b};".encode())
+    return digest.hexdigest()
+
+class SolutionCache:
+    """LRU cache of `solve_instance` results keyed by instance content.
+
+    The key combines `Instance.content_hash()` (recomputed only when the
+    instance `version` changes), the forbidden routes and the backend, so an
+    unchanged instance, or one edited back to a previous state, is served
+    without solving again.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        if maxsize < 1:
+            raise ValueError("Cache size must be at least 1.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, dict[str, dict[str, int]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, instance: Instance, forbidden_routes: Optional[set] = None, backend: str = 'pulp') -> tuple:
+        return (instance.content_hash(), forbidden_routes_hash(forbidden_routes or set()), backend)
+
+    def get(self, key: tuple) -> Optional[dict[str, dict[str, int]]]:
+        with self._lock:
+            solution = self._entries.get(key)
+            if solution is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {source: dict(routes) for source, routes in solution.items()}
+
+    def put(self, key: tuple, solution: dict[str, dict[str, int]]) -> None:
+        with self._lock:
+            self._entries[key] = {source: dict(routes) for source, routes in solution.items()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def solve(self, instance: Instance, forbidden_routes: Optional[set] = None, backend: str = 'pulp') -> dict[str, dict[str, int]]:
+        key = self.key(instance, forbidden_routes, backend)
+        solution = self.get(key)
+        if solution is None:
+            solution = solve_instance(instance, forbidden_routes=forbidden_routes or set(), backend=backend)
+            self.put(key, solution)
+        return solution
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class VersionedRoutes(dict):
+    """`{from: {to: amount}}` solution dict whose `version` changes on every mutation.
+
+    Rows are replaced rather than edited in place, so only top-level
+    mutations need tracking.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+# Bodies smaller than this are sent uncompressed.
+MIN_COMPRESS_SIZE = 1024
+
+class SolutionPayload:
+    """Serialized `/solution.json` body for one instance and solution state, with its ETag.
+
+    Compressed variants are produced on first request and kept.
+    """
+
+    def __init__(self, instance: Instance, solution: dict[str, dict[str, int]]):
+        balances = instance.balances(solution).tolist()
+        nodes = [{"id": name, "balance": balance} for name, balance in zip(instance.names, balances)]
+        links = [{"source": source, "target": target, "amount": amount}
+                 for source, routes in solution.items() for target, amount in routes.items()]
+        self.body = json.dumps({"nodes": nodes, "links": links}, separators=(',', ':')).encode()
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self._encoded: dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding not in self._encoded:
+            if encoding == 'br':
+                self._encoded[encoding] = brotli.compress(self.body, quality=5)
+            elif encoding == 'gzip':
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=6, mtime=0)
+            else:
+                raise ValueError(f"Unsupported encoding '{encoding}'.")
+        return self._encoded[encoding]
+
+    def encodings(self) -> tuple[str, ...]:
+        """Encodings worth offering for this body, preferred first."""
+        if len(self.body) < MIN_COMPRESS_SIZE:
+            return ()
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def solution_delta(instance: Instance, previous: dict[str, dict[str, int]],
+                   solution: dict[str, dict[str, int]]) -> dict:
+    """Links added, removed and changed from `previous` to `solution`, and the nodes whose balance moved.
+
+    `base` and `etag` are the `/solution.json` ETags of the two solutions (`base` is None
+    without a previous solution), so a client holding `base` can patch its copy
+    into `etag` and any other client knows to reload.
+    """
+    added, changed, removed = [], [], []
+    for source, routes in solution.items():
+        before = previous.get(source, {})
+        for target, amount in routes.items():
+            if target not in before:
+                added.append({"source": source, "target": target, "amount": amount})
+            elif before[target] != amount:
+                changed.append({"source": source, "target": target, "amount": amount})
+    for source, routes in previous.items():
+        after = solution.get(source, {})
+        removed.extend({"source": source, "target": target} for target in routes if target not in after)
+    balances = instance.balances(solution)
+    moved = np.flatnonzero(balances != instance.balances(previous))
+    names = instance.names
+    return {
+        "base": SolutionPayload(instance, previous).etag if previous else None,
+        "etag": SolutionPayload(instance, solution).etag,
+        "added": added, "removed": removed, "changed": changed,
+        "nodes": [{"id": names[i], "balance": balance} for i, balance in zip(moved.tolist(), balances[moved].tolist())],
+    }
+
+class PayloadCache:
+    """Keeps the `/solution.json` payload of the current instance and solution.
+
+    The payload is rebuilt only when the instance or solution object is
+    replaced, or their `version` changes. Plain dict solutions carry no
+    version and are serialized on every request.
+    """
+
+    def __init__(self):
+        self._key: Optional[tuple] = None
+        self._payload: Optional[SolutionPayload] = None
+        self._lock = threading.Lock()
+
+    def get(self, instance: Instance, solution: dict[str, dict[str, int]]) -> SolutionPayload:
+        version = getattr(solution, "version", None)
+        if version is None:
+            return SolutionPayload(instance, solution)
+        with self._lock:
+            key = self._key
+            if (key is not None and key[0] is instance and key[1] == instance.version
+                    and key[2] is solution and key[3] == version):
+                return self._payload
+        payload = SolutionPayload(instance, solution)
+        with self._lock:
+            self._key = (instance, instance.version, solution, version)
+            self._payload = payload
+        return payload
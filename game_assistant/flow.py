@@ -0,0 +1,124 @@
+from typing import Optional
+import time
+
+import numpy as np
+
+INF = np.iinfo(np.int64).max // 4
+
+def _shortest_distances(num_nodes: int, source: int, tail: np.ndarray, head: np.ndarray,
+                        cost: np.ndarray, residual: np.ndarray) -> np.ndarray:
+    """Bellman-Ford over the arcs with residual capacity, one vectorized pass per round."""
+    dist = np.full(num_nodes, INF, dtype=np.int64)
+    dist[source] = 0
+    for _ in range(num_nodes):
+        usable = (residual > 0) & (dist[tail] < INF)
+        candidate = dist[tail[usable]] + cost[usable]
+        relaxed = dist.copy()
+        np.minimum.at(relaxed, head[usable], candidate)
+        if np.array_equal(relaxed, dist):
+            break
+        dist = relaxed
+    return dist
+
+def _levels(num_nodes: int, source: int, sink: int, tail: np.ndarray, head: np.ndarray, usable: np.ndarray) -> np.ndarray:
+    """Breadth-first hop count from `source` over the usable arcs, -1 where unreachable."""
+    level = np.full(num_nodes, -1, dtype=np.int64)
+    level[source] = 0
+    depth = 0
+    while level[sink] < 0:
+        reached = np.unique(head[usable & (level[tail] == depth)])
+        reached = reached[level[reached] < 0]
+        if not len(reached):
+            break
+        depth += 1
+        level[reached] = depth
+    return level
+
+def _blocking_flow(source: int, sink: int, indptr: np.ndarray, head: np.ndarray, admissible: np.ndarray,
+                   residual: np.ndarray, reverse: np.ndarray, level: np.ndarray, limit: int) -> int:
+    """Augment along level-increasing paths until none is left; returns the units pushed."""
+    pointer = indptr[:-1].copy()
+    dead = np.zeros(len(level), dtype=bool)
+    pushed = 0
+    while pushed < limit:
+        nodes, arcs = [source], []
+        while nodes and nodes[-1] != sink:
+            u = nodes[-1]
+            start, end = pointer[u], indptr[u + 1]
+            heads = head[start:end]
+            usable = np.flatnonzero(admissible[start:end] & (residual[start:end] > 0)
+                                    & (level[heads] == level[u] + 1) & ~dead[heads])
+            if len(usable) == 0:
+                dead[u] = True
+                pointer[u] = end
+                nodes.pop()
+                if arcs:
+                    arcs.pop()
+                continue
+            arc = start + usable[0]
+            pointer[u] = arc
+            arcs.append(arc)
+            nodes.append(head[arc])
+        if not nodes:
+            break
+        path = np.array(arcs, dtype=np.int64)
+        delta = min(int(residual[path].min()), limit - pushed)
+        residual[path] -= delta
+        residual[reverse[path]] += delta
+        pushed += delta
+    return pushed
+
+def min_cost_flow(num_nodes: int, tail: np.ndarray, head: np.ndarray, capacity: np.ndarray,
+                  cost: np.ndarray, source: int, sink: int, amount: int,
+                  deadline: Optional[float] = None) -> tuple[np.ndarray, int]:
+    """Send up to `amount` units from `source` to `sink` at minimum total cost.
+
+    Primal-dual successive shortest paths: each phase computes distances in
+    the residual network, then pushes blocking flows (Dinic-style, on BFS
+    levels) through the zero-reduced-cost arcs until the sink is cut off
+    and distances have to be refreshed.
+    Costs must be non-negative integers. Returns the flow on every arc and
+    the number of units actually sent, which is below `amount` when the
+    network cannot carry it all, or when the `time.perf_counter()` value
+    `deadline` passes; it is checked before each phase.
+    """
+    tail = np.asarray(tail, dtype=np.int64)
+    head = np.asarray(head, dtype=np.int64)
+    m = len(tail)
+
+    # Residual arcs: forward arcs first, then their reverses, grouped by tail.
+    r_tail = np.concatenate([tail, head])
+    r_head = np.concatenate([head, tail])
+    r_cost = np.concatenate([cost, -np.asarray(cost)]).astype(np.int64)
+    residual = np.concatenate([capacity, np.zeros(m)]).astype(np.int64)
+    order = np.argsort(r_tail, kind='stable')
+    position = np.empty(2 * m, dtype=np.int64)
+    position[order] = np.arange(2 * m)
+    reverse = position[(order + m) % (2 * m)]
+    r_tail, r_head, r_cost, residual = r_tail[order], r_head[order], r_cost[order], residual[order]
+    indptr = np.searchsorted(r_tail, np.arange(num_nodes + 1))
+
+    sent = 0
+    while sent < amount:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        dist = _shortest_distances(num_nodes, source, r_tail, r_head, r_cost, residual)
+        if dist[sink] >= INF:
+            break
+        admissible = (dist[r_tail] < INF) & (dist[r_tail] + r_cost == dist[r_head])
+        augmented = False
+        while sent < amount:
+            level = _levels(num_nodes, source, sink, r_tail, r_head, admissible & (residual > 0))
+            if level[sink] < 0:
+                break
+            pushed = _blocking_flow(source, sink, indptr, r_head, admissible, residual, reverse, level, amount - sent)
+            if not pushed:
+                break
+            sent += pushed
+            augmented = True
+        if not augmented:
+            break
+
+    flow = np.empty(m, dtype=np.int64)
+    flow[:] = residual[position[m:]]
+    return flow, sent
@@ -0,0 +1,94 @@
+from typing import Optional
+import argparse
+import json
+
+import numpy as np
+
+from game_assistant.models import Instance, Village
+from game_assistant.storage import save_instance
+
+def _sample_pairs(rng: np.random.Generator, n: int, density: float) -> np.ndarray:
+    """Distinct ordered pairs (i, j), i != j, each present with probability ~`density`."""
+    count = int(round(density * n * (n - 1)))
+    if n < 2 or count <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+    if density >= 0.5:
+        codes = np.flatnonzero(rng.random(n * n) < density)
+    else:
+        codes = np.unique(rng.integers(0, n * n, size=count))
+    pairs = np.stack([codes // n, codes % n], axis=1)
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+def _productions(rng: np.random.Generator, n: int, producer_ratio: float, zero_ratio: float,
+                 max_production: int) -> np.ndarray:
+    kind = rng.random(n)
+    production = rng.integers(1, max_production + 1, size=n)
+    producers = kind < producer_ratio
+    relays = (kind >= producer_ratio) & (kind < producer_ratio + zero_ratio)
+    consumers = ~producers & ~relays
+    supply, demand = production[producers].sum(), production[consumers].sum()
+    if demand > supply:
+        production[consumers] = np.maximum(production[consumers] * supply // max(demand, 1), 0)
+    return np.where(producers, production, np.where(consumers, -production, 0))
+
+def generate_instance(n: int, producer_ratio: float = 0.5, route_density: float = 0.0,
+                      forbidden_density: float = 0.0, zero_ratio: float = 0.0,
+                      max_production: int = 100, seed: Optional[int] = 0,
+                      map_size: Optional[int] = None, resources: tuple[str, ...] = ()) -> tuple[Instance, set]:
+    """Generate a random, reproducible instance and a set of forbidden routes.
+
+    Each village is a producer with probability `producer_ratio`, a
+    zero-production relay with probability `zero_ratio`, and a consumer
+    otherwise. Consumer needs are scaled so total production stays
+    non-negative. `route_density` and `forbidden_density` are the fractions
+    of ordered village pairs that get an existing route or are forbidden.
+    With `map_size`, villages get uniform random coordinates in
+    `[-map_size, map_size]`. Each of `resources` gets its own productions,
+    drawn the same way.
+    """
+    rng = np.random.default_rng(seed)
+    production = _productions(rng, n, producer_ratio, zero_ratio, max_production)
+
+    names = [f"V{i:0{len(str(max(n - 1, 0)))}d}" for i in range(n)]
+    routes: list[dict[str, int]] = [{} for _ in range(n)]
+    for i, j in _sample_pairs(rng, n, route_density).tolist():
+        routes[i][names[j]] = int(rng.integers(1, max_production + 1))
+
+    forbidden = {(names[i], names[j]) for i, j in _sample_pairs(rng, n, forbidden_density).tolist()}
+    coordinates = [None] * n
+    if map_size is not None:
+        coordinates = [tuple(pair) for pair in rng.integers(-map_size, map_size + 1, size=(n, 2)).tolist()]
+    # Drawn last, so instances without resources stay the same for a seed.
+    resource_production = np.array([_productions(rng, n, producer_ratio, zero_ratio, max_production)
+                                    for _ in resources], dtype=np.int64).reshape(len(resources), n)
+    instance = Instance(villages=[Village(name=names[i], production=int(production[i]), routes=routes[i] or None,
+                                          coordinates=coordinates[i],
+                                          resources=dict(zip(resources, resource_production[:, i].tolist())))
+                                  for i in range(n)])
+    return instance, forbidden
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a random game assistant instance.")
+    parser.add_argument('villages', type=int, help='Number of villages.')
+    parser.add_argument('output', type=str, help='Path of the instance file to write (JSON, NDJSON or .snap snapshot).')
+    parser.add_argument('--producer-ratio', type=float, default=0.5)
+    parser.add_argument('--zero-ratio', type=float, default=0.0)
+    parser.add_argument('--route-density', type=float, default=0.0)
+    parser.add_argument('--forbidden-density', type=float, default=0.0)
+    parser.add_argument('--forbidden-output', type=str, default=None, help='Write the forbidden routes to this JSON file.')
+    parser.add_argument('--map-size', type=int, default=None, help='Give villages coordinates in [-N, N].')
+    parser.add_argument('--resources', type=str, nargs='*', default=[],
+                        help='Give villages productions of these resources too, e.g. wood clay iron.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    instance, forbidden = generate_instance(args.villages, args.producer_ratio, args.route_density,
+                                            args.forbidden_density, args.zero_ratio, seed=args.seed,
+                                            map_size=args.map_size, resources=tuple(args.resources))
+    save_instance(instance, args.output)
+    if args.forbidden_output:
+        with open(args.forbidden_output, 'w') as file:
+            json.dump(sorted(forbidden), file)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import json
+import logging
+import threading
+import time
+import uuid
+
+from game_assistant.metrics import progress_listener
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFull(RuntimeError):
+    pass
+
+class Job:
+    def __init__(self, timeout: Optional[float] = None):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.timeout = timeout
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        # Progress events reported while the job runs, in order.
+        self.events: list[dict] = []
+        self._changed = threading.Condition()
+
+    def _finish(self, status: str, error: Optional[str] = None) -> None:
+        with self._changed:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def publish(self, event: dict) -> None:
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def wait_events(self, start: int, timeout: Optional[float] = None) -> list[dict]:
+        """Events from index `start` on, waiting up to `timeout` for one while the job is unfinished."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > start or self.status in FINISHED, timeout)
+            return self.events[start:]
+
+    def expired(self, now: float) -> bool:
+        return self.timeout is not None and self.status in (QUEUED, RUNNING) and now - self.queued_at > self.timeout
+
+    def to_dict(self) -> dict:
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "timeout": self.timeout,
+            "queued_seconds": (self.started_at or end) - self.queued_at,
+            "run_seconds": end - self.started_at if self.started_at is not None else None,
+        }
+
+class JobManager:
+    """Runs callables on a bounded thread pool and tracks their status.
+
+    At most `max_pending` jobs may be queued or running at once; `submit`
+    raises `JobQueueFull` beyond that. A job's `timeout` is a wall-clock
+    limit counted from submission. Cancelling or timing out a queued job
+    removes it from the queue; a running job cannot be interrupted, so it
+    is marked cancelled/failed immediately and its result is discarded
+    when the worker returns. Until then it still occupies a worker and
+    counts toward `max_pending`. Only the last `history` finished jobs are
+    kept.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16, history: int = 100):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solver")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        # Workers inside a job's callable, including cancelled or timed-out jobs that have not returned yet.
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None,
+               on_done: Optional[Callable[[Any], None]] = None, **kwargs) -> Job:
+        with self._lock:
+            self._expire()
+            pending = self._running + sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Too many solve jobs in progress ({pending}), try again later.")
+            job = Job(timeout=timeout)
+            self._jobs[job.id] = job
+            self._trim()
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs, on_done)
+        return job
+
+    def prewarm(self, fn: Callable[..., Any], *args) -> Future:
+        """Run `fn` on a solver worker before any job, e.g. to load the solver; it is not listed as a job.
+
+        Nobody waits for the result, so a failure is logged.
+        """
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(_log_prewarm_failure)
+        return future
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict,
+             on_done: Optional[Callable[[Any], None]]) -> None:
+        with self._lock:
+            self._expire()
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+        try:
+            with progress_listener(job.publish):
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._running -= 1
+                if job.status == RUNNING:
+                    job._finish(FAILED, str(e))
+            return
+        with self._lock:
+            self._running -= 1
+            self._expire()
+            if job.status != RUNNING:
+                return
+            job.result = result
+            job._finish(DONE)
+        if on_done is not None:
+            on_done(result)
+
+    def _expire(self) -> None:
+        now = time.time()
+        for job in self._jobs.values():
+            if job.expired(now):
+                if job.future is not None:
+                    job.future.cancel()
+                job._finish(FAILED, f"Timed out after {job.timeout:g} seconds.")
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._expire()
+            if job.status not in FINISHED:
+                if job.future is not None:
+                    job.future.cancel()
+                job._finish(CANCELLED)
+            return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+def _log_prewarm_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Prewarm failed: %s", future.exception(), exc_info=future.exception())
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """One server-sent event message with a JSON payload."""
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
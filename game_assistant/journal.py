@@ -0,0 +1,182 @@
+from typing import IO, Callable, Optional
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from game_assistant.metrics import REGISTRY
+from game_assistant.models import Instance, Village
+from game_assistant.storage import load_snapshot, snapshot_arrays, write_snapshot
+
+# Journal records since the last snapshot that trigger a background compaction.
+COMPACT_EVERY = 10000
+
+_SNAPSHOT = re.compile(r'^snapshot-(\d{12})\.snap$')
+_SEGMENT = re.compile(r'^journal-(\d{12})\.ndjson$')
+
+def replay(instance: Instance, record: dict) -> None:
+    """Apply one journal record by calling the Instance method it names."""
+    arguments = {key: value for key, value in record.items() if key not in ("op", "seq")}
+    if record.get("op") == "add_village":
+        instance.add_village(Village.from_dict(arguments["village"]))
+    elif record.get("op") in Instance.BATCH_OPS + ('rename_village', 'apply_batch'):
+        getattr(instance, record["op"])(**arguments)
+    else:
+        raise ValueError(f"Unknown journal op {record.get('op')!r}.")
+
+class Journal:
+    """Durable history of an instance: a binary snapshot plus an append-only tail of edits.
+
+    An attached instance reports every mutation, which is appended to the
+    current segment (`journal-<seq>.ndjson`) as one JSON line per op, so an
+    edit costs O(1) however large the instance is. Once `compact_every`
+    records have accumulated, the instance's snapshot arrays are collected and
+    written in the background as `snapshot-<seq>.snap`, after which older snapshots and
+    segments are deleted. `recover()` loads the newest snapshot and replays
+    only the records after it, so restart time does not grow with the edit
+    history. Lines are flushed to the OS on every edit, and fsynced too with
+    `fsync=True`.
+    """
+
+    def __init__(self, directory: str, compact_every: int = COMPACT_EVERY, fsync: bool = False):
+        if compact_every < 1:
+            raise ValueError(f"Compaction interval must be at least 1 record, got {compact_every}.")
+        self.directory = directory
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.instance: Optional[Instance] = None
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._segment: Optional[IO[str]] = None
+        self._compaction: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _files(self, pattern: re.Pattern) -> list[tuple[int, str]]:
+        files = []
+        for name in os.listdir(self.directory):
+            match = pattern.match(name)
+            if match:
+                files.append((int(match.group(1)), os.path.join(self.directory, name)))
+        return sorted(files)
+
+    def recover(self) -> Optional[Instance]:
+        """Rebuild the journaled instance and attach to it; None if the journal is empty.
+
+        A torn last line of a segment, left by a crash in the middle of a write, is ignored.
+        """
+        snapshots = self._files(_SNAPSHOT)
+        if not snapshots:
+            return None
+        self._snapshot_seq, path = snapshots[-1]
+        instance = load_snapshot(path)
+        seq = self._snapshot_seq
+        segments = [path for start, path in self._files(_SEGMENT) if start >= self._snapshot_seq]
+        for path in segments:
+            with open(path, 'r') as file:
+                for line_number, line in enumerate(file, 1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Each recovery starts a new segment, so a torn line always ends its segment.
+                        if not file.read().strip():
+                            break
+                        raise ValueError(f"{path}, line {line_number}: corrupt journal record.") from None
+                    if record["seq"] > seq:
+                        replay(instance, record)
+                        seq = record["seq"]
+        REGISTRY.set("game_assistant_journal_replayed_records", seq - self._snapshot_seq,
+                     "Journal records replayed on top of the snapshot at startup.")
+        with self._lock:
+            self._seq = seq
+            self._open_segment()
+            self._attach(instance)
+        return instance
+
+    def attach(self, instance: Instance) -> None:
+        """Journal `instance` from now on, replacing whatever was journaled; writes its snapshot first."""
+        with self._lock:
+            self._seq += 1
+            self._snapshot_seq = self._seq
+            self._write_snapshot(snapshot_arrays(instance), self._seq)
+            self._open_segment()
+            self._attach(instance)
+
+    def _attach(self, instance: Instance) -> None:
+        if self.instance is not None and self.instance is not instance:
+            self.instance.journal = None
+        self.instance = instance
+        instance.journal = self.append
+
+    def _open_segment(self) -> None:
+        # A segment named after the current seq can only hold a torn line, never a record.
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = open(os.path.join(self.directory, f"journal-{self._seq:012d}.ndjson"), 'w')
+
+    def append(self, ops: list[dict]) -> None:
+        """Record the ops of one mutation; called by the attached instance."""
+        with self._lock:
+            lines = []
+            for op in ops:
+                self._seq += 1
+                lines.append(json.dumps({"seq": self._seq, **op}, separators=(',', ':')))
+            self._segment.write("\n".join(lines) + "\n")
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            REGISTRY.inc("game_assistant_journal_records_total", len(ops), "Instance edits appended to the journal.")
+            if self._seq - self._snapshot_seq >= self.compact_every and self._compaction is None:
+                # Collected now, on the mutating thread, so the snapshot matches `seq` exactly.
+                snapshot, seq = snapshot_arrays(self.instance), self._seq
+                self._open_segment()
+                self._snapshot_seq = seq
+                self._compaction = threading.Thread(target=self._compact, args=(snapshot, seq), daemon=True)
+                self._compaction.start()
+
+    def _compact(self, snapshot: dict[str, np.ndarray], seq: int) -> None:
+        try:
+            with REGISTRY.timer("game_assistant_journal_compaction_seconds", "Time spent writing journal snapshots."):
+                self._write_snapshot(snapshot, seq)
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    def _write_snapshot(self, snapshot: dict[str, np.ndarray], seq: int) -> None:
+        path = os.path.join(self.directory, f"snapshot-{seq:012d}.snap")
+        write_snapshot(snapshot, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        # Everything before the new snapshot is covered by it.
+        for start, old in self._files(_SNAPSHOT) + self._files(_SEGMENT):
+            if start < seq:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass  # removed by a concurrent snapshot
+
+    def wait(self) -> None:
+        """Block until a running background compaction has finished."""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def close(self) -> None:
+        self.wait()
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            if self.instance is not None:
+                self.instance.journal = None
+                self.instance = None
+
+def open_journal(directory: str, load: Callable[[], Instance], **kwargs) -> tuple[Journal, Instance]:
+    """Recover the instance journaled in `directory`, or start a journal for `load()` when it is empty."""
+    journal = Journal(directory, **kwargs)
+    instance = journal.recover()
+    if instance is None:
+        instance = load()
+        journal.attach(instance)
+    return journal, instance
@@ -0,0 +1,237 @@
+from typing import Iterator, Optional
+import numpy as np
+
+class RoutesMatrix:
+    """Sparse square matrix of route amounts, stored as dict-of-keys.
+
+    Rows and columns are both indexed so a village's outgoing and incoming
+    routes can be read without scanning the whole matrix. A CSR view is
+    built on demand and cached until the next mutation; a dense array is
+    only produced by an explicit `toarray()` / `tolist()` call. A matrix
+    built `from_csr` keeps only the CSR arrays until an entry is read or
+    changed.
+    """
+
+    def __init__(self, size: int = 0):
+        self._size = size
+        self._rows: dict[int, dict[int, int]] = {}
+        self._cols: dict[int, dict[int, int]] = {}
+        self._nnz = 0
+        self._csr: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        # Set while the dicts have not been built from `_csr` yet.
+        self._packed = False
+
+    @classmethod
+    def from_coo(cls, size: int, rows: "np.ndarray | list[int]", cols: "np.ndarray | list[int]", data: list[int]) -> 'RoutesMatrix':
+        """Build a matrix from coordinate lists with distinct, non-zero entries."""
+        matrix = cls(size)
+        if not data:
+            return matrix
+        rows_array = np.asarray(rows, dtype=np.int64)
+        cols_array = np.asarray(cols, dtype=np.int64)
+        if rows_array.min() < 0 or cols_array.min() < 0 or max(rows_array.max(), cols_array.max()) >= size:
+            raise IndexError(f"Coordinates out of bounds for matrix of size {size}.")
+        matrix._rows = cls._group(rows_array, cols_array, data)
+        matrix._cols = cls._group(cols_array, rows_array, data)
+        matrix._nnz = len(data)
+        return matrix
+
+    @classmethod
+    def from_csr(cls, size: int, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> 'RoutesMatrix':
+        """Wrap CSR arrays with sorted, distinct, non-zero entries per row; the dicts are built on first use."""
+        matrix = cls(size)
+        if len(indptr) != size + 1:
+            raise IndexError(f"Row pointer of length {len(indptr)} does not fit a matrix of size {size}.")
+        if len(indices) and (indices.min() < 0 or indices.max() >= size):
+            raise IndexError(f"Coordinates out of bounds for matrix of size {size}.")
+        matrix._csr = (indptr, indices, data)
+        matrix._nnz = len(data)
+        matrix._packed = matrix._nnz > 0
+        return matrix
+
+    def _unpack(self) -> None:
+        if self._packed:
+            indptr, indices, data = self._csr
+            rows = np.repeat(np.arange(self._size), np.diff(indptr))
+            data = data.tolist()
+            self._rows = self._group(rows, indices, data)
+            self._cols = self._group(indices, rows, data)
+            self._packed = False
+
+    @staticmethod
+    def _group(keys: np.ndarray, others: np.ndarray, data: list[int]) -> dict[int, dict[int, int]]:
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=-1)).tolist() + [len(keys)]
+        keys, others = keys.tolist(), others[order].tolist()
+        values = [data[k] for k in order.tolist()]
+        return {keys[a]: dict(zip(others[a:b], values[a:b])) for a, b in zip(starts, starts[1:])}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return (self._size, self._size)
+
+    @property
+    def nnz(self) -> int:
+        return self._nnz
+
+    def _check_key(self, key: tuple[int, int]) -> tuple[int, int]:
+        i, j = key
+        if not (0 <= i < self._size and 0 <= j < self._size):
+            raise IndexError(f"Index ({i}, {j}) is out of bounds for matrix of size {self._size}.")
+        return i, j
+
+    def __getitem__(self, key: tuple[int, int]) -> int:
+        i, j = self._check_key(key)
+        self._unpack()
+        return self._rows.get(i, {}).get(j, 0)
+
+    def __setitem__(self, key: tuple[int, int], amount: int) -> None:
+        i, j = self._check_key(key)
+        self._unpack()
+        row = self._rows.get(i)
+        present = row is not None and j in row
+        if amount:
+            if not present:
+                self._nnz += 1
+            self._rows.setdefault(i, {})[j] = amount
+            self._cols.setdefault(j, {})[i] = amount
+        elif present:
+            self._discard(i, j)
+        self._csr = None
+
+    def set_row(self, i: int, entries: dict[int, int]) -> None:
+        """Replace row `i` with `entries` (`{j: amount}`) in one pass; zero amounts are dropped."""
+        self._check_key((i, i))
+        self._unpack()
+        for j in list(self._rows.get(i, ())):
+            self._discard(i, j)
+        row = {j: amount for j, amount in entries.items() if amount}
+        if not row:
+            return
+        if min(row) < 0 or max(row) >= self._size:
+            raise IndexError(f"Row {i} has a column out of bounds for matrix of size {self._size}.")
+        self._rows[i] = row
+        cols = self._cols
+        for j, amount in row.items():
+            col = cols.get(j)
+            if col is None:
+                cols[j] = {i: amount}
+            else:
+                col[i] = amount
+        self._nnz += len(row)
+        self._csr = None
+
+    def __delitem__(self, key: tuple[int, int]) -> None:
+        self[key] = 0
+
+    def _discard(self, i: int, j: int) -> None:
+        self._unpack()
+        row = self._rows[i]
+        del row[j]
+        if not row:
+            del self._rows[i]
+        col = self._cols[j]
+        del col[i]
+        if not col:
+            del self._cols[j]
+        self._nnz -= 1
+
+    def row(self, i: int) -> dict[int, int]:
+        """Outgoing routes of row `i` as `{column: amount}` (read-only copy)."""
+        self._unpack()
+        return dict(self._rows.get(i, {}))
+
+    def column(self, j: int) -> dict[int, int]:
+        """Incoming routes of column `j` as `{row: amount}` (read-only copy)."""
+        self._unpack()
+        return dict(self._cols.get(j, {}))
+
+    def items(self) -> Iterator[tuple[tuple[int, int], int]]:
+        self._unpack()
+        for i, row in self._rows.items():
+            for j, amount in row.items():
+                yield (i, j), amount
+
+    def resize(self, size: int) -> None:
+        self._unpack()
+        if size < self._size:
+            for i, j in [key for key, _ in self.items() if key[0] >= size or key[1] >= size]:
+                self._discard(i, j)
+        self._size = size
+        self._csr = None
+
+    def clear_index(self, k: int) -> None:
+        """Drop every entry in row and column `k`, leaving other indexes untouched."""
+        self._unpack()
+        for j in list(self._rows.get(k, {})):
+            self._discard(k, j)
+        for i in list(self._cols.get(k, {})):
+            self._discard(i, k)
+        self._csr = None
+
+    def renumber(self, mapping: dict[int, int], size: int) -> None:
+        """Move indexes according to `mapping` (unlisted indexes keep their number) and resize."""
+        entries = [
+            (mapping.get(i, i), mapping.get(j, j), amount)
+            for (i, j), amount in self.items()
+        ]
+        self.clear()
+        self._size = size
+        for i, j, amount in entries:
+            self[i, j] = amount
+
+    def clear(self) -> None:
+        self._rows.clear()
+        self._cols.clear()
+        self._nnz = 0
+        self._csr = None
+        self._packed = False
+
+    def tocsr(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return `(indptr, indices, data)` arrays in CSR layout, cached until the next change."""
+        if self._csr is None:
+            counts = np.zeros(self._size + 1, dtype=np.int64)
+            indices = np.empty(self._nnz, dtype=np.int64)
+            data = np.empty(self._nnz, dtype=np.int64)
+            pos = 0
+            for i in sorted(self._rows):
+                row = self._rows[i]
+                for j in sorted(row):
+                    indices[pos] = j
+                    data[pos] = row[j]
+                    pos += 1
+                counts[i + 1] = len(row)
+            self._csr = (np.cumsum(counts), indices, data)
+        return self._csr
+
+    def toarray(self) -> np.ndarray:
+        matrix = np.zeros(self.shape, dtype=int)
+        for (i, j), amount in self.items():
+            matrix[i, j] = amount
+        return matrix
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        matrix = self.toarray()
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def tolist(self) -> list[list[int]]:
+        return self.toarray().tolist()
+
+    def transpose(self) -> 'RoutesMatrix':
+        self._unpack()
+        transposed = RoutesMatrix(self._size)
+        transposed._rows = {j: dict(col) for j, col in self._cols.items()}
+        transposed._cols = {i: dict(row) for i, row in self._rows.items()}
+        transposed._nnz = self._nnz
+        return transposed
+
+    @property
+    def T(self) -> 'RoutesMatrix':
+        return self.transpose()
+
+    def __str__(self) -> str:
+        return f"RoutesMatrix(shape={self.shape}, nnz={self._nnz})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Optional
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = key + ((extra,) if extra else ())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else "+Inf"
+
+class Registry:
+    """In-process counters, gauges and histograms rendered in Prometheus text format."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._help: dict[str, tuple[str, str]] = {}
+        self._values: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, list]] = {}
+        self._lock = threading.Lock()
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._help:
+            self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            series = self._values.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._values.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = series[key]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            series[key][1] += value
+            series[key][2] += 1
+
+    @contextmanager
+    def timer(self, name: str, help_text: str = "", **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, help_text, **labels)
+
+    def get(self, name: str, **labels) -> Optional[float]:
+        """Current value of a counter or gauge, or the observation count of a histogram."""
+        with self._lock:
+            key = _label_key(labels)
+            if name in self._histograms:
+                series = self._histograms[name].get(key)
+                return series[2] if series else None
+            return self._values.get(name, {}).get(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._help.clear()
+            self._values.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(self._help):
+                kind, help_text = self._help[name]
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "histogram":
+                    for key, (counts, total, count) in sorted(self._histograms[name].items()):
+                        cumulative = 0
+                        for bound, bucket_count in zip(self.buckets, counts):
+                            cumulative += bucket_count
+                            lines.append(f"{name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                        lines.append(f"{name}_count{_format_labels(key)} {count}")
+                else:
+                    for key, value in sorted(self._values[name].items()):
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# Receives the progress events of the solve running in the current context, if anyone listens.
+_PROGRESS: ContextVar[Optional[Callable[[dict], None]]] = ContextVar("solve_progress", default=None)
+
+@contextmanager
+def progress_listener(listener: Callable[[dict], None]) -> Iterator[None]:
+    """Send the progress events reported in this context to `listener`."""
+    token = _PROGRESS.set(listener)
+    try:
+        yield
+    finally:
+        _PROGRESS.reset(token)
+
+def report_progress(event: dict) -> None:
+    listener = _PROGRESS.get()
+    if listener is not None:
+        listener(event)
+
+@contextmanager
+def solve_phase(phase: str, backend: str) -> Iterator[None]:
+    """Time a solve phase, and report its start and end as progress events."""
+    report_progress({"type": "phase", "phase": phase, "backend": backend, "state": "start"})
+    start = time.perf_counter()
+    with REGISTRY.timer("game_assistant_solve_phase_seconds", "Time spent in each solve_instance phase.",
+                        phase=phase, backend=backend):
+        yield
+    report_progress({"type": "phase", "phase": phase, "backend": backend, "state": "end",
+                     "seconds": time.perf_counter() - start})
+
+def instrumented(method):
+    """Record the duration of an Instance mutation method."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with REGISTRY.timer("game_assistant_instance_mutation_seconds", "Time spent in Instance mutation methods.",
+                            method=method.__name__):
+            return method(*args, **kwargs)
+    return wrapper
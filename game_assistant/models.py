@@ -1,14 +1,128 @@
-from typing import Optional
+from typing import Callable, Iterable, Optional
+import hashlib
 import json
 import os
 import numpy as np
 import warnings
 
+from game_assistant.matrix import RoutesMatrix
+from game_assistant.metrics import instrumented
+from game_assistant.table import NO_COORDINATE, VillageTable, as_integer, as_production
+
+def _as_coordinates(value) -> Optional[tuple[int, int]]:
+    if value is None:
+        return None
+    try:
+        x, y = value
+    except (TypeError, ValueError):
+        raise ValueError(f"Coordinates must be an (x, y) pair, got {value!r}.") from None
+    return (as_integer(x, "Coordinate"), as_integer(y, "Coordinate"))
+
+def _as_resources(value) -> dict[str, int]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict) or not all(isinstance(resource, str) and resource for resource in value):
+        raise ValueError(f"Resources must map resource names to productions, got {value!r}.")
+    resources = {resource: as_production(production) for resource, production in value.items()}
+    return {resource: production for resource, production in resources.items() if production}
+
 class Village:
-    def __init__(self, name: str, production: int, routes: Optional[dict[str,int]] = None):
-        self.name = name
-        self.production = production
-        self.routes = routes if routes is not None else {}
+    """A village record.
+
+    Once added to an Instance, `name`, `production`, the optional map
+    `coordinates` and the per-resource productions in `resources` (e.g.
+    `{"wood": 30, "iron": -10}`) are views on the instance's VillageTable
+    columns; a standalone or removed village keeps them itself. A village
+    belongs to at most one instance at a time.
+    The routes dict is only allocated once it is accessed, most villages
+    having none; use `route_items()` to read routes without allocating it.
+    """
+    __slots__ = ('_name', '_production', '_coordinates', '_resources', '_routes', '_table', '_id')
+
+    def __init__(self, name: str, production: int, routes: Optional[dict[str,int]] = None,
+                 coordinates: Optional[tuple[int, int]] = None, resources: Optional[dict[str, int]] = None):
+        self._table: Optional[VillageTable] = None
+        self._id = -1
+        self._name = name
+        self._production = as_production(production)
+        self._coordinates = _as_coordinates(coordinates)
+        self._resources = _as_resources(resources)
+        self._routes = routes
+
+    @classmethod
+    def _view(cls, table: VillageTable, i: int, routes: Optional[dict[str, int]]) -> 'Village':
+        village = cls.__new__(cls)
+        village._table, village._id = table, i
+        village._name = village._production = village._coordinates = village._resources = None
+        village._routes = routes
+        return village
+
+    @property
+    def coordinates(self) -> Optional[tuple[int, int]]:
+        return self._table.get_coordinates(self._id) if self._table is not None else self._coordinates
+
+    @coordinates.setter
+    def coordinates(self, value: Optional[tuple[int, int]]) -> None:
+        if self._table is not None:
+            self._table.set_coordinates(self._id, _as_coordinates(value))
+        else:
+            self._coordinates = _as_coordinates(value)
+
+    @property
+    def resources(self) -> dict[str, int]:
+        """Copy of the non-zero per-resource productions."""
+        return self._table.get_resources(self._id) if self._table is not None else dict(self._resources)
+
+    @resources.setter
+    def resources(self, value: dict[str, int]) -> None:
+        if self._table is not None:
+            self._table.set_resources(self._id, _as_resources(value))
+        else:
+            self._resources = _as_resources(value)
+
+    @property
+    def routes(self) -> dict[str, int]:
+        if self._routes is None:
+            self._routes = {}
+        return self._routes
+
+    @routes.setter
+    def routes(self, value: dict[str, int]) -> None:
+        self._routes = value
+
+    def route_items(self) -> Iterable[tuple[str, int]]:
+        return self._routes.items() if self._routes else ()
+
+    @property
+    def name(self) -> str:
+        return self._table.names[self._id] if self._table is not None else self._name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        if self._table is not None:
+            self._table.names[self._id] = value
+        else:
+            self._name = value
+
+    @property
+    def production(self) -> int:
+        return self._table.get_production(self._id) if self._table is not None else self._production
+
+    @production.setter
+    def production(self, value: int) -> None:
+        if self._table is not None:
+            self._table.set_production(self._id, as_production(value))
+        else:
+            self._production = as_production(value)
+
+    def _bind(self, table: VillageTable, i: int) -> None:
+        self._table, self._id = table, i
+        self._name = self._production = self._coordinates = self._resources = None
+
+    def _unbind(self) -> None:
+        self._name, self._production, self._coordinates = self.name, self.production, self.coordinates
+        self._resources = self.resources
+        self._table, self._id = None, -1
 
     def update_route(self, target_village: str, amount: int) -> None:
         if target_village not in self.routes:
@@ -31,27 +145,37 @@ class Village:
         del self.routes[target_village]
     
     def clear_routes(self) -> None:
-        self.routes.clear()
+        if self._routes:
+            self._routes.clear()
 
     def __str__(self) -> str:
-        return f"Village(name={self.name}, production={self.production}, routes={self.routes})"
+        return f"Village(name={self.name}, production={self.production}, routes={self._routes or {}})"
 
     def __repr__(self) -> str:
         return self.__str__()
 
     def to_dict(self) -> dict:
-        return {
+        data = {
             "name": self.name,
             "production": self.production,
-            "routes": self.routes
+            "routes": self._routes if self._routes is not None else {}
         }
+        coordinates = self.coordinates
+        if coordinates is not None:
+            data["coordinates"] = list(coordinates)
+        resources = self.resources
+        if resources:
+            data["resources"] = resources
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'Village':
         return cls(
             name=data.get("name", ""),
             production=data.get("production", 0),
-            routes=data.get("routes", {})
+            routes=data.get("routes") or None,
+            coordinates=data.get("coordinates"),
+            resources=data.get("resources")
         )
 
     @staticmethod
@@ -77,76 +201,372 @@ class Village:
         with open(file_path, 'w') as file:
             json.dump(data, file, indent=4)
 
+# Slot of a village loaded by `Instance.from_arrays` whose view was not created yet.
+_UNLOADED = object()
+
 class Instance:
+    # Removed villages leave a tombstone in their slot so other villages keep
+    # their ids; slots are compacted once tombstones exceed this fraction.
+    COMPACT_RATIO = 0.5
+
     def __init__(self, villages: Optional[list[Village]] = None):
-        self.villages = villages if villages is not None else []
-        self.villages_map = self._villages_map()
-        self.routes_matrix = self._calculate_routes_matrix()
+        self._slot_list: list = villages if villages is not None else []
+        # `(names, route_indptr, route_targets, route_amounts)` the `_UNLOADED` views are created from.
+        self._unloaded: Optional[tuple] = None
+        resources: dict[str, np.ndarray] = {}
+        for i, village in enumerate(self._slots):
+            for resource, production in village.resources.items():
+                if resource not in resources:
+                    resources[resource] = np.zeros(len(self._slots), dtype=np.int64)
+                resources[resource][i] = production
+        self._table = VillageTable([village.name for village in self._slots],
+                                   np.array([village.production for village in self._slots], dtype=np.int64),
+                                   [village.coordinates or (NO_COORDINATE, NO_COORDINATE) for village in self._slots],
+                                   resources)
+        for i, village in enumerate(self._slots):
+            village._bind(self._table, i)
+        self._ids = self._villages_map()
+        self._tombstones = 0
+        self._dangling_routes: dict[str, set[str]] = {}
+        self._routes = self._calculate_routes_matrix()
+        # Bumped by every mutation method; caches compare it to detect changes.
+        self.version = 0
+        self._content_hash: Optional[tuple[int, str]] = None
+        # Called with the ops of every successful mutation method, as `{"op": method, **arguments}`.
+        self.journal: Optional[Callable[[list[dict]], None]] = None
+
+    # The readers below list the villages that were not removed, densely and
+    # in id order, so positions agree between them; they never compact, so
+    # the ids of get_village_id() stay stable until the COMPACT_RATIO threshold
+    # or an explicit compact().
+
+    @property
+    def _slots(self) -> list[Optional[Village]]:
+        """Villages by id, None for removed ones; creates every view not created yet."""
+        if self._unloaded is not None:
+            for i, village in enumerate(self._slot_list):
+                if village is _UNLOADED:
+                    self._slot_list[i] = self._load_view(i)
+            self._unloaded = None
+        return self._slot_list
+
+    @_slots.setter
+    def _slots(self, slots: list[Optional[Village]]) -> None:
+        self._slot_list = slots
+
+    def _village(self, i: int) -> Optional[Village]:
+        village = self._slot_list[i]
+        if village is _UNLOADED:
+            village = self._slot_list[i] = self._load_view(i)
+        return village
+
+    def _load_view(self, i: int) -> Village:
+        names, indptr, targets, amounts = self._unloaded
+        start, end = int(indptr[i]), int(indptr[i + 1])
+        routes = None
+        if start != end:
+            routes = dict(zip([names[k] for k in targets[start:end].tolist()], amounts[start:end].tolist()))
+        return Village._view(self._table, i, routes)
+
+    def _live_ids(self) -> np.ndarray:
+        return np.flatnonzero(self._table.alive)
+
+    @property
+    def villages(self) -> list[Village]:
+        if not self._tombstones:
+            return self._slots
+        return [village for village in self._slots if village is not None]
+
+    @property
+    def villages_map(self) -> dict[str, int]:
+        """`{name: position}` in the order of `villages`; do not mutate."""
+        if not self._tombstones:
+            return self._ids
+        return {village.name: p for p, village in enumerate(self.villages)}
+
+    @property
+    def routes_matrix(self) -> RoutesMatrix:
+        """Routes between positions of `villages`; a copy while removed villages are not compacted yet."""
+        if not self._tombstones:
+            return self._routes
+        live = self._live_ids()
+        position = np.full(len(self._table), -1, dtype=np.int64)
+        position[live] = np.arange(len(live))
+        indptr, indices, data = self._routes.tocsr()
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        return RoutesMatrix.from_coo(len(live), position[rows], position[indices], data.tolist())
+
+    @property
+    def names(self) -> list[str]:
+        """Village names in the order of `villages`; do not mutate."""
+        if not self._tombstones:
+            return self._table.names
+        return [name for name in self._table.names if name is not None]
+
+    @property
+    def production(self) -> np.ndarray:
+        """Copy of the production column, in the order of `villages`."""
+        if not self._tombstones:
+            return self._table.production.copy()
+        return self._table.production[self._live_ids()]
+
+    @property
+    def resources(self) -> list[str]:
+        """Names of the resources any village has produced or needed, in order of appearance."""
+        return self._table.resource_names
+
+    def resource_production(self, resources: Optional[list[str]] = None) -> np.ndarray:
+        """`(n, K)` copy of the productions of `resources` (default: all of them), in the order of `villages`."""
+        matrix = self._table.resource_matrix(self.resources if resources is None else resources)
+        return matrix[self._live_ids()] if self._tombstones else matrix
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """`(n, 2)` float array of village coordinates in the order of `villages`, NaN where unknown."""
+        coordinates = self._table.coordinates
+        if self._tombstones:
+            coordinates = coordinates[self._live_ids()]
+        unknown = coordinates[:, 0] == NO_COORDINATE
+        coordinates = coordinates.astype(np.float64)
+        coordinates[unknown] = np.nan
+        return coordinates
+
+    def total_production(self) -> int:
+        return self._table.total()
+
+    def supply(self) -> int:
+        return self._table.supply()
+
+    def demand(self) -> int:
+        return self._table.demand()
+
+    def balances(self, solution: dict[str, dict[str, int]]) -> np.ndarray:
+        """Production plus inflow minus outflow of every village under `solution`.
+
+        A route with one end outside the instance only counts at the other end.
+        Ordered like `villages`.
+        """
+        ids = self._ids
+        source, target, amount = [], [], []
+        for src, dests in solution.items():
+            i = ids.get(src, -1)
+            for dst, value in dests.items():
+                source.append(i)
+                target.append(ids.get(dst, -1))
+                amount.append(value)
+        n = len(self._table)
+        source, target = np.array(source, dtype=np.int64), np.array(target, dtype=np.int64)
+        amount = np.array(amount, dtype=np.int64)
+        inflow = np.bincount(target[target >= 0], weights=amount[target >= 0], minlength=n)
+        outflow = np.bincount(source[source >= 0], weights=amount[source >= 0], minlength=n)
+        balances = self._table.production + inflow.astype(np.int64) - outflow.astype(np.int64)
+        return balances[self._live_ids()] if self._tombstones else balances
 
     def _villages_map(self) -> dict[str, int]:
-        return {village.name: i for i, village in enumerate(self.villages)}
+        # Reuses the villages' own id objects rather than allocating new ints.
+        return {village.name: village._id for village in self._slots if village is not None}
     
-    def _calculate_routes_matrix(self) -> np.ndarray:
-        size = len(self.villages)
-        matrix = np.zeros((size, size), dtype=int)
-        
-        for i, village in enumerate(self.villages):
-            for target, amount in village.routes.items():
-                if target in self.villages_map:
-                    j = self.villages_map[target]
-                    matrix[i][j] = amount
-                else:
-                    warnings.warn(f"Target village '{target}' does not exist in the instance.")
+    def _calculate_routes_matrix(self) -> RoutesMatrix:
+        self._dangling_routes.clear()
+        ids = self._ids
+        rows, cols, data = [], [], []
+        for i, village in enumerate(self._slots):
+            if village is None:
+                continue
+            for target, amount in village.route_items():
+                j = ids.get(target)
+                if j is None:
+                    self._add_dangling_route(village.name, target)
+                elif amount:
+                    rows.append(i)
+                    cols.append(j)
+                    data.append(amount)
+        return RoutesMatrix.from_coo(len(self._slots), rows, cols, data)
+
+    def _set_matrix_routes(self, matrix: RoutesMatrix, i: int, village: Village) -> None:
+        ids = self._ids
+        row = {}
+        for target, amount in village.route_items():
+            j = ids.get(target)
+            if j is not None:
+                row[j] = amount
+            else:
+                self._add_dangling_route(village.name, target)
+        matrix.set_row(i, row)
+
+    def _add_dangling_route(self, source: str, target: str) -> None:
+        warnings.warn(f"Target village '{target}' does not exist in the instance.")
+        self._dangling_routes.setdefault(target, set()).add(source)
+
+    def _discard_dangling_route(self, source: str, target: str) -> None:
+        sources = self._dangling_routes.get(target)
+        if sources is not None:
+            sources.discard(source)
+            if not sources:
+                del self._dangling_routes[target]
+
+    def compact(self) -> dict[int, int]:
+        """Renumber village ids densely, dropping tombstones left by removals.
+
+        Returns the `{old_id: new_id}` mapping of the villages that moved, which
+        is empty when the instance was already compact.
+        """
+        if not self._tombstones:
+            return {}
+        mapping = {}
+        slots = []
+        for old_id, village in enumerate(self._slots):
+            if village is not None:
+                if old_id != len(slots):
+                    mapping[old_id] = len(slots)
+                slots.append(village)
+        self._slots = slots
+        self._table.compact()
+        for new_id, village in enumerate(slots):
+            village._id = new_id
+        self._ids = self._villages_map()
+        self._routes.renumber(mapping, len(slots))
+        self._tombstones = 0
+        return mapping
+
+    def _touch(self, *ops: dict) -> None:
+        self.version += 1
+        if self.journal is not None:
+            self.journal(list(ops))
 
-        return matrix
+    def content_hash(self) -> str:
+        """Hash of the village names and (per-resource) productions, independent of village order.
+
+        Cached per `version`, so it only sees changes made through Instance methods.
+        """
+        if self._content_hash is None or self._content_hash[0] != self.version:
+            digest = hashlib.sha256()
+            table = self._table
+            resources = [""] * len(table)
+            if table.resource_names:
+                for i, row in enumerate(table.resource_matrix(table.resource_names).tolist()):
+                    resources[i] = json.dumps({r: value for r, value in zip(table.resource_names, row) if value})
+            pairs = [(name, production, extra) for name, production, extra in zip(table.names, table.production.tolist(), resources)
+                     if name is not None]
+            for name, production, extra in sorted(pairs):
+                digest.update(f"{len(name)}:{name}:{production}{extra};".encode())
+            self._content_hash = (self.version, digest.hexdigest())
+        return self._content_hash[1]
+
+    def get_village_id(self, name: str) -> int:
+        """Internal id of a village, stable until the next `compact()`."""
+        if name not in self._ids:
+            raise ValueError(f"Village '{name}' does not exist.")
+        return self._ids[name]
  
+    @instrumented
     def add_village(self, village: Village) -> None:
-        if village.name in self.villages_map:
+        if village.name in self._ids:
             raise ValueError(f"Village '{village.name}' already exists.")
-        self.villages.append(village)
-        self.villages_map[village.name] = len(self.villages) - 1
-        self.routes_matrix = self._calculate_routes_matrix()
+        i = self._table.append(village.name, village.production, village.coordinates, village.resources)
+        self._slot_list.append(village)
+        village._bind(self._table, i)
+        self._ids[village.name] = i
+        self._routes.resize(len(self._table))
+        self._set_matrix_routes(self._routes, i, village)
+        for source in self._dangling_routes.pop(village.name, set()):
+            source_village = self.get_village(source)
+            self._routes[self._ids[source], i] = source_village.routes[village.name]
+        self._touch({"op": "add_village", "village": village.to_dict()})
+
+    def incoming_routes(self, name: str) -> dict[str, int]:
+        """`{source: amount}` of the non-zero routes into a village from villages of the instance."""
+        names = self._table.names
+        return {names[source]: amount for source, amount in self._routes.column(self.get_village_id(name)).items()}
 
     def get_village(self, name: str) -> Optional[Village]:
-        if name in self.villages_map:
-            return self.villages[self.villages_map[name]]
+        if name in self._ids:
+            return self._village(self._ids[name])
         return None
         
+    @instrumented
     def remove_village(self, name: str) -> None:
         village = self.get_village(name)
         if not village:
             raise ValueError(f"Village '{name}' does not exist.")
         
-        self.villages.remove(village)
-        del self.villages_map[name]
-        self.routes_matrix = self._calculate_routes_matrix()
+        k = self._ids.pop(name)
+        for target, _ in village.route_items():
+            self._discard_dangling_route(name, target)
+        for source in self._routes.column(k):
+            if source != k:
+                self._add_dangling_route(self._table.names[source], name)
+        self._routes.clear_index(k)
+        village._unbind()
+        self._table.remove(k)
+        self._slot_list[k] = None
+        self._tombstones += 1
+        self._touch({"op": "remove_village", "name": name})
         
-        self.villages_map = self._villages_map()
+        if self._tombstones > self.COMPACT_RATIO * len(self._table):
+            self.compact()
 
-    def update_village(self, name: str, production: int, routes: Optional[dict[str,int]] = None) -> None:
+    @instrumented
+    def update_village(self, name: str, production: int, routes: Optional[dict[str,int]] = None,
+                       resources: Optional[dict[str, int]] = None) -> None:
         village = self.get_village(name)
         if not village:
             raise ValueError(f"Village '{name}' does not exist.")
-        
+        # Everything is checked first, so an invalid update leaves the village and the journal untouched.
+        production = as_production(production)
+        resources = _as_resources(resources) if resources is not None else None
+        for target, amount in (routes or {}).items():
+            if target not in self._ids:
+                raise ValueError(f"Target village '{target}' does not exist.")
+            if not village._routes or target not in village._routes:
+                raise ValueError(f"Target village '{target}' does not exist in routes. Please add it first using add_route.")
+            if amount < 0:
+                raise ValueError("Amount must be non-negative.")
+
         village.production = production
-        if routes is not None:
-            for target, amount in routes.items():
-                if target in self.villages_map:
-                    village.update_route(target, amount)
-                else:
-                    raise ValueError(f"Target village '{target}' does not exist.")
-        
-        self.routes_matrix = self._calculate_routes_matrix()
+        op = {"op": "update_village", "name": name, "production": production}
+        if resources is not None:
+            village.resources = resources
+            op["resources"] = village.resources
+        self._touch(op)
+        for target, amount in (routes or {}).items():
+            village.update_route(target, amount)
+            self._routes[self._ids[name], self._ids[target]] = amount
+            self._touch({"op": "update_route", "from_village": name, "to_village": target, "amount": amount})
+
+    @instrumented
+    def rename_village(self, name: str, new_name: str) -> None:
+        """Rename a village; routes to it from other villages follow the new name.
+
+        Scans every village's routes, so it costs O(villages + routes).
+        """
+        village = self.get_village(name)
+        if not village:
+            raise ValueError(f"Village '{name}' does not exist.")
+        if new_name == name:
+            return
+        if new_name in self._ids:
+            raise ValueError(f"Village '{new_name}' already exists.")
+        self._ids[new_name] = self._ids.pop(name)
+        village.name = new_name
+        for other in self._slots:
+            if other is not None and other._routes and name in other._routes:
+                other._routes[new_name] = other._routes.pop(name)
+        self._routes = self._calculate_routes_matrix()
+        self._touch({"op": "rename_village", "name": name, "new_name": new_name})
     
+    @instrumented
     def add_route(self, from_village: str, to_village: str, amount: int) -> None:
         village = self.get_village(from_village)
         if not village:
             raise ValueError(f"Village '{from_village}' does not exist, please add it first.")
-        if to_village not in self.villages_map:
+        if to_village not in self._ids:
             raise ValueError(f"Target village '{to_village}' does not exist, please add it first.")
         village.add_route(to_village, amount)
-        self.routes_matrix[self.villages_map[from_village], self.villages_map[to_village]] = amount
+        self._routes[self._ids[from_village], self._ids[to_village]] = amount
+        self._touch({"op": "add_route", "from_village": from_village, "to_village": to_village, "amount": amount})
         
+    @instrumented
     def update_route(self, from_village: str, to_village: str, amount: int) -> None:
         village = self.get_village(from_village)
         if not village:
@@ -154,21 +574,205 @@ class Instance:
         if to_village not in village.routes:
             raise ValueError(f"Route to '{to_village}' does not exist in village '{from_village}'.")
         village.update_route(to_village, amount)
-        self.routes_matrix[self.villages_map[from_village], self.villages_map[to_village]] = amount
+        if to_village in self._ids:
+            self._routes[self._ids[from_village], self._ids[to_village]] = amount
+        self._touch({"op": "update_route", "from_village": from_village, "to_village": to_village, "amount": amount})
 
+    @instrumented
     def remove_route(self, from_village: str, to_village: str) -> None:
         village = self.get_village(from_village)
         if not village:
             raise ValueError(f"Village '{from_village}' does not exist.")
         if to_village not in village.routes:
             raise ValueError(f"Route to '{to_village}' does not exist in village '{from_village}'.")
+        if to_village in self._ids:
+            self._routes[self._ids[from_village], self._ids[to_village]] = 0
+        else:
+            self._discard_dangling_route(from_village, to_village)
         village.remove_route(to_village)
-        self.routes_matrix[self.villages_map[from_village], self.villages_map[to_village]] = 0
+        self._touch({"op": "remove_route", "from_village": from_village, "to_village": to_village})
 
+    @instrumented
     def clear_routes(self) -> None:
-        for village in self.villages:
-            village.clear_routes()
-        self.routes_matrix = self._calculate_routes_matrix()
+        for village in self._slots:
+            if village is not None:
+                village.clear_routes()
+        self._routes.clear()
+        self._dangling_routes.clear()
+        self._touch({"op": "clear_routes"})
+
+    BATCH_OPS = ('add_village', 'update_village', 'remove_village', 'add_route', 'update_route', 'remove_route', 'clear_routes')
+
+    def _prepare_batch(self, ops: list[dict]) -> list[tuple]:
+        """Validate a batch against the state each op would see, without changing the instance.
+
+        Returns the ops with validated values; raises ValueError naming the first invalid op.
+        """
+        # Overlays of what earlier ops of the batch changed: villages added (True) or
+        # removed (False), and routes per source. Sources in `reset` lost the routes
+        # the instance has for them (removed, re-added or cleared).
+        villages: dict[str, bool] = {}
+        routes: dict[str, dict[str, bool]] = {}
+        reset: set[str] = set()
+        cleared = False
+
+        def has_village(name) -> bool:
+            return villages[name] if name in villages else name in self._ids
+
+        def has_route(source, target) -> bool:
+            if target in routes.get(source, ()):
+                return routes[source][target]
+            if cleared or source in reset:
+                return False
+            village = self.get_village(source)
+            return village is not None and village._routes is not None and target in village._routes
+
+        def field(op, key) -> str:
+            value = op.get(key)
+            if not isinstance(value, str):
+                raise ValueError(f"'{key}' must be a string, got {value!r}.")
+            return value
+
+        prepared = []
+        for k, op in enumerate(ops):
+            try:
+                if not isinstance(op, dict):
+                    raise ValueError(f"expected an object, got {op!r}.")
+                kind = op.get("op")
+                if kind not in self.BATCH_OPS:
+                    raise ValueError(f"unknown op {kind!r}, expected one of {list(self.BATCH_OPS)}.")
+                if kind == 'add_village':
+                    village = Village.from_dict(op)
+                    if not isinstance(village.name, str) or not village.name:
+                        raise ValueError("Village name must be a non-empty string.")
+                    if village._routes is not None and not isinstance(village._routes, dict):
+                        raise ValueError(f"Routes must be an object, got {village._routes!r}.")
+                    if has_village(village.name):
+                        raise ValueError(f"Village '{village.name}' already exists.")
+                    if village._routes:
+                        village._routes = {target: as_integer(amount, "Amount") for target, amount in village.route_items()}
+                    if any(amount < 0 for _, amount in village.route_items()):
+                        raise ValueError("Amount must be non-negative.")
+                    villages[village.name] = True
+                    routes[village.name] = {target: True for target, _ in village.route_items()}
+                    reset.add(village.name)
+                    prepared.append((kind, village))
+                elif kind == 'update_village':
+                    name, production = field(op, "name"), as_production(op.get("production"))
+                    resources = _as_resources(op["resources"]) if op.get("resources") is not None else None
+                    if not has_village(name):
+                        raise ValueError(f"Village '{name}' does not exist.")
+                    updates = op.get("routes") or {}
+                    if not isinstance(updates, dict):
+                        raise ValueError(f"Routes must be an object, got {updates!r}.")
+                    updates = {target: as_integer(amount, "Amount") for target, amount in updates.items()}
+                    for target, amount in updates.items():
+                        if not has_village(target):
+                            raise ValueError(f"Target village '{target}' does not exist.")
+                        if not has_route(name, target):
+                            raise ValueError(f"Target village '{target}' does not exist in routes. Please add it first using add_route.")
+                        if amount < 0:
+                            raise ValueError("Amount must be non-negative.")
+                    prepared.append((kind, name, production, updates, resources))
+                elif kind == 'remove_village':
+                    name = field(op, "name")
+                    if not has_village(name):
+                        raise ValueError(f"Village '{name}' does not exist.")
+                    villages[name] = False
+                    routes[name] = {}
+                    reset.add(name)
+                    prepared.append((kind, name))
+                elif kind == 'clear_routes':
+                    routes.clear()
+                    cleared = True
+                    prepared.append((kind,))
+                else:
+                    source, target = field(op, "from_village"), field(op, "to_village")
+                    if not has_village(source):
+                        raise ValueError(f"Village '{source}' does not exist.")
+                    if kind == 'add_route':
+                        if not has_village(target):
+                            raise ValueError(f"Target village '{target}' does not exist, please add it first.")
+                        if has_route(source, target):
+                            raise ValueError(f"Route to '{target}' already exists. Use update_route to change the amount.")
+                    elif not has_route(source, target):
+                        raise ValueError(f"Route to '{target}' does not exist in village '{source}'.")
+                    if kind == 'remove_route':
+                        routes.setdefault(source, {})[target] = False
+                        prepared.append((kind, source, target))
+                    else:
+                        amount = as_integer(op.get("amount"), "Amount")
+                        if amount < 0:
+                            raise ValueError("Amount must be non-negative.")
+                        routes.setdefault(source, {})[target] = True
+                        prepared.append((kind, source, target, amount))
+            except ValueError as e:
+                raise ValueError(f"Operation {k}: {e}") from None
+        return prepared
+
+    @instrumented
+    def apply_batch(self, ops: list[dict]) -> dict:
+        """Apply a list of edits atomically: either every op is applied or none is.
+
+        Each op is an object with an `op` of BATCH_OPS and the arguments of the
+        method of the same name (`add_village` takes a village object, route
+        ops `from_village`, `to_village` and `amount`). Ops see the effect of
+        the ops before them. The villages index and routes matrix are rebuilt
+        once for the whole batch, which costs O(villages + routes) instead of
+        an update per op. Returns a summary with the number of ops per kind.
+        """
+        prepared = self._prepare_batch(ops)
+        if not prepared:
+            return {"applied": 0, "ops": {}, "villages": len(self._ids), "routes": self._routes.nnz, "version": self.version}
+        counts: dict[str, int] = {}
+        for kind, *args in prepared:
+            counts[kind] = counts.get(kind, 0) + 1
+            if kind == 'add_village':
+                village, = args
+                i = self._table.append(village.name, village.production, village.coordinates, village.resources)
+                self._slot_list.append(village)
+                village._bind(self._table, i)
+                self._ids[village.name] = i
+            elif kind == 'update_village':
+                name, production, updates, resources = args
+                village = self._village(self._ids[name])
+                village.production = production
+                if resources is not None:
+                    village.resources = resources
+                for target, amount in updates.items():
+                    village.update_route(target, amount)
+            elif kind == 'remove_village':
+                name, = args
+                k = self._ids.pop(name)
+                self._village(k)._unbind()
+                self._table.remove(k)
+                self._slot_list[k] = None
+                self._tombstones += 1
+            elif kind == 'clear_routes':
+                for village in self._slots:
+                    if village is not None:
+                        village.clear_routes()
+            else:
+                source, target, *amount = args
+                village = self._village(self._ids[source])
+                if kind == 'add_route':
+                    village.add_route(target, *amount)
+                elif kind == 'update_route':
+                    village.update_route(target, *amount)
+                else:
+                    village.remove_route(target)
+
+        if self._tombstones > self.COMPACT_RATIO * len(self._slots):
+            self._slots = [village for village in self._slots if village is not None]
+            self._table.compact()
+            for new_id, village in enumerate(self._slots):
+                village._id = new_id
+            self._tombstones = 0
+        self._ids = self._villages_map()
+        self._routes = self._calculate_routes_matrix()
+        self._touch({"op": "apply_batch", "ops": ops})
+        return {"applied": len(prepared), "ops": counts, "villages": len(self._ids),
+                "routes": self._routes.nnz, "version": self.version}
         
     def __str__(self) -> str:
         return f"Instance(villages={self.villages})"
@@ -186,6 +790,42 @@ class Instance:
         villages = [Village.from_dict(village_data) for village_data in data.get("villages", [])]
         return cls(villages=villages)
     
+    @classmethod
+    def from_arrays(cls, names: list[str], production: np.ndarray, route_indptr: np.ndarray,
+                    route_targets: np.ndarray, route_amounts: np.ndarray,
+                    coordinates: Optional[np.ndarray] = None,
+                    resources: Optional[dict[str, np.ndarray]] = None) -> 'Instance':
+        """Build an instance from a production array and CSR route arrays.
+
+        Village `i` is `names[i]` and its routes are `route_targets[indptr[i]:indptr[i + 1]]`,
+        indexes into `names`; names past the villages are targets outside the instance.
+        `coordinates` is an optional `(n, 2)` integer array, `NO_COORDINATE` where unknown,
+        and `resources` optional per-resource production arrays.
+        The arrays are copied, so they may be views on a file. The columns and the
+        routes matrix are built from them directly; a village's Village view and
+        routes dict are only created when it is first looked up.
+        """
+        n = len(production)
+        # Copies, as the lazily created views read them after a mapped file may have changed.
+        indptr = np.array(route_indptr, dtype=np.int64)
+        targets = np.array(route_targets, dtype=np.int64)
+        amounts = np.array(route_amounts, dtype=np.int64)
+        instance = cls()
+        instance._table = VillageTable(names[:n], production, coordinates, resources)
+        instance._slot_list = [_UNLOADED] * n
+        instance._unloaded = (names, indptr, targets, amounts)
+        instance._ids = dict(zip(instance._table.names, range(n)))
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        inside = targets < n
+        keep = np.flatnonzero(inside & (amounts != 0))
+        keep = keep[np.argsort(rows[keep] * n + targets[keep])]
+        csr_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=n), out=csr_indptr[1:])
+        instance._routes = RoutesMatrix.from_csr(n, csr_indptr, targets[keep], amounts[keep])
+        for k in np.flatnonzero(~inside).tolist():
+            instance._add_dangling_route(names[rows[k]], names[targets[k]])
+        return instance
+
     @staticmethod
     def load_instance_from_file(file_path: str) -> 'Instance':
         if not os.path.exists(file_path):
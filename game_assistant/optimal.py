@@ -1,72 +1,759 @@
-from pulp import LpMinimize, LpProblem, LpVariable, lpSum, LpStatus
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pulp import (LpAffineExpression, LpMinimize, LpProblem, LpVariable, lpSum, LpStatus, LpSolutionIntegerFeasible,
+                  LpSolutionOptimal, PULP_CBC_CMD)
 from typing import Optional
+import contextvars
+import heapq
+import os
+import re
+import tempfile
+import threading
+import time
+import numpy as np
 
+from game_assistant.flow import min_cost_flow
+from game_assistant.metrics import REGISTRY, report_progress, solve_phase
 from game_assistant.models import Instance
+from game_assistant.spatial import SpatialIndex, distance_costs
 
-def solve_instance(instance: Instance, forbidden_routes: Optional[set] = set()) -> dict[str, dict[str, int]]:
+OBJECTIVES = ('routes', 'distance')
+
+# The best bound CBC reports when it stops before proving optimality.
+_CBC_LOWER_BOUND = re.compile(r'^Lower bound:\s*(\S+)', re.MULTILINE)
+
+class InfeasibleError(ValueError):
+    """Raised when no flow over the allowed arcs meets every demand."""
+
+class DeadlineError(ValueError):
+    """Raised when a solve runs out of time before finding any feasible solution."""
+
+class SolveBudget:
+    """Deadline and target relative gap for `solve_arcs`, and what the backends achieved within them.
+
+    Each backend call adds the objective of the solution it returns and the
+    lower bound it proved for its part of the problem; parts are solved
+    independently, so both add up.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, gap: Optional[float] = None):
+        if seconds is not None and seconds <= 0:
+            raise ValueError(f"Deadline must be positive, got {seconds} seconds.")
+        if gap is not None and gap < 0:
+            raise ValueError(f"Gap must not be negative, got {gap}.")
+        self.start = time.perf_counter()
+        self.deadline = self.start + seconds if seconds is not None else None
+        self.gap = gap
+        self.objective = 0.0
+        self.bound = 0.0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.perf_counter()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def record(self, objective: float, bound: float) -> None:
+        with self._lock:
+            self.objective += objective
+            self.bound += min(bound, objective)
+
+def solve_instance(instance: Instance, forbidden_routes: Optional[set] = set(), backend: str = 'pulp',
+                   objective: str = 'routes', neighbours: Optional[int] = None,
+                   radius: Optional[float] = None, workers: Optional[int] = None) -> dict[str, dict[str, int]]:
+    """Solve the instance, minimizing the total routed amount or, with `objective='distance'`, amount times distance.
+
+    With `neighbours` and/or `radius`, only arcs between villages that are
+    among each other's k nearest or within the radius on the map are
+    considered (plus every arc touching a village without coordinates). If
+    that pruned problem is infeasible, both are doubled and it is solved
+    again, until the candidates cover every arc. `workers` bounds how many
+    independent components are solved in parallel (see `solve_arcs`).
+    """
     if not instance.villages:
         raise ValueError("Instance has no villages.")
-    
-    n = len(instance.villages)
+    return _solve_layers(instance, instance.production[:, None], None, forbidden_routes, backend, objective,
+                         neighbours, radius, workers)[0]
+
+def solve_resources(instance: Instance, resources: Optional[list[str]] = None, forbidden_routes: Optional[set] = set(),
+                    backend: str = 'pulp', objective: str = 'routes', neighbours: Optional[int] = None,
+                    radius: Optional[float] = None, workers: Optional[int] = None) -> dict[str, dict[str, dict[str, int]]]:
+    """Solve the routing of every resource in `resources` (default: all of the instance's) in one batched call.
+
+    Takes the same options as `solve_instance` and returns `{resource:
+    solution}`. The resources share the villages, so the arcs, their costs
+    and the spatial index are built once; the per-resource problems are then
+    laid side by side as one network with a copy of the villages per
+    resource, presolved together, and solved as independent components (in
+    parallel, or as one model with `workers=1`). Errors name villages as
+    `'<village> (<resource>)'`.
+    """
+    if not instance.villages:
+        raise ValueError("Instance has no villages.")
+    resources = instance.resources if resources is None else list(resources)
+    if not resources:
+        return {}
+    solutions = _solve_layers(instance, instance.resource_production(resources), resources, forbidden_routes, backend,
+                              objective, neighbours, radius, workers)
+    return dict(zip(resources, solutions))
+
+def _solve_layers(instance: Instance, production: np.ndarray, labels: Optional[list[str]], forbidden_routes: Optional[set],
+                  backend: str, objective: str, neighbours: Optional[int], radius: Optional[float],
+                  workers: Optional[int]) -> list[dict[str, dict[str, int]]]:
+    """Solve one flow problem per column of the `(n, K)` `production` over shared arcs.
 
-    allowed_routes = [
-        (i, j) for i in range(n) for j in range(n)
-        if i != j and (instance.villages[i].name, instance.villages[j].name) not in forbidden_routes
-    ]
+    Layer `k` is a copy of the villages numbered from `k * n`, named with
+    `labels[k]` when there is more than one layer.
+    """
+    _check_backend(backend)
+    forbidden_routes = forbidden_routes or set()
+    names = instance.names
+    n, layers = production.shape
+    index = _spatial_index(instance, objective, neighbours is not None or radius is not None)
+    if layers == 1:
+        layer_names = names
+    else:
+        layer_names = [f"{name} ({label})" for label in labels for name in names]
+        if len(set(layer_names)) < len(layer_names):
+            raise ValueError("Village and resource names are ambiguous when combined, rename them.")
+    if layers > 1:
+        short = np.flatnonzero(production.sum(axis=0) < 0)
+        if len(short):
+            raise ValueError(f"Total production of {labels[short[0]]} is negative, cannot solve instance.")
+    layer_production = production.T.reshape(-1).tolist()
+    offsets = (np.arange(layers, dtype=np.int64) * n)[:, None]
 
-    if not allowed_routes:
-        raise ValueError("No allowed routes available after applying forbidden routes.")
+    while True:
+        with solve_phase("allowed_arcs", backend):
+            if neighbours is None and radius is None:
+                tail, head = allowed_arcs(names, forbidden_routes)
+                complete = True
+            else:
+                tail, head, complete = candidate_arcs(names, index, forbidden_routes, neighbours, radius)
+            cost = distance_costs(index, tail, head) if objective == 'distance' else None
+            if layers > 1:
+                tail, head = (tail[None, :] + offsets).reshape(-1), (head[None, :] + offsets).reshape(-1)
+                cost = np.tile(cost, layers) if cost is not None else None
+        try:
+            solution = solve_arcs(layer_names, layer_production, tail, head, backend=backend, cost=cost, workers=workers)
+            break
+        except InfeasibleError:
+            if complete:
+                raise
+        REGISTRY.inc("game_assistant_solve_widenings_total", help_text="Candidate arc sets widened after an infeasible solve.",
+                     backend=backend)
+        neighbours = neighbours * 2 if neighbours is not None else None
+        radius = radius * 2 if radius is not None else None
+
+    if layers == 1:
+        return [solution]
+    position = {name: p for p, name in enumerate(layer_names)}
+    solutions: list[dict[str, dict[str, int]]] = [{name: {} for name in names} for _ in range(layers)]
+    for source, routes in solution.items():
+        if routes:
+            k, i = divmod(position[source], n)
+            solutions[k][names[i]] = {names[position[target] % n]: amount for target, amount in routes.items()}
+    return solutions
+
+def solve_within(instance: Instance, deadline: Optional[float] = None, gap: Optional[float] = None,
+                 forbidden_routes: Optional[set] = set(), backend: str = 'pulp', objective: str = 'routes',
+                 workers: Optional[int] = None) -> tuple[dict[str, dict[str, int]], dict]:
+    """Solve within `deadline` seconds, or until the relative `gap` to the lower bound is reached.
+
+    A greedy flow over direct producer-to-consumer arcs is the first
+    incumbent, and each consumer's demand times its cheapest incoming arc
+    gives a lower bound. If they are already within `gap` (default: equal),
+    no solver runs; otherwise the backend is warm-started from the incumbent
+    and stopped at the deadline or gap. Building the model is not
+    interrupted, so the deadline can be overrun by that much. Returns the best
+    solution and a report of its `status` ('optimal' or 'feasible'),
+    `objective`, `bound`, `gap`, `seconds` and `source` ('greedy' or the
+    backend). Raises DeadlineError when nothing feasible was found in time.
+    """
+    if not instance.villages:
+        raise ValueError("Instance has no villages.")
+    _check_backend(backend)
+    budget = SolveBudget(deadline, gap)
+    forbidden_routes = forbidden_routes or set()
+    names = instance.names
+    production = instance.production.tolist()
+    index = _spatial_index(instance, objective, False)
+
+    with solve_phase("allowed_arcs", backend):
+        tail, head = allowed_arcs(names, forbidden_routes)
+        cost = distance_costs(index, tail, head) if index is not None else None
+    with solve_phase("incumbent", backend):
+        bound = _lower_bound(production, tail, head, cost)
+        flow = _greedy_flow(production, tail, head, cost)
+
+    def report(solution: dict[str, dict[str, int]], objective: float, bound: float, source: str) -> tuple[dict, dict]:
+        relative = max((objective - bound) / objective, 0.0) if objective > 0 else 0.0
+        result = {"status": "optimal" if relative <= 1e-9 else "feasible", "objective": objective,
+                  "bound": bound, "gap": relative, "seconds": time.perf_counter() - budget.start, "source": source}
+        report_progress({"type": "incumbent", **result})
+        return solution, result
+
+    if flow is None:
+        incumbent = None
+    else:
+        incumbent = _flow_solution(names, tail, head, flow)
+        objective = float(flow @ cost) if cost is not None else float(flow.sum())
+        greedy = report(incumbent, objective, bound, "greedy")
+        if greedy[1]["gap"] <= (gap or 0.0):
+            return greedy
+    try:
+        solution = solve_arcs(names, production, tail, head, backend=backend, initial=incumbent,
+                              cost=cost, workers=workers, budget=budget)
+    except DeadlineError:
+        if incumbent is None:
+            raise
+        return report(incumbent, objective, bound, "greedy")
+    if incumbent is not None and objective <= budget.objective:
+        return report(incumbent, objective, max(bound, budget.bound), "greedy")
+    return report(solution, budget.objective, max(bound, budget.bound), backend)
+
+def _spatial_index(instance: Instance, objective: str, pruned: bool) -> Optional[SpatialIndex]:
+    """The map index the objective or arc pruning needs, if any."""
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {list(OBJECTIVES)}.")
+    if objective != 'distance' and not pruned:
+        return None
+    index = SpatialIndex(instance.coordinates)
+    names = instance.names
+    if objective == 'distance' and len(index.placed) < len(names):
+        missing = names[int(np.setdiff1d(np.arange(len(names)), index.placed)[0])]
+        raise ValueError(f"Distance objective needs coordinates for every village, '{missing}' has none.")
+    return index
+
+def _lower_bound(production: list[int], tail: np.ndarray, head: np.ndarray, cost: Optional[np.ndarray] = None) -> float:
+    """Every unit a consumer receives crosses one of its incoming arcs, so it costs at least the cheapest one."""
+    production = np.asarray(production, dtype=np.int64)
+    cost = np.ones(len(tail), dtype=np.int64) if cost is None else cost
+    cheapest = np.full(len(production), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(cheapest, head, cost)
+    consumers = np.flatnonzero(production < 0)
+    return float((-production[consumers]).astype(np.float64) @ cheapest[consumers])
+
+def _greedy_flow(production: list[int], tail: np.ndarray, head: np.ndarray,
+                 cost: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Feasible flow over direct producer-to-consumer arcs, cheapest first; None if some demand is left over.
+
+    Consumers are served largest demand first, one vectorized pass each.
+    """
+    production = np.asarray(production, dtype=np.int64)
+    cost = np.ones(len(tail), dtype=np.int64) if cost is None else cost
+    spare = np.maximum(production, 0)
+    direct = np.flatnonzero((production[tail] > 0) & (production[head] < 0))
+    direct = direct[np.lexsort((cost[direct], head[direct]))]
+    starts = np.searchsorted(head[direct], np.arange(len(production) + 1))
+    flow = np.zeros(len(tail), dtype=np.int64)
+    for j in np.argsort(production, kind='stable').tolist():
+        need = -int(production[j])
+        if need <= 0:
+            break
+        arcs = direct[starts[j]:starts[j + 1]]
+        available = spare[tail[arcs]]
+        take = np.clip(need - (np.cumsum(available) - available), 0, available)
+        if take.sum() < need:
+            return None
+        flow[arcs] = take
+        spare[tail[arcs]] -= take
+    return flow
+
+def candidate_arcs(names: list[str], index: SpatialIndex, forbidden_routes: set, neighbours: Optional[int] = None,
+                   radius: Optional[float] = None) -> tuple[np.ndarray, np.ndarray, bool]:
+    """Return `(tail, head, complete)` for the arcs `solve_instance` considers with spatial pruning.
+
+    Villages are linked in both directions to their `neighbours` nearest
+    villages and to every village within `radius`; villages without
+    coordinates keep all their arcs. `complete` tells whether this is every
+    non-forbidden arc, in which case the arcs come from `allowed_arcs`.
+    """
+    placed = index.placed
+    if ((neighbours is not None and neighbours >= len(placed) - 1) or
+            (radius is not None and radius >= index.extent)):
+        return *allowed_arcs(names, forbidden_routes), True
+
+    n = len(names)
+    tails, heads = [], []
+    if neighbours is not None:
+        tail, head = index.knn_pairs(neighbours)
+        tails += [tail, head]
+        heads += [head, tail]
+    if radius is not None:
+        tail, head = index.radius_pairs(radius)
+        tails.append(tail)
+        heads.append(head)
+    unplaced = np.setdiff1d(np.arange(n), placed)
+    if len(unplaced):
+        for tail, head in (allowed_arcs(names, set(), unplaced), allowed_arcs(names, set(), placed, unplaced)):
+            tails.append(tail)
+            heads.append(head)
+
+    codes = np.unique(np.concatenate(tails) * n + np.concatenate(heads))
+    position = {name: i for i, name in enumerate(names)}
+    blocked = [position[a] * n + position[b] for a, b in forbidden_routes if a in position and b in position]
+    if blocked:
+        codes = codes[~np.isin(codes, blocked)]
+    return codes // n, codes % n, False
+
+def solve_arcs(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray,
+               backend: str = 'pulp', initial: Optional[dict[str, dict[str, int]]] = None,
+               cost: Optional[np.ndarray] = None, workers: Optional[int] = None,
+               budget: Optional[SolveBudget] = None) -> dict[str, dict[str, int]]:
+    """Solve over a prebuilt arc set, given as `(tail, head)` village index arrays.
+
+    `cost` gives an integer cost per arc (default: 1, minimizing the total
+    routed amount). When the presolved arcs split the villages into
+    independent components, each one is checked for enough supply and they
+    are solved on up to `workers` threads (default: one per CPU), packed
+    into one sub-problem per thread, then merged. With a `budget`, the
+    backends stop at its deadline or gap and record what they achieved in it.
+    """
+    _check_backend(backend)
+    if not len(tail):
+        raise InfeasibleError("No allowed routes available after applying forbidden routes.")
     
-    total_prod = sum(village.production for village in instance.villages)
+    total_prod = int(np.sum(production))
     if total_prod < 0:
         raise ValueError("Total production is negative, cannot solve instance.")
-    
+
+    REGISTRY.inc("game_assistant_solves_total", help_text="Number of solves started.", backend=backend)
+    REGISTRY.set("game_assistant_solve_villages", len(names), "Villages in the last solve.", backend=backend)
+    with solve_phase("total", backend):
+        with solve_phase("presolve", backend):
+            kept, report = presolve(names, production, tail, head)
+        for reason in ("sign", "relay"):
+            REGISTRY.set("game_assistant_presolve_removed_arcs", report[f"{reason}_arcs"],
+                         "Arcs removed by presolve in the last solve.", backend=backend, reason=reason)
+        REGISTRY.set("game_assistant_solve_arcs", len(kept), "Arcs left after presolve in the last solve.", backend=backend)
+        if not len(kept):
+            return {name: {} for name in names}
+        tail, head = tail[kept], head[kept]
+        cost = cost[kept] if cost is not None else None
+        labels = connected_components(len(names), tail, head)
+        _check_components(names, production, labels, tail)
+        components = np.unique(labels[tail])
+        REGISTRY.set("game_assistant_solve_components", len(components),
+                     "Independent components in the last solve.", backend=backend)
+        if len(components) == 1:
+            return BACKENDS[backend](names, production, tail, head, initial, cost, budget)
+        groups = _pack_components(labels, tail, workers or os.cpu_count() or 1)
+        return _solve_groups(names, production, tail, head, cost, initial, labels, groups, backend, budget)
+
+def connected_components(n: int, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+    """Label each village with the smallest village id of its weakly connected component."""
+    labels = np.arange(n)
+    while True:
+        previous = labels
+        labels = labels.copy()
+        np.minimum.at(labels, tail, previous[head])
+        np.minimum.at(labels, head, previous[tail])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+def _describe_component(names: list[str], members: np.ndarray) -> str:
+    shown = ", ".join(f"'{names[i]}'" for i in members[:3])
+    more = f" and {len(members) - 3} more" if len(members) > 3 else ""
+    return f"Component of {len(members)} villages ({shown}{more})"
+
+def _check_components(names: list[str], production: list[int], labels: np.ndarray, tail: np.ndarray) -> None:
+    production = np.asarray(production, dtype=np.int64)
+    supply = np.bincount(labels, weights=np.maximum(production, 0), minlength=len(names))
+    demand = np.bincount(labels, weights=np.maximum(-production, 0), minlength=len(names))
+    short = np.flatnonzero(demand > supply)
+    if len(short):
+        component = int(short[0])
+        raise InfeasibleError(f"{_describe_component(names, np.flatnonzero(labels == component))} needs "
+                              f"{int(demand[component])} but only produces {int(supply[component])}.")
+
+def _pack_components(labels: np.ndarray, tail: np.ndarray, workers: int) -> list[np.ndarray]:
+    """Split the components with arcs into at most `workers` groups of similar arc counts."""
+    sizes = np.bincount(labels[tail], minlength=len(labels))
+    components = np.flatnonzero(sizes)
+    bins = [(0, k, []) for k in range(min(workers, len(components)))]
+    for component in components[np.argsort(-sizes[components], kind='stable')].tolist():
+        load, k, members = heapq.heappop(bins)
+        members.append(component)
+        heapq.heappush(bins, (load + int(sizes[component]), k, members))
+    return [np.array(members) for _, _, members in sorted(bins, key=lambda b: b[1])]
+
+def _subproblem(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray,
+                cost: Optional[np.ndarray], villages: np.ndarray) -> tuple:
+    local = np.full(len(names), -1, dtype=np.int64)
+    local[villages] = np.arange(len(villages))
+    inside = local[tail] >= 0
+    return ([names[i] for i in villages.tolist()], [production[i] for i in villages.tolist()],
+            local[tail[inside]], local[head[inside]], cost[inside] if cost is not None else None)
+
+def _solve_groups(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray,
+                  cost: Optional[np.ndarray], initial: Optional[dict[str, dict[str, int]]], labels: np.ndarray,
+                  groups: list[np.ndarray], backend: str, budget: Optional[SolveBudget] = None) -> dict[str, dict[str, int]]:
+    def solve(components: np.ndarray) -> dict[str, dict[str, int]]:
+        villages = np.flatnonzero(np.isin(labels, components))
+        sub_names, sub_production, sub_tail, sub_head, sub_cost = _subproblem(names, production, tail, head, cost, villages)
+        try:
+            return BACKENDS[backend](sub_names, sub_production, sub_tail, sub_head, initial, sub_cost, budget)
+        except InfeasibleError as e:
+            if len(components) > 1:
+                # Find which component of the group failed, to name it.
+                for component in components:
+                    solve(np.array([component]))
+            raise InfeasibleError(f"{_describe_component(names, villages)} is infeasible: {e}") from None
+
+    if len(groups) == 1:
+        solutions = [solve(groups[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="component") as executor:
+            # Each group runs in a copy of this context, so its phases reach the same progress listener.
+            futures = [executor.submit(contextvars.copy_context().run, solve, group) for group in groups]
+            solutions = []
+            for future in as_completed(futures):
+                solutions.append(future.result())
+                report_progress({"type": "groups", "solved": len(solutions), "total": len(groups)})
+    result = {name: {} for name in names}
+    for solution in solutions:
+        result.update(solution)
+    return result
+
+def presolve(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray) -> tuple[np.ndarray, dict]:
+    """Find the arcs that can carry flow in some feasible solution, before any model is built.
+
+    Producers can only ship and consumers only receive, so arcs into a
+    producer or out of a consumer are dropped. Zero-production relays left
+    without an incoming or an outgoing arc cannot pass anything on, so their
+    arcs are dropped too, repeatedly. Returns the indices of the kept arcs
+    and a report of what was eliminated; raises InfeasibleError when a
+    consumer has no arc left to receive from.
+    """
+    production = np.asarray(production, dtype=np.int64)
+    n = len(production)
+    keep = (production[tail] >= 0) & (production[head] <= 0)
+    report = {"arcs": len(tail), "sign_arcs": int(len(tail) - keep.sum()), "relay_arcs": 0, "relays": 0}
+
+    relays = production == 0
+    while True:
+        indegree = np.bincount(head[keep], minlength=n)
+        outdegree = np.bincount(tail[keep], minlength=n)
+        dead = relays & ((indegree == 0) != (outdegree == 0))
+        if not dead.any():
+            break
+        removed = keep & (dead[tail] | dead[head])
+        report["relay_arcs"] += int(removed.sum())
+        report["relays"] += int(dead.sum())
+        keep &= ~removed
+
+    unreachable = np.flatnonzero((production < 0) & (indegree == 0))
+    if len(unreachable):
+        i = int(unreachable[0])
+        raise InfeasibleError(f"Village '{names[i]}' needs {-int(production[i])} but no allowed route reaches it"
+                              + (f" ({len(unreachable) - 1} more such villages)." if len(unreachable) > 1 else "."))
+    kept = np.flatnonzero(keep)
+    report["kept_arcs"] = len(kept)
+    return kept, report
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown solver backend '{backend}', expected one of {sorted(BACKENDS)}.")
+
+def allowed_arcs(names: list[str], forbidden_routes: set, senders: Optional[np.ndarray] = None,
+                 receivers: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Return `(tail, head)` index arrays of every non-forbidden arc between distinct villages.
+
+    `senders` / `receivers` restrict which villages may appear at either end
+    (default: all of them). Work is one vectorized pass per sending village,
+    so it stays proportional to the number of arcs produced.
+    """
+    n = len(names)
+    senders = np.arange(n) if senders is None else senders
+    receivers = np.arange(n) if receivers is None else receivers
+    index = {name: i for i, name in enumerate(names)}
+    blocked: dict[int, list[int]] = {}
+    for a, b in forbidden_routes:
+        if a in index and b in index:
+            blocked.setdefault(index[a], []).append(index[b])
+
+    tails, heads = [], []
+    for i in senders:
+        row = receivers[receivers != i]
+        if i in blocked:
+            row = row[~np.isin(row, blocked[i])]
+        tails.append(np.full(len(row), i, dtype=np.int64))
+        heads.append(row)
+    if not tails:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(tails), np.concatenate(heads).astype(np.int64)
+
+def build_model(production: list[int], tail: np.ndarray, head: np.ndarray,
+                cost: Optional[np.ndarray] = None) -> tuple[LpProblem, list[LpVariable]]:
+    """Build the integer program over the given arcs, in time linear in their number."""
     problem = LpProblem("VillageRouting", LpMinimize)
 
-    x = {
-        (i, j): LpVariable(f"x_{i}_{j}", lowBound=0, cat='Integer')
-        for i, j in allowed_routes
-    }
+    with solve_phase("variables", "pulp"):
+        x = [LpVariable(f"x_{i}_{j}", lowBound=0, cat='Integer') for i, j in zip(tail.tolist(), head.tolist())]
     
-    problem += lpSum(x[i, j] for i, j in allowed_routes), "Total_Routes"
-
-    # for i, village in enumerate(instance.villages):
-    #     if village.production >= 0:
-    #         problem += lpSum(x[i, j] for j in range(n) if (i, j) in allowed_routes) <= village.production, f"Production_Constraint_{i}"
-    #     else:
-    #         problem += lpSum(x[j, i] for j in range(n) if (j, i) in allowed_routes) >= -village.production, f"Consumption_Constraint_{i}"
-
-    for i, village in enumerate(instance.villages):
-        inflow = lpSum(x[j, i] for j in range(n) if (j, i) in allowed_routes)
-        outflow = lpSum(x[i, j] for j in range(n) if (i, j) in allowed_routes)
-        if village.production > 0:
-            problem += outflow <= village.production, f"Production_Constraint_{i}"
-            problem += inflow == 0, f"Inflows_Zero_{i}"
-        elif village.production < 0:
-            problem += inflow == -village.production, f"Consumption_Constraint_{i}"
-            problem += outflow == 0, f"Outflows_Zero_{i}"
+        if cost is None:
+            problem += lpSum(x), "Total_Routes"
         else:
-            problem += inflow == outflow, f"Balance_Constraint_{i}"
-        
+            problem += LpAffineExpression(zip(x, cost.tolist())), "Total_Distance"
 
+    with solve_phase("constraints", "pulp"):
+        _add_flow_constraints(problem, production, x, tail, head)
 
+    REGISTRY.set("game_assistant_solve_variables", len(x), "Variables in the last built model.", backend="pulp")
+    REGISTRY.set("game_assistant_solve_constraints", len(problem.constraints), "Constraints in the last built model.", backend="pulp")
+    return problem, x
 
-    # for (i, j), var in x.items():
-    #     var.setInitialValue(instance.routes_matrix[i, j])
-    
-    # solver = PULP_CBC_CMD(msg=False, warmStart=True)
-    # problem.solve(solver)
-    problem.solve()
+def _add_flow_constraints(problem: LpProblem, production: list[int], x: list[LpVariable],
+                          tail: np.ndarray, head: np.ndarray) -> None:
+    n = len(production)
+    incoming: list[list[LpVariable]] = [[] for _ in range(n)]
+    outgoing: list[list[LpVariable]] = [[] for _ in range(n)]
+    for var, i, j in zip(x, tail.tolist(), head.tolist()):
+        outgoing[i].append(var)
+        incoming[j].append(var)
+
+    # Villages without arcs on one side get no constraint for it, so a
+    # presolved arc set never produces empty rows.
+    for i, village_production in enumerate(production):
+        inflow = lpSum(incoming[i])
+        outflow = lpSum(outgoing[i])
+        if village_production > 0:
+            if outgoing[i]:
+                problem += outflow <= village_production, f"Production_Constraint_{i}"
+            if incoming[i]:
+                problem += inflow == 0, f"Inflows_Zero_{i}"
+        elif village_production < 0:
+            problem += inflow == -village_production, f"Consumption_Constraint_{i}"
+            if outgoing[i]:
+                problem += outflow == 0, f"Outflows_Zero_{i}"
+        elif incoming[i] or outgoing[i]:
+            problem += inflow == outflow, f"Balance_Constraint_{i}"
+
+def _solve_pulp(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray,
+                initial: Optional[dict[str, dict[str, int]]] = None,
+                cost: Optional[np.ndarray] = None, budget: Optional[SolveBudget] = None) -> dict[str, dict[str, int]]:
+    problem, x = build_model(production, tail, head, cost)
+
+    with solve_phase("solve", "pulp"):
+        if initial is not None:
+            for var, i, j in zip(x, tail.tolist(), head.tolist()):
+                var.setInitialValue(initial.get(names[i], {}).get(names[j], 0))
+        if budget is not None:
+            log = _solve_budgeted(problem, budget, warm_start=initial is not None)
+        elif initial is not None:
+            problem.solve(PULP_CBC_CMD(msg=False, warmStart=True))
+        else:
+            problem.solve()
     status = LpStatus[problem.status]
-    if status != 'Optimal':
-        raise ValueError(f"Problem status is not optimal: {status}")
+    if budget is not None and problem.sol_status in (LpSolutionOptimal, LpSolutionIntegerFeasible):
+        # Stopped at the deadline or gap with an incumbent: keep it, with the bound CBC proved.
+        objective = problem.objective.value() or 0.0
+        match = _CBC_LOWER_BOUND.search(log)
+        if match:
+            bound = float(match.group(1))
+        elif problem.sol_status == LpSolutionOptimal:
+            bound = objective
+        else:
+            bound = _lower_bound(production, tail, head, cost)
+        budget.record(objective, bound)
+    elif status != 'Optimal':
+        # CBC cut off before its first incumbent may also report the problem as infeasible.
+        if budget is not None and (status == 'Not Solved' or budget.expired()):
+            raise DeadlineError("No feasible solution found before the deadline.")
+        raise (InfeasibleError if status == 'Infeasible' else ValueError)(f"Problem status is not optimal: {status}")
     
-    result = {}
-    for i, village in enumerate(instance.villages):
-        result[village.name] = {}
-        for j in range(n):
-            if (i, j) in x and x[i, j].varValue > 0:
-                target_village = instance.villages[j].name
-                result[village.name][target_village] = int(x[i, j].varValue)
+    with solve_phase("extract", "pulp"):
+        result = {name: {} for name in names}
+        for var, i, j in zip(x, tail.tolist(), head.tolist()):
+            if var.varValue > 0:
+                result[names[i]][names[j]] = int(var.varValue)
 
     return result
+
+def _solve_budgeted(problem: LpProblem, budget: SolveBudget, warm_start: bool) -> str:
+    """Run CBC with the budget's remaining time and gap as limits; returns its log."""
+    remaining = budget.remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineError("No feasible solution found before the deadline.")
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, "cbc.log")
+        problem.solve(PULP_CBC_CMD(msg=False, warmStart=warm_start, timeLimit=remaining, gapRel=budget.gap,
+                                   logPath=log_path))
+        with open(log_path) as file:
+            return file.read()
+
+def _transport(supply: np.ndarray, demand: np.ndarray, tail: np.ndarray, head: np.ndarray,
+               cost: Optional[np.ndarray] = None, deadline: Optional[float] = None) -> tuple[np.ndarray, bool]:
+    """Route `demand` from villages with spare `supply` over the given arcs at minimum cost.
+
+    Returns the flow on each arc and whether all demand could be met, which
+    is also false when the `time.perf_counter()` `deadline` passed first.
+    """
+    n = len(supply)
+    sources = np.flatnonzero(supply > 0)
+    sinks = np.flatnonzero(demand > 0)
+    required = int(demand[sinks].sum())
+    arc_count = len(tail)
+    cost = np.ones(arc_count, dtype=np.int64) if cost is None else cost
+
+    # Nodes 0..n-1 are villages, n is the super source and n + 1 the super sink.
+    source, sink = n, n + 1
+    flow, sent = min_cost_flow(
+        n + 2,
+        np.concatenate([tail, np.full(len(sources), source), sinks]),
+        np.concatenate([head, sources, np.full(len(sinks), sink)]),
+        np.concatenate([np.full(arc_count, max(int(supply.sum()), 1)), supply[sources], demand[sinks]]),
+        np.concatenate([cost, np.zeros(len(sources) + len(sinks), dtype=np.int64)]),
+        source, sink, required, deadline,
+    )
+    return flow[:arc_count], sent == required
+
+def _solve_min_cost_flow(names: list[str], production: list[int], tail: np.ndarray, head: np.ndarray,
+                         initial: Optional[dict[str, dict[str, int]]] = None,
+                         cost: Optional[np.ndarray] = None, budget: Optional[SolveBudget] = None) -> dict[str, dict[str, int]]:
+    """Solve as a min-cost flow instead of an integer program.
+
+    Expects presolved arcs (see `presolve`); zero-production villages keep
+    both directions and act as relays. The flow is exact, so a budget's
+    gap is irrelevant, and a partial flow cut off by its deadline is unusable.
+    """
+    production = np.asarray(production, dtype=np.int64)
+
+    with solve_phase("solve", "mincostflow"):
+        flow, feasible = _transport(np.maximum(production, 0), np.maximum(-production, 0), tail, head, cost,
+                                    budget.deadline if budget is not None else None)
+    if not feasible:
+        if budget is not None and budget.expired():
+            raise DeadlineError("No feasible solution found before the deadline.")
+        raise InfeasibleError("Problem status is not optimal: Infeasible")
+    if budget is not None:
+        objective = float(flow @ cost) if cost is not None else float(flow.sum())
+        budget.record(objective, objective)
+
+    with solve_phase("extract", "mincostflow"):
+        return _flow_solution(names, tail, head, flow)
+
+def _flow_solution(names: list[str], tail: np.ndarray, head: np.ndarray, flow: np.ndarray) -> dict[str, dict[str, int]]:
+    result = {name: {} for name in names}
+    for k in np.flatnonzero(flow):
+        result[names[tail[k]]][names[head[k]]] = int(flow[k])
+    return result
+
+def _repair(instance: Instance, previous: dict[str, dict[str, int]], forbidden_routes: set) -> tuple[Optional[dict[str, dict[str, int]]], bool]:
+    """Patch `previous` into a feasible solution for the current instance.
+
+    Flows on arcs that are no longer valid are dropped, flows that now
+    exceed a producer's output or a consumer's need are trimmed (following
+    relays so they stay balanced), and the remaining deficit is routed from
+    spare supply only. Returns `(solution, optimal)`, where the solution is
+    None if the deficit cannot be covered that way and `optimal` tells
+    whether it provably matches a full solve (every unit moved exactly once).
+    """
+    names = instance.names
+    index = instance.villages_map
+    production = instance.production.copy()
+    n = len(names)
+
+    outgoing: list[dict[int, int]] = [{} for _ in range(n)]
+    incoming: list[dict[int, int]] = [{} for _ in range(n)]
+    for source, routes in previous.items():
+        i = index.get(source)
+        if i is None or production[i] < 0:
+            continue
+        for target, amount in routes.items():
+            j = index.get(target)
+            if j is None or j == i or amount <= 0 or production[j] > 0 or (source, target) in forbidden_routes:
+                continue
+            outgoing[i][j] = amount
+            incoming[j][i] = amount
+    inflow = np.array([sum(arcs.values()) for arcs in incoming], dtype=np.int64)
+    outflow = np.array([sum(arcs.values()) for arcs in outgoing], dtype=np.int64)
+
+    def cut(i: int, j: int, amount: int) -> None:
+        outgoing[i][j] -= amount
+        incoming[j][i] -= amount
+        if not outgoing[i][j]:
+            del outgoing[i][j], incoming[j][i]
+        outflow[i] -= amount
+        inflow[j] -= amount
+
+    pending = list(range(n))
+    while pending:
+        v = pending.pop()
+        if production[v] > 0 or (production[v] == 0 and outflow[v] > inflow[v]):
+            excess = outflow[v] - (production[v] if production[v] > 0 else inflow[v])
+            for j in list(outgoing[v]):
+                if excess <= 0:
+                    break
+                amount = min(excess, outgoing[v][j])
+                cut(v, j, amount)
+                excess -= amount
+                if production[j] == 0:
+                    pending.append(j)
+        elif production[v] < 0 or inflow[v] > outflow[v]:
+            excess = inflow[v] - (-production[v] if production[v] < 0 else outflow[v])
+            for i in list(incoming[v]):
+                if excess <= 0:
+                    break
+                amount = min(excess, incoming[v][i])
+                cut(i, v, amount)
+                excess -= amount
+                if production[i] == 0:
+                    pending.append(i)
+
+    spare = np.where(production > 0, production - outflow, 0)
+    deficit = np.where(production < 0, -production - inflow, 0)
+    if deficit.sum():
+        relays = production == 0
+        tail, head = allowed_arcs(names, forbidden_routes, np.flatnonzero((spare > 0) | relays), np.flatnonzero((deficit > 0) | relays))
+        flow, feasible = _transport(spare, deficit, tail, head)
+        if not feasible:
+            return None, False
+        for k in np.flatnonzero(flow):
+            i, j = int(tail[k]), int(head[k])
+            outgoing[i][j] = outgoing[i].get(j, 0) + int(flow[k])
+
+    result = {name: {names[j]: int(amount) for j, amount in outgoing[i].items()} for i, name in enumerate(names)}
+    moved = sum(sum(routes.values()) for routes in result.values())
+    return result, moved == int(np.maximum(-production, 0).sum())
+
+def resolve_instance(instance: Instance, previous: Optional[dict[str, dict[str, int]]] = None,
+                     forbidden_routes: Optional[set] = set(), backend: str = 'pulp') -> tuple[dict[str, dict[str, int]], dict]:
+    """Re-solve after a small edit, starting from `previous` (default: the instance's current routes).
+
+    The previous flow is repaired in place when the result is provably
+    optimal; otherwise the instance is solved in full, warm-started from the
+    repaired (or previous) flow when the backend supports it. Returns the
+    solution and a report with the path taken and the time spent on each step.
+    """
+    if not instance.villages:
+        raise ValueError("Instance has no villages.")
+    _check_backend(backend)
+    forbidden_routes = forbidden_routes or set()
+    if previous is None:
+        previous = {village.name: dict(village.route_items()) for village in instance.villages}
+
+    report = {"path": None, "repair_seconds": 0.0, "solve_seconds": 0.0}
+    start = time.perf_counter()
+    repaired, optimal = _repair(instance, previous, forbidden_routes)
+    report["repair_seconds"] = time.perf_counter() - start
+    if optimal:
+        report["path"] = "repair"
+        return repaired, report
+
+    start = time.perf_counter()
+    names = instance.names
+    production = instance.production.tolist()
+    tail, head = allowed_arcs(names, forbidden_routes)
+    solution = solve_arcs(names, production, tail, head, backend=backend,
+                          initial=repaired if repaired is not None else previous)
+    report["solve_seconds"] = time.perf_counter() - start
+    report["path"] = "warm_start" if backend == 'pulp' else "full"
+    return solution, report
+
+BACKENDS = {
+    'pulp': _solve_pulp,
+    'mincostflow': _solve_min_cost_flow,
+}
@@ -1,46 +1,105 @@
 import unicodedata
 import re
 
-from game_assistant.models import Village, Instance
+import numpy as np
 
-def clean_text(text):
-    text = unicodedata.normalize('NFKC', text)
+from game_assistant.models import Instance
 
-    replacements = {
-        '\u00a0': ' ',
-        '“': '"', '”': '"',
-        '‘': "'", '’': "'",
-        '…': '...',
-        '\u2212': '-',
-        '\u202D': '', '\u202E': '', '\u202C': '',
-    }
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
+# One `str.translate` pass: typographic characters to ASCII, invisible ones removed.
+_TRANSLATION = str.maketrans({
+    '\u00a0': ' ',
+    '\u201c': '"', '\u201d': '"',
+    '\u2018': "'", '\u2019': "'",
+    '\u2026': '...',
+    '\u2212': '-',
+    '\u202d': None, '\u202e': None, '\u202c': None,
+    '\u200b': None, '\u200c': None, '\u200d': None, '\ufeff': None,
+    '\r': None,
+})
+_SPACES = re.compile(r'[ \t]+')
 
-    invisible_chars = ['\u200b', '\u200c', '\u200d', '\ufeff']
-    for char in invisible_chars:
-        text = text.replace(char, '')
+# Matches every line that starts like `(x|y)`, together with the text line
+# before it (the village name) when there is one. `x` and `y` are only set when
+# the coordinates are well-formed; every other line is skipped by the engine.
+_VILLAGE = re.compile(r'^(?:(?P<name>(?! ?\(.*\|)[^\n]*)\n)?'
+                      r' ?\((?:(?P<x> ?-?\d+ ?)\|(?P<y> ?-?\d+ ?)\) ?$|.*\|.*$)', re.MULTILINE)
 
-    text = re.sub(r'[ \t]+', ' ', text)
+# How many malformed lines a PasteError message spells out.
+MAX_REPORTED_ERRORS = 10
 
-    return text.strip()
+class PasteError(ValueError):
+    """Raised with every malformed line of a paste, as `(line_number, message)` pairs."""
 
-def parse_instance(input_str: str) -> Instance:
-    lines = input_str.strip().split('\n')
-    villages = []
+    def __init__(self, errors: list[tuple[int, str]]):
+        self.errors = errors
+        super().__init__(format_errors(errors))
+
+def format_errors(errors: list[tuple[int, str]], limit: int = MAX_REPORTED_ERRORS) -> str:
+    lines = [f"line {line_number}: {message}" for line_number, message in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"and {len(errors) - limit} more")
+    return f"{len(errors)} malformed line(s): " + "; ".join(lines)
+
+def _normalize(text: str) -> str:
+    return _SPACES.sub(' ', unicodedata.normalize('NFKC', text).translate(_TRANSLATION))
+
+def clean_text(text):
+    return _normalize(text).strip()
 
-    pattern = r'^\s*\(\s*-?\d+\s*\|\s*-?\d+\s*\)$'
+def scan_villages(text: str, errors: list[tuple[int, str]]) -> tuple[list[str], list[tuple[int, int]]]:
+    """Find every name line followed by a `(x|y)` coordinates line in normalized text.
 
-    l1 = lines.pop(0).strip()
-    while lines:
-        l2 = lines.pop(0).strip()
-        if re.match(pattern, l2) is not None:
-            name = l1.strip()
-            production = 0
-            villages.append(Village(name=name, production=production))
-        l1 = l2
-    return Instance(villages=villages)
+    One compiled pattern walks the whole text, so the cost is linear in its
+    size. Returns the names and their coordinates; coordinates without a name
+    on the line before, unparseable coordinates and duplicate names are
+    appended to `errors` as `(line_number, message)`.
+    """
+    names: list[str] = []
+    coordinates: list[tuple[int, int]] = []
+    seen: dict[str, int] = {}
+    counted = [0, 1]
+
+    def line_of(position: int) -> int:
+        # Errors mostly come in text order, so newlines are counted from the last
+        # reported position; only a duplicate's first line looks backwards.
+        if position < counted[0]:
+            return counted[1] - text.count('\n', position, counted[0])
+        counted[1] += text.count('\n', counted[0], position)
+        counted[0] = position
+        return counted[1]
+
+    for match in _VILLAGE.finditer(text):
+        name, x = match.group('name'), match.group('x')
+        line_start = match.end('name') + 1 if name is not None else match.start()
+        if x is None:
+            errors.append((line_of(line_start), f"malformed coordinates '{match.group()[line_start - match.start():].strip()}'"))
+            continue
+        name = name.strip() if name is not None else ""
+        if not name:
+            errors.append((line_of(line_start), "coordinates without a village name on the line before"))
+        elif name in seen:
+            line_number = line_of(line_start)
+            errors.append((line_number, f"duplicate village '{name}' (first on line {line_of(seen[name])})"))
+        else:
+            seen[name] = match.start()
+            names.append(name)
+            coordinates.append((int(x), int(match.group('y'))))
+    return names, coordinates
+
+def parse_paste(input_str: str) -> tuple[Instance, list[tuple[int, str]]]:
+    """Parse a pasted village list, returning the instance and every malformed line."""
+    errors: list[tuple[int, str]] = []
+    names, coordinates = scan_villages(_normalize(input_str), errors)
+    empty = np.zeros(0, dtype=np.int64)
+    instance = Instance.from_arrays(names, np.zeros(len(names), dtype=np.int64), np.zeros(len(names) + 1, dtype=np.int64),
+                                    empty, empty, np.array(coordinates, dtype=np.int64).reshape(-1, 2))
+    return instance, errors
+
+def parse_instance(input_str: str) -> Instance:
+    instance, errors = parse_paste(input_str)
+    if errors:
+        raise PasteError(errors)
+    return instance
 
 def get_instance_from_input(input_str: str) -> Instance:
-    cleaned_input = clean_text(input_str)
-    return parse_instance(cleaned_input)
+    return parse_instance(input_str)
@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import json
+import time
+
+import numpy as np
+
+from game_assistant.models import Instance
+from game_assistant.optimal import allowed_arcs, solve_arcs
+
+# Base model shared by every scenario solved in a worker process, set once per
+# process by `_init_worker` so tasks only carry their patch.
+_base: dict = {}
+
+def _init_worker(names: list[str], production: np.ndarray, tail: np.ndarray, head: np.ndarray, backend: str) -> None:
+    _base.update(names=names, production=production, tail=tail, head=head, backend=backend)
+
+def apply_scenario(names: list[str], production: np.ndarray, tail: np.ndarray, head: np.ndarray,
+                   scenario: dict) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Apply a scenario patch to the base arrays without rebuilding the arc set.
+
+    A patch may contain `production` (`{name: value}`), `production_delta`
+    (`{name: delta}`), `forbidden_routes` (`[[from, to], ...]`, on top of the
+    base ones) and `remove` (`[name, ...]`).
+    """
+    index = {name: i for i, name in enumerate(names)}
+
+    def lookup(name: str) -> int:
+        if name not in index:
+            raise ValueError(f"Village '{name}' does not exist.")
+        return index[name]
+
+    production = production.copy()
+    for name, value in scenario.get("production", {}).items():
+        production[lookup(name)] = value
+    for name, delta in scenario.get("production_delta", {}).items():
+        production[lookup(name)] += delta
+
+    keep_arc = np.ones(len(tail), dtype=bool)
+    forbidden = [(lookup(a), lookup(b)) for a, b in scenario.get("forbidden_routes", [])]
+    if forbidden:
+        n = len(names)
+        codes = np.array([i * n + j for i, j in forbidden], dtype=np.int64)
+        keep_arc &= ~np.isin(tail * n + head, codes)
+
+    removed = np.zeros(len(names), dtype=bool)
+    removed[[lookup(name) for name in scenario.get("remove", [])]] = True
+    if removed.any():
+        keep_arc &= ~removed[tail] & ~removed[head]
+        renumber = np.cumsum(~removed) - 1
+        names = [name for name, gone in zip(names, removed) if not gone]
+        production = production[~removed]
+        return names, production, renumber[tail[keep_arc]], renumber[head[keep_arc]]
+    return names, production, tail[keep_arc], head[keep_arc]
+
+def _solve_scenario(scenario: dict) -> dict:
+    start = time.perf_counter()
+    try:
+        names, production, tail, head = apply_scenario(_base["names"], _base["production"], _base["tail"], _base["head"], scenario)
+        solution = solve_arcs(names, production.tolist(), tail, head, backend=_base["backend"])
+        return {"solution": solution, "error": None, "seconds": time.perf_counter() - start}
+    except ValueError as e:
+        return {"solution": None, "error": str(e), "seconds": time.perf_counter() - start}
+
+def _route_diff(base: dict[str, dict[str, int]], other: dict[str, dict[str, int]]) -> dict[str, list]:
+    base_arcs = {(a, b): amount for a, routes in base.items() for b, amount in routes.items()}
+    other_arcs = {(a, b): amount for a, routes in other.items() for b, amount in routes.items()}
+    return {
+        "added": [[a, b, other_arcs[a, b]] for a, b in other_arcs.keys() - base_arcs.keys()],
+        "removed": [[a, b, base_arcs[a, b]] for a, b in base_arcs.keys() - other_arcs.keys()],
+        "changed": [[a, b, base_arcs[a, b], other_arcs[a, b]]
+                    for a, b in base_arcs.keys() & other_arcs.keys() if base_arcs[a, b] != other_arcs[a, b]],
+    }
+
+def solve_scenarios(instance: Instance, scenarios: list[dict], forbidden_routes: Optional[set] = set(),
+                    backend: str = 'pulp', max_workers: Optional[int] = None) -> list[dict]:
+    """Solve the base instance and every scenario patch on a process pool.
+
+    The arc set is built once from the base instance and handed to each
+    worker at start-up; scenarios only ship their patch. Returns one row per
+    scenario (the base first) with its status, objective and route diff
+    against the base solution.
+    """
+    if not instance.villages:
+        raise ValueError("Instance has no villages.")
+    names = list(instance.names)
+    production = instance.production.copy()
+    tail, head = allowed_arcs(names, forbidden_routes or set())
+
+    named = [{"name": "base"}] + [dict(scenario, name=scenario.get("name", f"scenario_{i}")) for i, scenario in enumerate(scenarios, 1)]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(names, production, tail, head, backend)) as executor:
+        outcomes = list(executor.map(_solve_scenario, named))
+
+    base_solution = outcomes[0]["solution"]
+    rows = []
+    for scenario, outcome in zip(named, outcomes):
+        solution = outcome["solution"]
+        row = {
+            "scenario": scenario["name"],
+            "status": "optimal" if solution is not None else "failed",
+            "error": outcome["error"],
+            "objective": sum(sum(routes.values()) for routes in solution.values()) if solution is not None else None,
+            "seconds": outcome["seconds"],
+            "solution": solution,
+        }
+        if solution is not None and base_solution is not None:
+            row["diff"] = _route_diff(base_solution, solution)
+        rows.append(row)
+    return rows
+
+def format_table(rows: list[dict]) -> str:
+    lines = [f"{'scenario':<24} {'status':<8} {'objective':>10} {'added':>6} {'removed':>8} {'changed':>8} {'seconds':>8}"]
+    for row in rows:
+        diff = row.get("diff")
+        counts = [len(diff[k]) if diff else "-" for k in ("added", "removed", "changed")]
+        objective = row["objective"] if row["objective"] is not None else "-"
+        lines.append(f"{row['scenario']:<24} {row['status']:<8} {objective:>10} {counts[0]:>6} {counts[1]:>8} {counts[2]:>8} {row['seconds']:>8.3f}")
+        if row["error"]:
+            lines.append(f"    {row['error']}")
+    return "\n".join(lines)
+
+def load_scenarios(file_path: str) -> list[dict]:
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    return data.get("scenarios", []) if isinstance(data, dict) else data
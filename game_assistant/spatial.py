@@ -0,0 +1,108 @@
+import numpy as np
+
+# Euclidean distances are scaled by this factor and rounded to integer arc costs,
+# so both backends optimize the same objective with exact arithmetic.
+DISTANCE_SCALE = 100
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate `range(start, start + count)` for every pair, without a Python loop."""
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(int(counts.sum()), dtype=np.int64) - offsets + np.repeat(starts, counts)
+
+class SpatialIndex:
+    """Uniform grid over village map coordinates for radius and k-nearest queries.
+
+    `coordinates` is an `(n, 2)` array with NaN rows for villages without a
+    position (as returned by `Instance.coordinates`); those are never
+    returned by queries. Queries bucket points into square cells of the
+    query radius and only compare points in neighbouring cells, so the work
+    is proportional to the number of pairs found rather than to n².
+    """
+
+    def __init__(self, coordinates: np.ndarray):
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.size = len(coordinates)
+        self.placed = np.flatnonzero(~np.isnan(coordinates).any(axis=1))
+        self.points = coordinates[self.placed]
+
+    @property
+    def extent(self) -> float:
+        """Diagonal of the bounding box of the placed villages."""
+        if not len(self.points):
+            return 0.0
+        return float(np.hypot(*(self.points.max(axis=0) - self.points.min(axis=0))))
+
+    def distances(self, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+        """Distance between village ids `tail[k]` and `head[k]`, NaN when either has no position."""
+        positions = np.full((self.size, 2), np.nan)
+        positions[self.placed] = self.points
+        return np.hypot(*(positions[tail] - positions[head]).T)
+
+    def radius_pairs(self, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Return `(tail, head)` village ids of every pair of distinct placed villages within `radius`."""
+        if radius <= 0:
+            raise ValueError(f"Radius must be positive, got {radius}.")
+        tail, head = self._within(radius, np.arange(len(self.points)))
+        return self.placed[tail], self.placed[head]
+
+    def _within(self, radius: float, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Pairs of positions in `self.points` within `radius`, with tails restricted to `queries`."""
+        if not len(queries):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        origin = self.points.min(axis=0)
+        cells = np.floor((self.points - origin) / radius).astype(np.int64) + 1
+        width = int(cells[:, 1].max()) + 2
+        keys = cells[:, 0] * width + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        tails, heads = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                wanted = keys[queries] + dx * width + dy
+                starts = np.searchsorted(sorted_keys, wanted, 'left')
+                counts = np.searchsorted(sorted_keys, wanted, 'right') - starts
+                tail = np.repeat(queries, counts)
+                head = order[_expand(starts, counts)]
+                near = (tail != head) & (np.hypot(*(self.points[tail] - self.points[head]).T) <= radius)
+                tails.append(tail[near])
+                heads.append(head[near])
+        return np.concatenate(tails), np.concatenate(heads)
+
+    def knn_pairs(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return `(tail, head)` village ids pairing each placed village with its `k` nearest neighbours.
+
+        The radius starts from the one expected to hold `k` neighbours at the
+        map's average density and doubles for the villages still short of
+        `k`, so dense areas are never searched with a wide radius.
+        """
+        if k < 1:
+            raise ValueError(f"Number of neighbours must be at least 1, got {k}.")
+        n = len(self.points)
+        k = min(k, n - 1)
+        if k < 1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        span = self.points.max(axis=0) - self.points.min(axis=0)
+        radius = max(float(np.sqrt(max(span[0], 1) * max(span[1], 1) * (k + 1) / (np.pi * n))), 1.0)
+
+        tails, heads = [], []
+        pending = np.arange(n)
+        while len(pending):
+            tail, head = self._within(radius, pending)
+            found = np.bincount(tail, minlength=n)[pending]
+            done = pending[found >= k] if radius < self.extent else pending
+            keep = np.isin(tail, done)
+            tail, head = tail[keep], head[keep]
+            order = np.lexsort((np.hypot(*(self.points[tail] - self.points[head]).T), tail))
+            tail, head = tail[order], head[order]
+            starts = np.searchsorted(tail, done)
+            rank = np.arange(len(tail)) - np.repeat(starts, np.bincount(tail, minlength=n)[done])
+            tails.append(tail[rank < k])
+            heads.append(head[rank < k])
+            pending = np.setdiff1d(pending, done, assume_unique=True)
+            radius *= 2
+        return self.placed[np.concatenate(tails)], self.placed[np.concatenate(heads)]
+
+def distance_costs(index: SpatialIndex, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+    """Integer arc costs proportional to travel distance; every village must have coordinates."""
+    return np.rint(index.distances(tail, head) * DISTANCE_SCALE).astype(np.int64)
@@ -0,0 +1,54 @@
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from game_assistant.metrics import REGISTRY
+
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+def warm_up(backend: str = 'pulp') -> float:
+    """Import the solver stack and run a two-village solve through `backend`, returning the seconds it took.
+
+    Run on a solver worker at startup (see `JobManager.prewarm`), this moves
+    the imports, the CBC binary lookup and its first start off the first
+    real solve, and fails loudly if the backend cannot run here.
+    """
+    start = time.perf_counter()
+    from game_assistant.optimal import SolveBudget, solve_arcs
+    # An unlimited budget only keeps CBC quiet.
+    solve_arcs(["A", "B"], [1, -1], np.array([0]), np.array([1]), backend=backend, budget=SolveBudget())
+    seconds = time.perf_counter() - start
+    REGISTRY.set("game_assistant_solver_warmup_seconds", seconds,
+                 "Time to import the solver stack and run a first solve.", backend=backend)
+    return seconds
+
+def import_profile(module: str = 'game_assistant.app') -> list[dict]:
+    """Import `module` in a fresh interpreter under `-X importtime`.
+
+    Returns one row per imported module, in import order, with its own and
+    cumulative import time in seconds and its nesting depth (0 for the
+    modules imported directly).
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True)
+    if process.returncode:
+        raise ValueError(f"Importing {module} failed: {process.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            rows.append({"module": match.group(4), "self": int(match.group(1)) / 1e6,
+                         "cumulative": int(match.group(2)) / 1e6, "depth": (len(match.group(3)) - 1) // 2})
+    return rows
+
+def format_import_profile(rows: list[dict], limit: int = 15) -> str:
+    """The total import time and the slowest `limit` modules by cumulative time, as a table."""
+    total = sum(row["cumulative"] for row in rows if row["depth"] == 0)
+    slowest = sorted(rows, key=lambda row: row["cumulative"], reverse=True)[:limit]
+    lines = [f"{'module':<40} {'self ms':>9} {'total ms':>9}"]
+    lines += [f"{row['module']:<40} {row['self'] * 1000:9.1f} {row['cumulative'] * 1000:9.1f}" for row in slowest]
+    lines.append(f"{'all imports':<40} {'':>9} {total * 1000:9.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,144 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+import json
+import sqlite3
+import threading
+import time
+
+from game_assistant.models import Instance
+
+class ConflictError(ValueError):
+    """Raised when a commit is based on a state version that is no longer the latest."""
+
+    def __init__(self, expected: int, actual: int):
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"State changed from version {expected} to {actual} in the meantime; reload and retry.")
+
+class StateStore(ABC):
+    """Versioned instance and solution state shared by every worker of the app.
+
+    Each commit stores a full snapshot under the next version number, and only
+    succeeds if the caller's `expected_version` is still the latest one
+    (optimistic concurrency); readers compare `version()` with the version
+    they hold and only `load()` when it moved. Version 0 is the empty state.
+    """
+
+    @abstractmethod
+    def version(self) -> int:
+        """The latest version."""
+
+    @abstractmethod
+    def load(self, version: Optional[int] = None) -> tuple[int, Instance, dict[str, dict[str, int]]]:
+        """Return `(version, instance, solution)` for the latest or the given retained version."""
+
+    @abstractmethod
+    def commit(self, expected_version: int, instance: Instance, solution: dict[str, dict[str, int]]) -> int:
+        """Store a new snapshot on top of `expected_version` and return its version."""
+
+def _encode(instance: Instance, solution: dict[str, dict[str, int]]) -> tuple[str, str]:
+    return (json.dumps(instance.to_dict(), separators=(',', ':')),
+            json.dumps({source: dict(routes) for source, routes in solution.items()}, separators=(',', ':')))
+
+class MemoryStore(StateStore):
+    """Process-local store, for a single worker and for tests."""
+
+    def __init__(self, history: int = 20):
+        self.history = history
+        self._snapshots: dict[int, tuple[str, str]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        return self._version
+
+    def load(self, version: Optional[int] = None) -> tuple[int, Instance, dict[str, dict[str, int]]]:
+        with self._lock:
+            version = self._version if version is None else version
+            if version == 0:
+                return 0, Instance(), {}
+            if version not in self._snapshots:
+                raise ValueError(f"State version {version} is not retained.")
+            instance, solution = self._snapshots[version]
+        return version, Instance.from_dict(json.loads(instance)), json.loads(solution)
+
+    def commit(self, expected_version: int, instance: Instance, solution: dict[str, dict[str, int]]) -> int:
+        encoded = _encode(instance, solution)
+        with self._lock:
+            if self._version != expected_version:
+                raise ConflictError(expected_version, self._version)
+            self._version += 1
+            self._snapshots[self._version] = encoded
+            self._snapshots.pop(self._version - self.history, None)
+            return self._version
+
+class SQLiteStore(StateStore):
+    """Store backed by a SQLite database in WAL mode, shared by processes on one machine.
+
+    Readers never block the writer. Writers are serialized by `BEGIN
+    IMMEDIATE`, and the version check happens inside that transaction.
+    The last `history` snapshots are retained.
+    """
+
+    def __init__(self, path: str, history: int = 20, timeout: float = 30.0):
+        if history < 1:
+            raise ValueError("State history must keep at least 1 version.")
+        self.path = path
+        self.history = history
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS snapshots ("
+                               "version INTEGER PRIMARY KEY, instance TEXT NOT NULL, "
+                               "solution TEXT NOT NULL, created REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared between threads, so each thread opens its own.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def version(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(version), 0) FROM snapshots").fetchone()[0]
+
+    def load(self, version: Optional[int] = None) -> tuple[int, Instance, dict[str, dict[str, int]]]:
+        connection = self._connection()
+        if version is None:
+            row = connection.execute("SELECT version, instance, solution FROM snapshots ORDER BY version DESC LIMIT 1").fetchone()
+            if row is None:
+                return 0, Instance(), {}
+        else:
+            row = connection.execute("SELECT version, instance, solution FROM snapshots WHERE version = ?", (version,)).fetchone()
+            if row is None:
+                raise ValueError(f"State version {version} is not retained.")
+        return row[0], Instance.from_dict(json.loads(row[1])), json.loads(row[2])
+
+    def commit(self, expected_version: int, instance: Instance, solution: dict[str, dict[str, int]]) -> int:
+        instance_json, solution_json = _encode(instance, solution)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = connection.execute("SELECT COALESCE(MAX(version), 0) FROM snapshots").fetchone()[0]
+            if current != expected_version:
+                raise ConflictError(expected_version, current)
+            version = current + 1
+            connection.execute("INSERT INTO snapshots (version, instance, solution, created) VALUES (?, ?, ?, ?)",
+                               (version, instance_json, solution_json, time.time()))
+            connection.execute("DELETE FROM snapshots WHERE version <= ?", (version - self.history,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return version
+
+def open_store(location: Optional[str]) -> Optional[StateStore]:
+    """Store for a `--state` / `GAME_ASSISTANT_STATE` value: a SQLite path, `memory`, or None for none."""
+    if not location:
+        return None
+    if location == 'memory':
+        return MemoryStore()
+    return SQLiteStore(location)
@@ -0,0 +1,203 @@
+from typing import IO, Iterator
+import argparse
+import json
+import os
+
+import numpy as np
+
+from game_assistant.models import Instance, Village
+from game_assistant.table import NO_COORDINATE
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+SNAPSHOT_EXTENSIONS = ('.snap',)
+
+# Snapshot layout: magic, little-endian uint64 header length, JSON header, then
+# each array 8-byte aligned at the offset recorded in the header.
+SNAPSHOT_MAGIC = b"GASNAP01"
+SNAPSHOT_VERSION = 3
+# Version 1 snapshots have no coordinates column, versions 1 and 2 no resources; they still load.
+_READABLE_VERSIONS = (1, 2, 3)
+_ALIGN = 8
+
+def iter_villages_ndjson(file: IO[str]) -> Iterator[Village]:
+    """Yield one Village per non-empty line of a newline-delimited JSON stream."""
+    for line_number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e.msg}).") from None
+        if not isinstance(data, dict):
+            raise ValueError(f"Line {line_number}: expected a village object.")
+        yield Village.from_dict(data)
+
+def load_ndjson(file_path: str) -> Instance:
+    """Load an instance from newline-delimited village records, one line at a time."""
+    with open(file_path, 'r') as file:
+        return Instance(villages=list(iter_villages_ndjson(file)))
+
+def save_ndjson(instance: Instance, file_path: str) -> None:
+    with open(file_path, 'w') as file:
+        for village in instance.villages:
+            file.write(json.dumps(village.to_dict(), separators=(',', ':')))
+            file.write('\n')
+
+def _int_array(values: list, what: str) -> np.ndarray:
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise ValueError(f"Snapshots only store integer {what}.")
+    return np.array(values, dtype=np.int64)
+
+def _encode_names(names: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def _decode_names(offsets: np.ndarray, data: np.ndarray) -> list[str]:
+    data, offsets = data.tobytes(), offsets.tolist()
+    text = data.decode('utf-8')
+    if len(text) == len(data):
+        # ASCII only, so byte offsets are character offsets and one decode does.
+        return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+    return [data[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+def snapshot_arrays(instance: Instance) -> dict[str, np.ndarray]:
+    """Arrays of a binary snapshot of the instance, independent of later edits to it.
+
+    Villages come first in the names table, followed by route targets that are
+    not villages of the instance, so dangling routes survive a round trip.
+    Route order within each village is kept.
+    """
+    villages = instance.villages
+    names = list(instance.names)
+    index = {name: i for i, name in enumerate(names)}
+    targets, amounts, counts = [], [], []
+    for village in villages:
+        start = len(targets)
+        for target, amount in village.route_items():
+            if target not in index:
+                index[target] = len(names)
+                names.append(target)
+            targets.append(index[target])
+            amounts.append(amount)
+        counts.append(len(targets) - start)
+
+    name_offsets, name_bytes = _encode_names(names)
+    resource_offsets, resource_bytes = _encode_names(instance.resources)
+    route_indptr = np.zeros(len(villages) + 1, dtype=np.int64)
+    np.cumsum(counts, out=route_indptr[1:])
+    arrays = {
+        "production": np.array(instance.production, dtype=np.int64),
+        "name_offsets": name_offsets,
+        "name_bytes": name_bytes,
+        "route_indptr": route_indptr,
+        "route_targets": np.array(targets, dtype=np.int64),
+        "route_amounts": _int_array(amounts, "route amounts"),
+        "coordinates": np.array([village.coordinates or (NO_COORDINATE, NO_COORDINATE) for village in villages],
+                                dtype=np.int64).reshape(-1),
+        "resource_name_offsets": resource_offsets,
+        "resource_name_bytes": resource_bytes,
+        # One block of village productions per resource.
+        "resource_production": instance.resource_production().T.reshape(-1),
+    }
+    return arrays
+
+def write_snapshot(arrays: dict[str, np.ndarray], file_path: str) -> None:
+    """Write arrays from `snapshot_arrays` as a snapshot file."""
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        layout[key] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({"version": SNAPSHOT_VERSION, "villages": len(arrays["production"]), "arrays": layout}).encode()
+    header += b" " * (-(len(SNAPSHOT_MAGIC) + 8 + len(header)) % _ALIGN)
+    with open(file_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(np.uint64(len(header)).astype('<u8').tobytes())
+        file.write(header)
+        for array in arrays.values():
+            file.write(array.tobytes())
+            file.write(b"\0" * (-array.nbytes % _ALIGN))
+
+def save_snapshot(instance: Instance, file_path: str) -> None:
+    """Write the instance as a binary snapshot."""
+    write_snapshot(snapshot_arrays(instance), file_path)
+
+def read_snapshot(file_path: str) -> dict:
+    """Memory-map a snapshot and return its arrays without building Village objects.
+
+    Returns `names` (villages first, then dangling route targets), and the
+    `production`, `route_indptr`, `route_targets`, `route_amounts` and
+    `coordinates` (`(n, 2)`, `NO_COORDINATE` where unknown, None in version 1
+    files) arrays, which are read-only views on the mapped file, and
+    `resources`, a production array per resource.
+    """
+    buffer = np.memmap(file_path, dtype=np.uint8, mode='r')
+    prefix = len(SNAPSHOT_MAGIC) + 8
+    if len(buffer) < prefix or buffer[:len(SNAPSHOT_MAGIC)].tobytes() != SNAPSHOT_MAGIC:
+        raise ValueError(f"'{file_path}' is not an instance snapshot.")
+    header_length = int(buffer[len(SNAPSHOT_MAGIC):prefix].view('<u8')[0])
+    header = json.loads(buffer[prefix:prefix + header_length].tobytes())
+    if header.get("version") not in _READABLE_VERSIONS:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')}.")
+
+    start = prefix + header_length
+    arrays = {}
+    for key, (offset, dtype, count) in header["arrays"].items():
+        dtype = np.dtype(dtype)
+        arrays[key] = buffer[start + offset:start + offset + count * dtype.itemsize].view(dtype)
+
+    arrays["names"] = _decode_names(arrays.pop("name_offsets"), arrays.pop("name_bytes"))
+    arrays["coordinates"] = arrays["coordinates"].reshape(-1, 2) if "coordinates" in arrays else None
+    arrays["resources"] = {}
+    if "resource_production" in arrays:
+        resources = _decode_names(arrays.pop("resource_name_offsets"), arrays.pop("resource_name_bytes"))
+        blocks = arrays.pop("resource_production").reshape(len(resources), len(arrays["production"]))
+        arrays["resources"] = dict(zip(resources, blocks))
+    return arrays
+
+def load_snapshot(file_path: str) -> Instance:
+    data = read_snapshot(file_path)
+    return Instance.from_arrays(data["names"], data["production"], data["route_indptr"],
+                                data["route_targets"], data["route_amounts"], data["coordinates"], data["resources"])
+
+def _is_snapshot(file_path: str) -> bool:
+    with open(file_path, 'rb') as file:
+        return file.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+def load_instance(file_path: str) -> Instance:
+    """Load an instance from a JSON document, NDJSON records or a binary snapshot.
+
+    Snapshots are recognised by their magic bytes, NDJSON by its extension;
+    anything else is read as the JSON instance format. A missing file gives an
+    empty instance, like `Instance.load_instance_from_file`.
+    """
+    if not os.path.exists(file_path):
+        return Instance()
+    if _is_snapshot(file_path):
+        return load_snapshot(file_path)
+    if file_path.endswith(NDJSON_EXTENSIONS):
+        return load_ndjson(file_path)
+    return Instance.load_instance_from_file(file_path)
+
+def save_instance(instance: Instance, file_path: str) -> None:
+    """Save an instance in the format given by the file extension (JSON by default)."""
+    if file_path.endswith(SNAPSHOT_EXTENSIONS):
+        save_snapshot(instance, file_path)
+    elif file_path.endswith(NDJSON_EXTENSIONS):
+        save_ndjson(instance, file_path)
+    else:
+        Instance.save_instance_to_file(instance, file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an instance between JSON, NDJSON (.ndjson, .jsonl) and snapshot (.snap) files.")
+    parser.add_argument('source', type=str, help='Instance file to read.')
+    parser.add_argument('destination', type=str, help='Instance file to write, format chosen by extension.')
+    args = parser.parse_args()
+    if not os.path.exists(args.source):
+        raise SystemExit(f"Error: File '{args.source}' not found.")
+    save_instance(load_instance(args.source), args.destination)
+
+if __name__ == '__main__':
+    main()
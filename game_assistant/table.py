@@ -0,0 +1,145 @@
+from typing import Optional
+import numpy as np
+
+# Coordinate value marking a village without known coordinates.
+NO_COORDINATE = int(np.iinfo(np.int64).min)
+
+def as_integer(value, what: str = "Production") -> int:
+    """Validate an integer column value, accepting integers and integral floats."""
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise ValueError(f"{what} must be an integer, got {value!r}.")
+
+def as_production(value) -> int:
+    return as_integer(value, "Production")
+
+def _column(values, capacity: int = 0) -> np.ndarray:
+    values = np.asarray(values, dtype=np.int64).reshape(-1)
+    column = np.zeros(max(capacity, len(values)), dtype=np.int64)
+    column[:len(values)] = values
+    return column
+
+class VillageTable:
+    """Columnar storage for the villages of an Instance, indexed by village id.
+
+    Names are a list sharing the villages' name strings; productions and map
+    coordinates are int64 NumPy columns with spare capacity, doubled when an
+    append fills them, and the properties hand out views of their used part.
+    A view taken before an append that grows a column keeps the old values,
+    so use it for a computation and drop it rather than keeping it around.
+    Per-resource productions are one more column per resource, created the
+    first time any village has that resource and zero for the others.
+    Removed ids keep their slot with no name and zero productions until
+    `compact()`, so column reductions stay correct without a mask.
+    """
+
+    def __init__(self, names: Optional[list[str]] = None, production: Optional[np.ndarray] = None,
+                 coordinates: Optional[np.ndarray] = None, resources: Optional[dict[str, np.ndarray]] = None):
+        self.names: list[Optional[str]] = list(names or [])
+        self._production = _column(production if self.names else [])
+        if coordinates is None:
+            coordinates = np.full((len(self.names), 2), NO_COORDINATE, dtype=np.int64)
+        coordinates = np.asarray(coordinates, dtype=np.int64).reshape(-1, 2)
+        self._x, self._y = _column(coordinates[:, 0]), _column(coordinates[:, 1])
+        self._resources: dict[str, np.ndarray] = {resource: _column(values)
+                                                  for resource, values in (resources or {}).items()}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def production(self) -> np.ndarray:
+        """View of the production column."""
+        return self._production[:len(self.names)]
+
+    def get_production(self, i: int) -> int:
+        return int(self._production[i])
+
+    def set_production(self, i: int, production: int) -> None:
+        self._production[i] = production
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """`(n, 2)` copy of the coordinate columns, `NO_COORDINATE` where unknown."""
+        n = len(self.names)
+        return np.column_stack([self._x[:n], self._y[:n]])
+
+    def get_coordinates(self, i: int) -> Optional[tuple[int, int]]:
+        x = int(self._x[i])
+        return None if x == NO_COORDINATE else (x, int(self._y[i]))
+
+    def set_coordinates(self, i: int, coordinates: Optional[tuple[int, int]]) -> None:
+        self._x[i], self._y[i] = coordinates if coordinates is not None else (NO_COORDINATE, NO_COORDINATE)
+
+    @property
+    def resource_names(self) -> list[str]:
+        return list(self._resources)
+
+    def resource_matrix(self, resources: list[str]) -> np.ndarray:
+        """`(n, len(resources))` copy of the given resource columns; unknown resources are all zero."""
+        n = len(self.names)
+        matrix = np.zeros((n, len(resources)), dtype=np.int64)
+        for k, resource in enumerate(resources):
+            if resource in self._resources:
+                matrix[:, k] = self._resources[resource][:n]
+        return matrix
+
+    def get_resources(self, i: int) -> dict[str, int]:
+        """The non-zero resource productions of village `i`."""
+        return {resource: int(column[i]) for resource, column in self._resources.items() if column[i]}
+
+    def set_resources(self, i: int, resources: dict[str, int]) -> None:
+        for resource, column in self._resources.items():
+            column[i] = resources.get(resource, 0)
+        for resource, value in resources.items():
+            if resource not in self._resources:
+                column = self._resources[resource] = _column([], len(self._production))
+                column[i] = value
+
+    @property
+    def alive(self) -> np.ndarray:
+        return np.array([name is not None for name in self.names], dtype=bool)
+
+    def append(self, name: str, production: int, coordinates: Optional[tuple[int, int]] = None,
+               resources: Optional[dict[str, int]] = None) -> int:
+        x, y = coordinates if coordinates is not None else (NO_COORDINATE, NO_COORDINATE)
+        i = len(self.names)
+        if i == len(self._production):
+            capacity = max(2 * i, 16)
+            self._production, self._x, self._y = (_column(column, capacity) for column in (self._production, self._x, self._y))
+            self._resources = {resource: _column(column, capacity) for resource, column in self._resources.items()}
+        self._production[i], self._x[i], self._y[i] = production, x, y
+        for column in self._resources.values():
+            column[i] = 0
+        self.names.append(name)
+        if resources:
+            self.set_resources(i, resources)
+        return i
+
+    def remove(self, i: int) -> None:
+        self.names[i] = None
+        self._production[i] = 0
+        self.set_coordinates(i, None)
+        self.set_resources(i, {})
+
+    def compact(self) -> None:
+        """Drop removed ids; surviving ids are renumbered densely in order."""
+        alive = self.alive
+        n = len(self.names)
+        self._production = self._production[:n][alive]
+        self._x, self._y = self._x[:n][alive], self._y[:n][alive]
+        self._resources = {resource: column[:n][alive] for resource, column in self._resources.items()}
+        self.names = [name for name in self.names if name is not None]
+
+    def total(self) -> int:
+        return int(self.production.sum())
+
+    def supply(self) -> int:
+        production = self.production
+        return int(production[production > 0].sum())
+
+    def demand(self) -> int:
+        production = self.production
+        return int(-production[production < 0].sum())
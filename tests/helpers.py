@@ -0,0 +1,8 @@
+from game_assistant.models import Village, Instance
+
+def sample_instance() -> Instance:
+    """Two villages with a route and coordinates, shared by the state and journal tests."""
+    return Instance(villages=[
+        Village(name="A", production=5, routes={"B": 2}, coordinates=(1, 2)),
+        Village(name="B", production=-3),
+    ])
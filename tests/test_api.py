@@ -0,0 +1,113 @@
+import unittest
+from unittest import mock
+from game_assistant.app import app
+from game_assistant.models import Village, Instance
+
+class TestVillagesApi(unittest.TestCase):
+    def setUp(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.instance = Instance(villages=[
+            Village(name="Charlie", production=5, routes={"Alpha": 2}, coordinates=(1, 2)),
+            Village(name="Alpha", production=-7),
+            Village(name="Bravo", production=3, routes={"Alpha": 1}),
+        ])
+        app.config['INSTANCE'] = self.instance
+        app.config['OPTIMAL_ROUTES'] = {}
+        self.client = app.test_client()
+
+    def names(self, **args) -> list[str]:
+        response = self.client.get('/api/villages', query_string=args)
+        self.assertEqual(response.status_code, 200)
+        return [village["name"] for village in response.get_json()["villages"]]
+
+    def test_page_contents(self):
+        page = self.client.get('/api/villages?limit=2').get_json()
+        self.assertEqual(page["total"], 3)
+        self.assertEqual(page["villages"][0], {"id": 0, "name": "Charlie", "production": 5, "coordinates": [1, 2],
+                                               "routes": [["Alpha", 2]], "incoming": []})
+        self.assertEqual(page["villages"][1]["incoming"], [["Charlie", 2], ["Bravo", 1]])
+
+    def test_offset_and_sort(self):
+        self.assertEqual(self.names(offset=1, limit=5), ["Alpha", "Bravo"])
+        self.assertEqual(self.names(sort="name"), ["Alpha", "Bravo", "Charlie"])
+        self.assertEqual(self.names(sort="-production"), ["Charlie", "Bravo", "Alpha"])
+        self.instance.update_village("Alpha", 10)
+        self.assertEqual(self.names(sort="-production", limit=1), ["Alpha"])
+
+    def test_page_after_removal_does_not_rebuild_the_matrix(self):
+        self.instance.remove_village("Charlie")
+        with mock.patch.object(Instance, 'routes_matrix', new_callable=mock.PropertyMock, side_effect=AssertionError), \
+                mock.patch.object(Instance, 'villages', new_callable=mock.PropertyMock, side_effect=AssertionError):
+            page = self.client.get('/api/villages').get_json()
+        self.assertEqual(page["total"], 2)
+        self.assertEqual([(v["id"], v["name"], v["incoming"]) for v in page["villages"]],
+                         [(0, "Alpha", [["Bravo", 1]]), (1, "Bravo", [])])
+
+    def test_invalid_arguments(self):
+        for query in ("limit=0", "offset=-1", "sort=size", "limit=ten"):
+            response = self.client.get(f'/api/villages?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("error", response.get_json())
+
+    def test_index_does_not_inline_villages(self):
+        body = self.client.get('/').get_data(as_text=True)
+        self.assertNotIn("Charlie", body)
+
+class TestSolutionApi(unittest.TestCase):
+    def setUp(self):
+        app.config['INSTANCE'] = Instance(villages=[Village(name="A", production=4), Village(name="B", production=-4)])
+        app.config['OPTIMAL_ROUTES'] = {f"V{i}": {"B": i} for i in range(120)}
+        self.client = app.test_client()
+
+    def test_solution_page(self):
+        page = self.client.get('/api/solution?offset=100&limit=50').get_json()
+        self.assertEqual((page["total"], len(page["routes"])), (120, 20))
+        self.assertEqual(page["routes"][0], {"name": "V100", "routes": [["B", 100]]})
+        self.assertEqual(self.client.get('/api/solution?limit=0').status_code, 400)
+
+    def test_index_does_not_inline_the_solution(self):
+        body = self.client.get('/').get_data(as_text=True)
+        self.assertIn("optimal-routes-list", body)
+        self.assertNotIn("V100", body)
+
+class TestRoutesTileApi(unittest.TestCase):
+    def setUp(self):
+        villages = [Village(name=f"V{i}", production=1, routes={f"V{(i + 1) % 40}": i + 1}) for i in range(40)]
+        app.config['INSTANCE'] = Instance(villages=villages)
+        self.client = app.test_client()
+
+    def test_tile(self):
+        tile = self.client.get('/api/routes/tile?row=32&col=30&size=16').get_json()
+        self.assertEqual(tile["row_names"], [f"V{i}" for i in range(32, 40)])
+        self.assertEqual(len(tile["col_names"]), 10)
+        self.assertEqual(tile["entries"], [[i, i + 1, i + 1] for i in range(32, 39)])
+
+    def test_tile_size_limit(self):
+        self.assertEqual(self.client.get('/api/routes/tile?size=1000').status_code, 400)
+
+class TestBatchApi(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance(villages=[Village(name="A", production=4), Village(name="B", production=-4)])
+        app.config['INSTANCE'] = self.instance
+        app.config['OPTIMAL_ROUTES'] = {}
+        self.client = app.test_client()
+
+    def test_applies_batch(self):
+        ops = [{"op": "add_village", "name": f"V{i}", "production": 0} for i in range(1000)]
+        ops += [{"op": "add_route", "from_village": "A", "to_village": f"V{i}", "amount": i} for i in range(1000)]
+        response = self.client.post('/api/batch', json={"ops": ops})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["ops"], {"add_village": 1000, "add_route": 1000})
+        self.assertEqual(len(self.instance.names), 1002)
+        self.assertEqual(self.instance.routes_matrix.nnz, 999)
+
+    def test_rejects_invalid_batch(self):
+        response = self.client.post('/api/batch', json=[{"op": "add_route", "from_village": "A", "to_village": "B", "amount": 1},
+                                                        {"op": "remove_village", "name": "C"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Operation 1: Village 'C' does not exist.")
+        self.assertEqual(self.instance.routes_matrix.nnz, 0)
+        self.assertEqual(self.client.post('/api/batch', json={"op": "clear_routes"}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
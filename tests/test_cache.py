@@ -0,0 +1,148 @@
+import gzip
+import json
+import unittest
+from unittest import mock
+from game_assistant.app import app
+from game_assistant.cache import PayloadCache, SolutionCache, SolutionPayload, VersionedRoutes, solution_delta
+from game_assistant.models import Village, Instance
+
+class TestSolutionCache(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance()
+        self.instance.add_village(Village(name="VillageA", production=100))
+        self.instance.add_village(Village(name="VillageB", production=-30))
+        self.cache = SolutionCache(maxsize=2)
+
+    def test_hit_on_unchanged_instance(self):
+        first = self.cache.solve(self.instance, backend="mincostflow")
+        with mock.patch("game_assistant.cache.solve_instance") as solve:
+            second = self.cache.solve(self.instance, backend="mincostflow")
+            solve.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.info()["hits"], 1)
+        self.assertEqual(self.cache.info()["misses"], 1)
+
+    def test_mutation_invalidates_and_revert_hits(self):
+        self.cache.solve(self.instance, backend="mincostflow")
+        self.instance.update_village("VillageB", -50)
+        self.assertEqual(self.cache.solve(self.instance, backend="mincostflow")["VillageA"], {"VillageB": 50})
+        self.instance.update_village("VillageB", -30)
+        self.assertEqual(self.cache.solve(self.instance, backend="mincostflow")["VillageA"], {"VillageB": 30})
+        self.assertEqual(self.cache.info()["hits"], 1)
+        self.assertEqual(self.cache.info()["misses"], 2)
+
+    def test_forbidden_routes_are_part_of_key(self):
+        key = self.cache.key(self.instance)
+        self.assertNotEqual(key, self.cache.key(self.instance, {("VillageA", "VillageB")}))
+
+    def test_lru_eviction(self):
+        for production in (-10, -20, -30):
+            self.instance.update_village("VillageB", production)
+            self.cache.solve(self.instance, backend="mincostflow")
+        self.assertEqual(len(self.cache), 2)
+        self.instance.update_village("VillageB", -10)
+        self.assertIsNone(self.cache.get(self.cache.key(self.instance, backend="mincostflow")))
+
+    def test_returned_solution_is_a_copy(self):
+        solution = self.cache.solve(self.instance, backend="mincostflow")
+        solution["VillageA"].clear()
+        self.assertEqual(self.cache.solve(self.instance, backend="mincostflow")["VillageA"], {"VillageB": 30})
+
+class TestSolutionJson(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance(villages=[Village(name=f"V{i}", production=10 if i % 2 else -10) for i in range(100)])
+        self.routes = VersionedRoutes({f"V{i}": {f"V{i - 1}": 10} for i in range(1, 100, 2)})
+        app.config['INSTANCE'] = self.instance
+        app.config['OPTIMAL_ROUTES'] = self.routes
+        app.config['PAYLOAD_CACHE'] = PayloadCache()
+        self.client = app.test_client()
+
+    def test_payload(self):
+        data = self.client.get('/solution.json').get_json()
+        self.assertEqual(len(data["links"]), 50)
+        self.assertEqual({node["balance"] for node in data["nodes"]}, {0})
+
+    def test_etag_revalidation(self):
+        first = self.client.get('/solution.json')
+        etag = first.headers['ETag']
+        with mock.patch("game_assistant.cache.SolutionPayload") as payload:
+            again = self.client.get('/solution.json', headers={'If-None-Match': etag})
+            payload.assert_not_called()
+        self.assertEqual(again.status_code, 304)
+        self.routes.update({"V1": {"V0": 5}})
+        changed = self.client.get('/solution.json', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        self.instance.update_village("V0", -5)
+        self.assertNotEqual(self.client.get('/solution.json').headers['ETag'], changed.headers['ETag'])
+
+    def test_gzip(self):
+        plain = self.client.get('/solution.json')
+        response = self.client.get('/solution.json', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(gzip.decompress(response.data)), plain.get_json())
+        self.assertLess(len(response.data), len(plain.data))
+
+    def test_solution_delta(self):
+        solution = {source: dict(routes) for source, routes in self.routes.items()}
+        solution["V1"] = {"V0": 4, "V2": 6}
+        del solution["V3"]
+        solution["V5"] = {"V4": 10}
+        delta = solution_delta(self.instance, self.routes, solution)
+        self.assertEqual(delta["base"], self.client.get('/solution.json').headers['ETag'].strip('W/"'))
+        self.assertEqual(delta["etag"], SolutionPayload(self.instance, solution).etag)
+        self.assertEqual((delta["added"], delta["changed"], delta["removed"]),
+                         ([{"source": "V1", "target": "V2", "amount": 6}], [{"source": "V1", "target": "V0", "amount": 4}],
+                          [{"source": "V3", "target": "V2"}]))
+        self.assertEqual(delta["nodes"], [{"id": "V0", "balance": -6}, {"id": "V2", "balance": -4}, {"id": "V3", "balance": 10}])
+        self.assertIsNone(solution_delta(self.instance, {}, solution)["base"])
+
+    def test_solve_job_events(self):
+        app.config['INSTANCE'] = Instance(villages=[Village(name="A", production=3), Village(name="B", production=-3)])
+        app.config['OPTIMAL_ROUTES'] = VersionedRoutes({"A": {"B": 1}})
+        job = self.client.post('/solve_instance').get_json()
+        body = self.client.get(f'/jobs/{job["id"]}/events').get_data(as_text=True)
+        messages = [dict(line.split(": ", 1) for line in message.splitlines()) for message in body.strip().split("\n\n")]
+        self.assertEqual([message["id"] for message in messages], [str(i) for i in range(len(messages))])
+        self.assertEqual(messages[-1]["event"], "done")
+        delta = json.loads(messages[-2]["data"])
+        self.assertEqual(delta["type"], "delta")
+        self.assertEqual(delta["etag"], self.client.get('/solution.json').headers['ETag'].strip('W/"'))
+        self.assertIn({"phase", "delta"}, [{message["event"] for message in messages[:-1]}])
+        resumed = self.client.get(f'/jobs/{job["id"]}/events', headers={'Last-Event-ID': messages[-2]["id"]})
+        self.assertTrue(resumed.get_data(as_text=True).startswith(f"id: {messages[-1]['id']}\nevent: done"))
+
+    def test_stale_solve_job_is_dropped(self):
+        instance = Instance(villages=[Village(name="A", production=5), Village(name="B", production=-5)])
+        app.config['INSTANCE'] = instance
+        app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
+
+        def edit_while_solving(snapshot):
+            instance.remove_village("B")
+            return {"A": {"B": 5}, "B": {}}
+
+        with mock.patch('game_assistant.optimal.solve_instance', edit_while_solving):
+            job = self.client.post('/solve_instance').get_json()
+            app.config['JOBS'].get(job["id"]).future.result()
+        self.assertEqual(app.config['JOBS'].get(job["id"]).status, "done")
+        self.assertEqual(app.config['OPTIMAL_ROUTES'], {})
+
+    def test_cached_solve_skips_the_copy(self):
+        app.config['INSTANCE'] = Instance(villages=[Village(name="A", production=4), Village(name="B", production=-4)])
+        self.client.get('/solve_instance')
+        with mock.patch.object(Instance, 'from_dict') as from_dict:
+            self.client.get('/solve_instance')
+        from_dict.assert_not_called()
+        self.assertEqual(app.config['OPTIMAL_ROUTES']["A"], {"B": 4})
+
+    def test_deadline_solve(self):
+        app.config['INSTANCE'] = Instance(villages=[Village(name="A", production=4), Village(name="B", production=-3)])
+        self.client.get('/solve_instance?deadline=5')
+        with self.client.session_transaction() as session:
+            self.assertEqual(session['_flashes'][-1][1][:30], "Instance solved to optimality ")
+        self.assertEqual(app.config['OPTIMAL_ROUTES']["A"], {"B": 3})
+        self.assertEqual(self.client.post('/solve_instance', data={"deadline": -1}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from game_assistant.generate import generate_instance
+
+class TestGenerateInstance(unittest.TestCase):
+    def test_reproducible(self):
+        first, forbidden_first = generate_instance(50, route_density=0.05, forbidden_density=0.1, seed=7)
+        second, forbidden_second = generate_instance(50, route_density=0.05, forbidden_density=0.1, seed=7)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertEqual(forbidden_first, forbidden_second)
+
+    def test_shape(self):
+        instance, forbidden = generate_instance(200, producer_ratio=0.3, zero_ratio=0.2, route_density=0.02,
+                                                forbidden_density=0.05, seed=1)
+        productions = [village.production for village in instance.villages]
+        self.assertEqual(len(productions), 200)
+        self.assertGreaterEqual(sum(productions), 0)
+        self.assertTrue(any(p > 0 for p in productions) and any(p < 0 for p in productions))
+        self.assertTrue(any(p == 0 for p in productions))
+        self.assertGreater(instance.routes_matrix.nnz, 0)
+        self.assertGreater(len(forbidden), 0)
+        self.assertTrue(all(a != b for a, b in forbidden))
+
+    def test_resources_keep_the_base_instance(self):
+        base, forbidden = generate_instance(30, forbidden_density=0.1, seed=2, map_size=50)
+        multi, forbidden_multi = generate_instance(30, forbidden_density=0.1, seed=2, map_size=50, resources=("wood", "iron"))
+        self.assertEqual([v.production for v in multi.villages], [v.production for v in base.villages])
+        self.assertEqual(forbidden_multi, forbidden)
+        self.assertEqual(multi.resources, ["wood", "iron"])
+        self.assertTrue((multi.resource_production().sum(axis=0) >= 0).all())
+
+if __name__ == '__main__':
+    unittest.main()
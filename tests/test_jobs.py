@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+from game_assistant.jobs import JobManager, JobQueueFull, format_sse
+from game_assistant.metrics import report_progress, solve_phase
+
+def wait_for(manager, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while manager.get(job_id).status in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager(max_workers=1, max_pending=2)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.manager.shutdown()
+
+    def test_done_and_callback(self):
+        results = []
+        job = self.manager.submit(lambda a, b: a + b, 2, 3, on_done=results.append)
+        job = wait_for(self.manager, job.id)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, 5)
+        self.assertEqual(results, [5])
+        self.assertIsNotNone(job.to_dict()["run_seconds"])
+
+    def test_failed(self):
+        def fail():
+            raise ValueError("Problem status is not optimal: Infeasible")
+        job = wait_for(self.manager, self.manager.submit(fail).id)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn("Infeasible", job.error)
+
+    def test_bounded_queue_and_cancel(self):
+        running = self.manager.submit(self.release.wait)
+        queued = self.manager.submit(lambda: 1)
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit(lambda: 2)
+        self.assertEqual(self.manager.cancel(queued.id).status, 'cancelled')
+        self.release.set()
+        self.assertEqual(wait_for(self.manager, running.id).status, 'done')
+        self.assertEqual(self.manager.get(queued.id).status, 'cancelled')
+
+    def test_cancelled_running_job_counts_until_it_returns(self):
+        running = self.manager.submit(self.release.wait)
+        while self.manager.get(running.id).status != 'running':
+            time.sleep(0.01)
+        self.assertEqual(self.manager.cancel(running.id).status, 'cancelled')
+        queued = self.manager.submit(lambda: 1)
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit(lambda: 2)
+        self.release.set()
+        self.assertEqual(wait_for(self.manager, queued.id).status, 'done')
+        self.assertEqual(wait_for(self.manager, self.manager.submit(lambda: 3).id).result, 3)
+
+    def test_timeout_discards_result(self):
+        results = []
+        job = self.manager.submit(self.release.wait, timeout=0.05, on_done=results.append)
+        time.sleep(0.1)
+        self.assertEqual(self.manager.get(job.id).status, 'failed')
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(results, [])
+        self.assertIn("Timed out", self.manager.get(job.id).error)
+
+    def test_progress_events(self):
+        def work():
+            with solve_phase("solve", "test"):
+                report_progress({"type": "note"})
+                self.release.wait()
+            return 1
+        job = self.manager.submit(work)
+        events = job.wait_events(0, timeout=5.0)
+        self.assertEqual(events[0], {"type": "phase", "phase": "solve", "backend": "test", "state": "start"})
+        self.release.set()
+        job = wait_for(self.manager, job.id)
+        self.assertEqual([event["type"] for event in job.wait_events(1)], ["note", "phase"])
+        self.assertEqual(job.events[-1]["state"], "end")
+        self.assertEqual(job.wait_events(3, timeout=5.0), [])
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse("done", {"a": 1}, 4), 'id: 4\nevent: done\ndata: {"a":1}\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from game_assistant.app import app
+from game_assistant.journal import Journal, open_journal
+from game_assistant.models import Village, Instance
+from tests.helpers import sample_instance
+
+def edit(instance: Instance) -> None:
+    instance.add_village(Village(name="C", production=-2, coordinates=(4, 4)))
+    instance.add_route("A", "C", 2)
+    instance.update_route("A", "B", 3)
+    instance.update_village("B", -4)
+    instance.rename_village("C", "D")
+    instance.apply_batch([{"op": "remove_route", "from_village": "A", "to_village": "B"},
+                          {"op": "add_village", "name": "E", "production": 0}])
+    instance.remove_village("E")
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def reopen(self) -> Instance:
+        journal = Journal(self.path)
+        instance = journal.recover()
+        journal.close()
+        return instance
+
+    def test_empty_journal(self):
+        self.assertIsNone(Journal(self.path).recover())
+        journal, instance = open_journal(self.path, sample_instance)
+        journal.close()
+        self.assertEqual(self.reopen().to_dict(), sample_instance().to_dict())
+
+    def test_replays_edits(self):
+        journal, instance = open_journal(self.path, sample_instance)
+        edit(instance)
+        journal.close()
+        recovered = self.reopen()
+        self.assertEqual(recovered.to_dict(), instance.to_dict())
+        self.assertEqual(recovered.routes_matrix.tolist(), instance.routes_matrix.tolist())
+
+    def test_compaction_bounds_replay(self):
+        journal, instance = open_journal(self.path, sample_instance, compact_every=3)
+        edit(instance)
+        journal.wait()
+        instance.add_route("D", "A", 1)
+        journal.close()
+        files = sorted(os.listdir(self.path))
+        self.assertEqual([name.split('-')[0] for name in files], ["journal", "snapshot"])
+        self.assertEqual(self.reopen().to_dict(), instance.to_dict())
+
+    def test_torn_last_line_is_ignored(self):
+        journal, instance = open_journal(self.path, sample_instance)
+        instance.add_route("B", "A", 1)
+        journal.close()
+        segment = next(name for name in os.listdir(self.path) if name.startswith("journal"))
+        with open(os.path.join(self.path, segment), 'a') as file:
+            file.write('{"seq":9,"op":"clear_')
+        recovered = self.reopen()
+        self.assertEqual(recovered.get_village("B").routes, {"A": 1})
+        recovered_again = self.reopen()
+        self.assertEqual(recovered_again.to_dict(), recovered.to_dict())
+
+    def test_attach_replaces_history(self):
+        journal, instance = open_journal(self.path, sample_instance)
+        instance.add_route("B", "A", 1)
+        other = Instance(villages=[Village(name="X", production=0)])
+        journal.attach(other)
+        instance.remove_village("A")
+        other.add_village(Village(name="Y", production=1))
+        journal.close()
+        self.assertEqual(self.reopen().names, ["X", "Y"])
+
+class TestAppJournal(unittest.TestCase):
+    def setUp(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.directory = tempfile.TemporaryDirectory()
+        app.config['JOURNAL'], app.config['INSTANCE'] = open_journal(self.directory.name, sample_instance)
+        app.config['OPTIMAL_ROUTES'] = {}
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['JOURNAL'].close()
+        app.config['JOURNAL'] = None
+        self.directory.cleanup()
+
+    def test_edits_and_paste_are_journaled(self):
+        self.client.post('/edit_village/A', data={"name": "Z", "production": 7})
+        self.client.post('/paste', data={"instance_data": "North\n(1|1)\nSouth\n(2|2)"})
+        self.client.post('/api/batch', json=[{"op": "update_village", "name": "South", "production": 3}])
+        recovered = Journal(self.directory.name).recover()
+        self.assertEqual(recovered.to_dict(), app.config['INSTANCE'].to_dict())
+        self.assertEqual(recovered.production.tolist(), [0, 3])
+
+    def test_failed_rename_leaves_the_village_unchanged(self):
+        self.client.post('/edit_village/A', data={"name": "B", "production": 7})
+        self.assertEqual(app.config['INSTANCE'].get_village("A").production, 5)
+        self.assertEqual(Journal(self.directory.name).recover().to_dict(), sample_instance().to_dict())
+
+if __name__ == '__main__':
+    unittest.main()
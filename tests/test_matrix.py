@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from game_assistant.matrix import RoutesMatrix
+
+class TestRoutesMatrix(unittest.TestCase):
+    def setUp(self):
+        self.matrix = RoutesMatrix(3)
+        self.matrix[0, 1] = 20
+        self.matrix[1, 2] = 10
+        self.matrix[2, 1] = 5
+
+    def test_get_set(self):
+        self.assertEqual(self.matrix[0, 1], 20)
+        self.assertEqual(self.matrix[1, 0], 0)
+        self.assertEqual(self.matrix.nnz, 3)
+        self.matrix[0, 1] = 0
+        self.assertEqual(self.matrix.nnz, 2)
+
+    def test_out_of_bounds(self):
+        with self.assertRaises(IndexError):
+            self.matrix[3, 0] = 1
+
+    def test_row_and_column(self):
+        self.assertEqual(self.matrix.row(1), {2: 10})
+        self.assertEqual(self.matrix.column(1), {0: 20, 2: 5})
+
+    def test_tocsr(self):
+        indptr, indices, data = self.matrix.tocsr()
+        self.assertEqual(indptr.tolist(), [0, 1, 2, 3])
+        self.assertEqual(indices.tolist(), [1, 2, 1])
+        self.assertEqual(data.tolist(), [20, 10, 5])
+
+    def test_dense_views(self):
+        expected = [[0, 20, 0], [0, 0, 10], [0, 5, 0]]
+        self.assertEqual(self.matrix.tolist(), expected)
+        self.assertEqual(self.matrix.transpose().tolist(), np.array(expected).T.tolist())
+        self.assertTrue((np.asarray(self.matrix) == np.array(expected)).all())
+
+    def test_from_coo_and_set_row(self):
+        built = RoutesMatrix.from_coo(3, [2, 0, 1], [1, 1, 2], [5, 20, 10])
+        self.assertEqual(built.tolist(), self.matrix.tolist())
+        self.assertEqual(built.column(1), {0: 20, 2: 5})
+        built.set_row(0, {2: 7, 1: 0})
+        self.assertEqual(built.row(0), {2: 7})
+        self.assertEqual(built.column(1), {2: 5})
+        self.assertEqual(built.nnz, 3)
+        with self.assertRaises(IndexError):
+            built.set_row(0, {3: 1})
+
+    def test_from_csr(self):
+        indptr, indices, data = self.matrix.tocsr()
+        built = RoutesMatrix.from_csr(3, indptr, indices, data)
+        self.assertIs(built.tocsr()[0], indptr)
+        self.assertEqual(built.nnz, 3)
+        self.assertEqual(built.column(1), {0: 20, 2: 5})
+        built[1, 2] = 0
+        self.assertEqual((built.nnz, built.tocsr()[0].tolist()), (2, [0, 1, 1, 2]))
+        with self.assertRaises(IndexError):
+            RoutesMatrix.from_csr(2, indptr, indices, data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from game_assistant.app import app
+from game_assistant.metrics import REGISTRY, Registry
+from game_assistant.models import Village, Instance
+from game_assistant.optimal import solve_instance
+
+class TestRegistry(unittest.TestCase):
+    def test_render_counter_gauge_histogram(self):
+        registry = Registry(buckets=(0.1, 1.0))
+        registry.inc("requests_total", help_text="Requests.", path='/a"b')
+        registry.inc("requests_total", 2, path='/a"b')
+        registry.set("queue_size", 4)
+        registry.observe("latency_seconds", 0.05)
+        registry.observe("latency_seconds", 0.5)
+        registry.observe("latency_seconds", 5.0)
+        text = registry.render()
+        self.assertIn("# HELP requests_total Requests.", text)
+        self.assertIn('requests_total{path="/a\\"b"} 3.0', text)
+        self.assertIn("# TYPE queue_size gauge", text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_seconds_count 3", text)
+        self.assertEqual(registry.get("latency_seconds"), 3)
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        self.instance = Instance()
+        self.instance.add_village(Village(name="VillageA", production=100))
+        self.instance.add_village(Village(name="VillageB", production=-30))
+
+    def test_mutations_and_solve_phases_recorded(self):
+        self.assertEqual(REGISTRY.get("game_assistant_instance_mutation_seconds", method="add_village"), 2)
+        solve_instance(self.instance, backend="mincostflow")
+        for phase in ("allowed_arcs", "presolve", "solve", "extract", "total"):
+            self.assertEqual(REGISTRY.get("game_assistant_solve_phase_seconds", phase=phase, backend="mincostflow"), 1)
+        self.assertEqual(REGISTRY.get("game_assistant_solve_arcs", backend="mincostflow"), 1)
+
+    def test_pulp_model_size_gauges(self):
+        solve_instance(self.instance)
+        self.assertEqual(REGISTRY.get("game_assistant_solve_variables", backend="pulp"), 1)
+        self.assertEqual(REGISTRY.get("game_assistant_solve_phase_seconds", phase="constraints", backend="pulp"), 1)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['INSTANCE'] = Instance(villages=[Village(name="VillageA", production=10)])
+        app.config['OPTIMAL_ROUTES'] = {}
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['PROFILE_DIR'] = None
+
+    def test_metrics_lists_request_latency(self):
+        self.client.get('/solution.json')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('game_assistant_request_seconds_count{endpoint="solution_json",method="GET",status="200"} 1',
+                      response.get_data(as_text=True))
+
+    def test_profile_only_when_enabled(self):
+        response = self.client.get('/solution.json?profile=1')
+        self.assertNotIn('X-Profile-Path', response.headers)
+        with tempfile.TemporaryDirectory() as directory:
+            app.config['PROFILE_DIR'] = directory
+            response = self.client.get('/solution.json?profile=1')
+            path = response.headers['X-Profile-Path']
+            self.assertTrue(os.path.basename(path).startswith('solution_json-'))
+            self.assertTrue(os.path.exists(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,6 +56,53 @@ class TestInstance(unittest.TestCase):
         self.instance.remove_route("VillageB", "VillageA")
         self.assertNotIn("VillageA", self.village2.routes)
 
+    def test_routes_matrix_is_patched(self):
+        self.instance.add_route("VillageA", "VillageB", 30)
+        self.assertEqual(self.instance.routes_matrix.tolist(), [[0, 30], [50, 0]])
+        self.instance.add_village(Village(name="VillageC", production=-10, routes={"VillageA": 5}))
+        self.assertEqual(self.instance.routes_matrix.shape, (3, 3))
+        self.assertEqual(self.instance.routes_matrix[2, 0], 5)
+        self.instance.remove_village("VillageA")
+        self.assertEqual(self.instance.routes_matrix.tolist(), [[0, 0], [0, 0]])
+        self.instance.clear_routes()
+        self.assertEqual(self.instance.routes_matrix.nnz, 0)
+
+    def test_dangling_route_resolved_on_add(self):
+        with self.assertWarns(UserWarning):
+            self.instance.add_village(Village(name="VillageC", production=0, routes={"VillageD": 7}))
+        self.instance.add_village(Village(name="VillageD", production=0))
+        self.assertEqual(self.instance.routes_matrix[2, 3], 7)
+
+    def test_remove_village_keeps_ids_stable(self):
+        instance = Instance()
+        for i in range(10):
+            instance.add_village(Village(name=f"V{i}", production=i))
+        instance.add_route("V8", "V9", 4)
+        instance.remove_village("V3")
+        self.assertEqual(instance.get_village_id("V9"), 9)
+        self.assertIsNone(instance.get_village("V3"))
+        instance.remove_village("V5")
+        self.assertEqual(instance.get_village_id("V9"), 9)
+
+        # Readers skip the removed villages without compacting.
+        self.assertEqual([v.name for v in instance.villages], [f"V{i}" for i in range(10) if i not in (3, 5)])
+        self.assertEqual(instance.names, [f"V{i}" for i in range(10) if i not in (3, 5)])
+        self.assertEqual(instance.production.tolist(), [i for i in range(10) if i not in (3, 5)])
+        self.assertEqual(instance.villages_map["V8"], 6)
+        self.assertEqual(instance.routes_matrix[6, 7], 4)
+        self.assertEqual(instance.get_village_id("V9"), 9)
+        self.assertEqual(instance.compact(), {4: 3, 6: 4, 7: 5, 8: 6, 9: 7})
+        self.assertEqual(instance.get_village_id("V9"), 7)
+
+    def test_compact_threshold(self):
+        instance = Instance(villages=[Village(name=f"V{i}", production=0) for i in range(4)])
+        instance.remove_village("V0")
+        instance.remove_village("V1")
+        self.assertEqual(instance.get_village_id("V3"), 3)
+        instance.remove_village("V2")
+        self.assertEqual(instance.get_village_id("V3"), 0)
+        self.assertEqual(instance.compact(), {})
+
     def test_to_dict(self):
         expected_dict = {
             "villages": [self.village1.to_dict(), self.village2.to_dict()]
@@ -83,5 +130,131 @@ class TestInstance(unittest.TestCase):
         loaded_instance = Instance.load_instance_from_file('test_instance.json')
         self.assertEqual(loaded_instance.to_dict(), self.instance.to_dict())
 
+    def test_production_columns(self):
+        self.instance.add_village(Village(name="VillageC", production=-120))
+        self.assertEqual(self.instance.production.tolist(), [100, 150, -120])
+        self.assertEqual((self.instance.total_production(), self.instance.supply(), self.instance.demand()), (130, 250, 120))
+        self.instance.update_village("VillageB", 20)
+        self.village1.production = 30
+        self.assertEqual(self.instance.total_production(), -70)
+        self.assertEqual(self.instance.names, ["VillageA", "VillageB", "VillageC"])
+
+    def test_invalid_update_village_changes_nothing(self):
+        ops = []
+        self.instance.journal = ops.extend
+        version = self.instance.version
+        for routes in ({"Nowhere": 1}, {"VillageB": 1}, {"VillageA": -1}):
+            with self.assertRaises(ValueError):
+                self.instance.update_village("VillageB", 20, routes=routes)
+        self.assertEqual((self.instance.get_village("VillageB").production, self.instance.version, ops), (150, version, []))
+
+    def test_balances(self):
+        solution = {"VillageA": {"VillageB": 40, "Elsewhere": 5}, "Outside": {"VillageB": 2}}
+        self.assertEqual(self.instance.balances(solution).tolist(), [55, 192])
+
+    def test_village_views_follow_removal_and_compaction(self):
+        villages = [Village(name=f"V{i}", production=i) for i in range(4)]
+        instance = Instance(villages=list(villages))
+        instance.remove_village("V1")
+        self.assertEqual(villages[1].production, 1)
+        villages[1].production = 10
+        self.assertEqual(instance.total_production(), 5)
+        instance.remove_village("V0")
+        instance.remove_village("V2")
+        self.assertEqual(instance.get_village_id("V3"), 0)
+        self.assertEqual(villages[3].production, 3)
+        villages[3].production = 7
+        self.assertEqual(instance.production.tolist(), [7])
+
+    def test_production_must_be_integer(self):
+        with self.assertRaises(ValueError):
+            self.village1.production = 1.5
+        self.village1.production = 12.0
+        self.assertEqual(self.instance.production.tolist(), [12, 150])
+
+    def test_apply_batch(self):
+        summary = self.instance.apply_batch([
+            {"op": "add_village", "name": "VillageC", "production": -250, "coordinates": [3, 4]},
+            {"op": "add_route", "from_village": "VillageA", "to_village": "VillageC", "amount": 100},
+            {"op": "update_route", "from_village": "VillageB", "to_village": "VillageA", "amount": 0},
+            {"op": "add_route", "from_village": "VillageB", "to_village": "VillageC", "amount": 150},
+            {"op": "update_village", "name": "VillageA", "production": 120},
+        ])
+        self.assertEqual(summary, {"applied": 5, "ops": {"add_village": 1, "add_route": 2, "update_route": 1, "update_village": 1},
+                                   "villages": 3, "routes": 2, "version": self.instance.version})
+        self.assertEqual(self.instance.routes_matrix.tolist(), [[0, 0, 100], [0, 0, 150], [0, 0, 0]])
+        self.assertEqual(self.instance.get_village("VillageC").coordinates, (3, 4))
+        self.assertEqual(self.instance.production.tolist(), [120, 150, -250])
+
+    def test_apply_batch_sees_earlier_ops(self):
+        self.instance.apply_batch([
+            {"op": "remove_village", "name": "VillageB"},
+            {"op": "add_village", "name": "VillageB", "production": 5},
+            {"op": "add_route", "from_village": "VillageB", "to_village": "VillageA", "amount": 5},
+            {"op": "clear_routes"},
+            {"op": "add_route", "from_village": "VillageA", "to_village": "VillageB", "amount": 7},
+        ])
+        self.assertEqual(self.instance.to_dict()["villages"], [
+            {"name": "VillageA", "production": 100, "routes": {"VillageB": 7}},
+            {"name": "VillageB", "production": 5, "routes": {}},
+        ])
+        self.assertEqual(self.instance.routes_matrix.tolist(), [[0, 7], [0, 0]])
+
+    def test_apply_batch_counts_live_villages(self):
+        self.instance.add_village(Village(name="VillageC", production=0))
+        summary = self.instance.apply_batch([{"op": "remove_village", "name": "VillageC"}])
+        self.assertEqual(summary["villages"], 2)
+
+    def test_apply_batch_sees_routes_of_added_villages(self):
+        self.instance.apply_batch([
+            {"op": "add_village", "name": "VillageC", "production": 0, "routes": {"VillageB": 1}},
+            {"op": "update_route", "from_village": "VillageC", "to_village": "VillageB", "amount": 3},
+        ])
+        self.assertEqual(self.instance.get_village("VillageC").routes, {"VillageB": 3})
+
+    def test_apply_batch_is_atomic(self):
+        before, version = self.instance.to_dict(), self.instance.version
+        for ops in ([{"op": "add_route", "from_village": "VillageA", "to_village": "VillageB", "amount": 1},
+                     {"op": "add_route", "from_village": "VillageA", "to_village": "VillageB", "amount": 2}],
+                    [{"op": "remove_village", "name": "VillageA"},
+                     {"op": "update_route", "from_village": "VillageB", "to_village": "VillageA", "amount": 1},
+                     {"op": "remove_village", "name": "VillageA"}],
+                    [{"op": "add_village", "name": "VillageC", "production": "many"}],
+                    [{"op": "add_village", "name": "VillageC", "production": 0, "routes": {"VillageB": -4}}],
+                    [{"op": "add_village", "name": "VillageC", "production": 0, "routes": {"VillageB": "x"}}],
+                    [{"op": "add_village", "name": "VillageC", "production": 0, "routes": {"VillageB": 1}},
+                     {"op": "add_route", "from_village": "VillageC", "to_village": "VillageB", "amount": 2}],
+                    [{"op": "rename_village", "name": "VillageA"}],
+                    ["clear_routes"]):
+            with self.assertRaisesRegex(ValueError, f"^Operation {len(ops) - 1}: "):
+                self.instance.apply_batch(ops)
+        self.assertEqual((self.instance.to_dict(), self.instance.version), (before, version))
+
+    def test_rename_village(self):
+        self.instance.add_village(Village(name="VillageC", production=0, routes={"VillageD": 1}))
+        self.instance.rename_village("VillageA", "VillageD")
+        self.assertEqual(self.village2.routes, {"VillageD": 50})
+        self.assertEqual(self.instance.get_village_id("VillageD"), 0)
+        self.assertIsNone(self.instance.get_village("VillageA"))
+        self.assertEqual(self.instance.routes_matrix.tolist(), [[0, 0, 0], [50, 0, 0], [1, 0, 0]])
+        with self.assertRaises(ValueError):
+            self.instance.rename_village("VillageB", "VillageC")
+
+    def test_resources(self):
+        village = Village(name="VillageC", production=0, resources={"wood": 30, "iron": 0})
+        self.assertEqual(village.to_dict(), {"name": "VillageC", "production": 0, "routes": {}, "resources": {"wood": 30}})
+        self.instance.add_village(village)
+        self.instance.update_village("VillageA", 100, resources={"iron": -10})
+        self.instance.apply_batch([{"op": "update_village", "name": "VillageB", "production": 150,
+                                    "resources": {"wood": -30}}])
+        self.assertEqual(self.instance.resources, ["wood", "iron"])
+        self.assertEqual(self.instance.resource_production().tolist(), [[0, -10], [-30, 0], [30, 0]])
+        self.assertEqual(Instance.from_dict(self.instance.to_dict()).resource_production(["iron"]).tolist(), [[-10], [0], [0]])
+        before = self.instance.content_hash()
+        self.instance.update_village("VillageC", 0, resources={"wood": 20})
+        self.assertNotEqual(self.instance.content_hash(), before)
+        with self.assertRaises(ValueError):
+            village.resources = {"wood": 1.5}
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,8 @@
+import random
 import unittest
-from game_assistant.optimal import solve_instance
+import numpy as np
+from game_assistant.optimal import (DeadlineError, InfeasibleError, allowed_arcs, connected_components, presolve,
+                                    solve_instance, resolve_instance, solve_resources, solve_within)
 from game_assistant.models import Village, Instance
 
 class TestOptimalSolver(unittest.TestCase):
@@ -26,6 +29,240 @@ class TestOptimalSolver(unittest.TestCase):
         forbidden_routes = {("VillageA", "VillageC")}
         solution = solve_instance(self.instance, forbidden_routes=forbidden_routes)
         self.assertNotIn("VillageC", solution["VillageA"])
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            solve_instance(self.instance, backend="simplex")
+
+def random_instance(rng: random.Random, n: int) -> tuple[Instance, set]:
+    villages = [Village(name=f"V{i}", production=rng.choice([0, rng.randint(-40, 60)])) for i in range(n)]
+    names = [village.name for village in villages]
+    forbidden = {(a, b) for a in names for b in names if a != b and rng.random() < 0.5}
+    return Instance(villages=villages), forbidden
+
+class TestMinCostFlowBackend(unittest.TestCase):
+    def assertFeasible(self, instance, solution, forbidden_routes):
+        for village in instance.villages:
+            inflow = sum(routes.get(village.name, 0) for routes in solution.values())
+            outflow = sum(solution[village.name].values())
+            if village.production > 0:
+                self.assertEqual(inflow, 0)
+                self.assertLessEqual(outflow, village.production)
+            elif village.production < 0:
+                self.assertEqual(inflow, -village.production)
+                self.assertEqual(outflow, 0)
+            else:
+                self.assertEqual(inflow, outflow)
+        for source, routes in solution.items():
+            for target in routes:
+                self.assertNotIn((source, target), forbidden_routes)
+
+    def test_matches_cbc_on_random_instances(self):
+        rng = random.Random(1234)
+        for _ in range(40):
+            instance, forbidden = random_instance(rng, rng.randint(2, 9))
+            try:
+                expected = solve_instance(instance, forbidden_routes=forbidden, backend="pulp")
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    solve_instance(instance, forbidden_routes=forbidden, backend="mincostflow")
+                continue
+            solution = solve_instance(instance, forbidden_routes=forbidden, backend="mincostflow")
+            self.assertFeasible(instance, solution, forbidden)
+            self.assertEqual(
+                sum(sum(routes.values()) for routes in solution.values()),
+                sum(sum(routes.values()) for routes in expected.values()),
+            )
+
+    def test_relay_through_zero_production(self):
+        instance = Instance(villages=[
+            Village(name="A", production=10),
+            Village(name="B", production=0),
+            Village(name="C", production=-10),
+        ])
+        solution = solve_instance(instance, forbidden_routes={("A", "C")}, backend="mincostflow")
+        self.assertEqual(solution, {"A": {"B": 10}, "B": {"C": 10}, "C": {}})
+
+class TestPresolve(unittest.TestCase):
+    def test_balanced_instance_keeps_a_quarter_of_the_arcs(self):
+        names = [f"V{i}" for i in range(40)]
+        production = [5] * 20 + [-5] * 20
+        tail, head = allowed_arcs(names, set())
+        kept, report = presolve(names, production, tail, head)
+        self.assertEqual(len(kept), 20 * 20)
+        self.assertEqual(report["sign_arcs"], len(tail) - 400)
+        self.assertTrue(np.all(np.asarray(production)[tail[kept]] > 0))
+
+    def test_dead_relays_removed(self):
+        # R1 cannot be reached from a producer and R2 cannot reach a consumer.
+        names = ["P", "C", "R0", "R1", "R2"]
+        production = [5, -5, 0, 0, 0]
+        tail = np.array([0, 0, 2, 3, 3, 0])
+        head = np.array([1, 2, 1, 1, 4, 4])
+        kept, report = presolve(names, production, tail, head)
+        self.assertEqual(kept.tolist(), [0, 1, 2])
+        self.assertEqual((report["relays"], report["relay_arcs"]), (2, 3))
+
+    def test_unreachable_consumer_detected_before_solving(self):
+        instance = Instance(villages=[Village(name="A", production=10), Village(name="B", production=-5)])
+        with self.assertRaisesRegex(InfeasibleError, "Village 'B' needs 5"):
+            solve_instance(instance, forbidden_routes={("A", "B")})
+
+    def test_producers_only(self):
+        instance = Instance(villages=[Village(name="A", production=10), Village(name="B", production=3)])
+        self.assertEqual(solve_instance(instance), {"A": {}, "B": {}})
+
+class TestComponents(unittest.TestCase):
+    def setUp(self):
+        # Forbidding every route between {A, B, C} and {D, E} splits the instance in two.
+        self.instance = Instance(villages=[
+            Village(name="A", production=10), Village(name="B", production=-4), Village(name="C", production=-5),
+            Village(name="D", production=3), Village(name="E", production=-3),
+        ])
+        self.forbidden = {(a, b) for a in "ABC" for b in "DE"} | {(b, a) for a in "ABC" for b in "DE"}
+
+    def test_connected_components(self):
+        labels = connected_components(6, np.array([4, 1, 3]), np.array([0, 2, 2]))
+        self.assertEqual(labels.tolist(), [0, 1, 1, 1, 0, 5])
+
+    def test_components_solved_separately_and_merged(self):
+        for backend in ("pulp", "mincostflow"):
+            solution = solve_instance(self.instance, self.forbidden, backend=backend, workers=2)
+            self.assertEqual(solution, {"A": {"B": 4, "C": 5}, "B": {}, "C": {}, "D": {"E": 3}, "E": {}}, backend)
+
+    def test_short_component_is_named(self):
+        self.instance.update_village("E", -4)
+        with self.assertRaisesRegex(InfeasibleError, r"Component of 2 villages \('D', 'E'\) needs 4 but only produces 3"):
+            solve_instance(self.instance, self.forbidden, backend="mincostflow", workers=2)
+
+    def test_infeasible_component_is_named(self):
+        # {P, Q, R, S} produces enough, but R can only be supplied by S, which produces too little.
+        instance = Instance(villages=[
+            Village(name="P", production=10), Village(name="Q", production=-5), Village(name="R", production=-5),
+            Village(name="S", production=1), Village(name="T", production=3), Village(name="U", production=-3),
+        ])
+        allowed = {("P", "Q"), ("S", "R"), ("S", "Q"), ("T", "U")}
+        forbidden = {(a, b) for a in instance.names for b in instance.names if a != b} - allowed
+        for workers in (1, 2):
+            with self.assertRaisesRegex(InfeasibleError, r"Component of 4 villages \('P', 'Q', 'R' and 1 more\) is infeasible"):
+                solve_instance(instance, forbidden, backend="mincostflow", workers=workers)
+
+class TestResolveInstance(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance(villages=[
+            Village(name="A", production=100),
+            Village(name="B", production=50),
+            Village(name="C", production=-30),
+            Village(name="D", production=-60),
+        ])
+        self.previous = solve_instance(self.instance, backend="mincostflow")
+
+    def test_unchanged_instance_is_repaired(self):
+        solution, report = resolve_instance(self.instance, self.previous)
+        self.assertEqual(report["path"], "repair")
+        self.assertEqual(solution, self.previous)
+
+    def test_production_edit_is_repaired(self):
+        self.instance.update_village("C", -70)
+        self.instance.update_village("A", 80)
+        solution, report = resolve_instance(self.instance, self.previous)
+        self.assertEqual(report["path"], "repair")
+        self.assertEqual(report["solve_seconds"], 0.0)
+        TestMinCostFlowBackend.assertFeasible(self, self.instance, solution, set())
+        self.assertEqual(sum(sum(routes.values()) for routes in solution.values()), 130)
+
+    def test_falls_back_to_warm_start(self):
+        instance = Instance(villages=[
+            Village(name="A", production=10),
+            Village(name="B", production=0),
+            Village(name="C", production=-10),
+        ])
+        solution, report = resolve_instance(instance, {"A": {"C": 10}}, forbidden_routes={("A", "C")})
+        self.assertEqual(report["path"], "warm_start")
+        self.assertEqual(solution, {"A": {"B": 10}, "B": {"C": 10}, "C": {}})
+
+    def test_starts_from_current_routes(self):
+        self.instance.add_route("A", "C", 30)
+        self.instance.add_route("B", "D", 50)
+        solution, report = resolve_instance(self.instance)
+        self.assertEqual(report["path"], "repair")
+        self.assertEqual(solution["A"], {"C": 30, "D": 10})
+
+class TestSolveWithin(unittest.TestCase):
+    def setUp(self):
+        # Serving the largest demand first sends P2's output to C2, the bound assumes both get it.
+        self.instance = Instance(villages=[
+            Village(name="P1", production=10, coordinates=(0, 0)),
+            Village(name="P2", production=10, coordinates=(10, 0)),
+            Village(name="C1", production=-5, coordinates=(9, 0)),
+            Village(name="C2", production=-10, coordinates=(11, 0)),
+        ])
+        self.relayed = Instance(villages=[
+            Village(name="A", production=10),
+            Village(name="B", production=0),
+            Village(name="C", production=-10),
+        ])
+
+    def test_greedy_proven_optimal(self):
+        solution, report = solve_within(self.instance, deadline=10)
+        self.assertEqual((report["status"], report["source"], report["gap"]), ("optimal", "greedy", 0.0))
+        self.assertEqual(report["objective"], 15)
+        TestMinCostFlowBackend.assertFeasible(self, self.instance, solution, set())
+
+    def test_solver_closes_gap(self):
+        for backend in ("pulp", "mincostflow"):
+            solution, report = solve_within(self.instance, backend=backend, objective='distance')
+            self.assertEqual(report["status"], "optimal")
+            self.assertEqual(report["objective"], report["bound"])
+            self.assertEqual(solution["P2"], {"C2": 10})
+            solution, report = solve_within(self.relayed, forbidden_routes={("A", "C")}, backend=backend)
+            self.assertEqual((report["status"], report["source"], report["objective"]), ("optimal", backend, 20))
+
+    def test_deadline_returns_incumbent(self):
+        solution, report = solve_within(self.instance, deadline=1e-9, backend="mincostflow", objective='distance')
+        self.assertEqual((report["status"], report["source"]), ("feasible", "greedy"))
+        self.assertAlmostEqual(report["bound"] / report["objective"], 15 / 55)
+        self.assertAlmostEqual(report["gap"], 40 / 55)
+        TestMinCostFlowBackend.assertFeasible(self, self.instance, solution, set())
+        _, report = solve_within(self.instance, gap=0.8, backend="mincostflow", objective='distance')
+        self.assertEqual(report["source"], "greedy")
+
+    def test_deadline_without_incumbent(self):
+        with self.assertRaises(DeadlineError):
+            solve_within(self.relayed, deadline=1e-9, forbidden_routes={("A", "C")}, backend="mincostflow")
+        with self.assertRaises(InfeasibleError):
+            solve_within(self.relayed, forbidden_routes={("A", "C"), ("B", "C")})
+        with self.assertRaises(ValueError):
+            solve_within(self.instance, deadline=0)
+
+class TestSolveResources(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance(villages=[
+            Village(name="A", production=0, resources={"wood": 10, "iron": -5}),
+            Village(name="B", production=0, resources={"wood": -10}),
+            Village(name="C", production=0, resources={"iron": 5}),
+        ])
+
+    def test_matches_separate_solves(self):
+        forbidden = {("A", "B")}
+        for backend in ("pulp", "mincostflow"):
+            solutions = solve_resources(self.instance, forbidden_routes=forbidden, backend=backend)
+            self.assertEqual(list(solutions), ["wood", "iron"])
+            for resource, solution in solutions.items():
+                single = Instance(villages=[Village(name=v.name, production=v.resources.get(resource, 0))
+                                            for v in self.instance.villages])
+                TestMinCostFlowBackend.assertFeasible(self, single, solution, forbidden)
+                self.assertEqual(sum(map(len, solution.values())), sum(map(len, solve_instance(single, forbidden).values())))
+            self.assertEqual(solutions["wood"], {"A": {"C": 10}, "B": {}, "C": {"B": 10}})
+        self.assertEqual(solve_resources(self.instance, ["iron"], workers=1), {"iron": {"A": {}, "B": {}, "C": {"A": 5}}})
+        self.assertEqual(solve_resources(Instance(villages=[Village(name="A", production=1)])), {})
+
+    def test_errors_name_the_resource(self):
+        self.instance.get_village("B").resources = {"wood": -10, "iron": 5}
+        with self.assertRaisesRegex(InfeasibleError, r"'A \(iron\)'"):
+            solve_resources(self.instance, forbidden_routes={("B", "A"), ("C", "A")}, backend="mincostflow")
+        self.instance.get_village("C").resources = {"iron": -1}
+        with self.assertRaisesRegex(ValueError, "^Total production of iron is negative"):
+            solve_resources(self.instance)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from game_assistant.app import app
+from game_assistant.models import Instance
+from game_assistant.paste import PasteError, clean_text, parse_instance, parse_paste
+
+PASTE = "Village A\r\n(12|-3)\r\nK45\r\n1204\r\nVillage B\n( 7 | 8 )\nK45\n"
+
+class TestPaste(unittest.TestCase):
+    def test_villages_keep_coordinates(self):
+        instance, errors = parse_paste(PASTE)
+        self.assertEqual(errors, [])
+        self.assertEqual([v.name for v in instance.villages], ["Village A", "Village B"])
+        self.assertEqual([v.coordinates for v in instance.villages], [(12, -3), (7, 8)])
+        self.assertEqual([v.production for v in instance.villages], [0, 0])
+
+    def test_errors_reported_in_bulk(self):
+        text = "A\n(1|2)\n(3|4)\n(bad|x\nB\n(5|6)\n\n(7|8)\nA\n(9|9)"
+        instance, errors = parse_paste(text)
+        self.assertEqual([v.name for v in instance.villages], ["A", "B"])
+        self.assertEqual(errors, [
+            (3, "coordinates without a village name on the line before"),
+            (4, "malformed coordinates '(bad|x'"),
+            (8, "coordinates without a village name on the line before"),
+            (10, "duplicate village 'A' (first on line 1)"),
+        ])
+
+    def test_parse_instance_raises_with_every_error(self):
+        with self.assertRaises(PasteError) as context:
+            parse_instance("(1|2)\nA\n(x|y)")
+        self.assertIsInstance(context.exception, ValueError)
+        self.assertEqual([line for line, _ in context.exception.errors], [1, 3])
+        self.assertIn("2 malformed line(s): line 1:", str(context.exception))
+
+    def test_clean_text(self):
+        self.assertEqual(clean_text("﻿ “A” −\t5… "), '"A" - 5...')
+
+class TestPasteEndpoint(unittest.TestCase):
+    def setUp(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['INSTANCE'] = Instance()
+        self.client = app.test_client()
+
+    def test_partial_paste_loads_and_warns(self):
+        response = self.client.post('/paste', data={'instance_data': PASTE + "\n(1|1)\n"}, follow_redirects=True)
+        self.assertEqual(len(app.config['INSTANCE'].villages), 2)
+        self.assertIn("Skipped 1 malformed line(s): line 9:", response.get_data(as_text=True))
+
+    def test_paste_without_villages_keeps_instance(self):
+        previous = app.config['INSTANCE']
+        response = self.client.post('/paste', data={'instance_data': "nothing here"}, follow_redirects=True)
+        self.assertIs(app.config['INSTANCE'], previous)
+        self.assertIn("no villages found", response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
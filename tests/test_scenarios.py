@@ -0,0 +1,47 @@
+import unittest
+from game_assistant.models import Instance
+from game_assistant.optimal import solve_instance
+from game_assistant.scenarios import solve_scenarios, format_table
+
+def objective(solution):
+    return sum(sum(routes.values()) for routes in solution.values())
+
+class TestScenarios(unittest.TestCase):
+    def setUp(self):
+        self.instance = Instance.load_instance_from_file('instance.json')
+
+    def test_scenarios_match_direct_solves(self):
+        scenarios = [
+            {"name": "more demand", "production_delta": {"05": -50}},
+            {"name": "no 01", "remove": ["01"]},
+            {"forbidden_routes": [["04", "03"], ["01", "03"]]},
+        ]
+        rows = solve_scenarios(self.instance, scenarios, backend="mincostflow", max_workers=2)
+        self.assertEqual([row["scenario"] for row in rows], ["base", "more demand", "no 01", "scenario_3"])
+
+        patched = Instance.from_dict(self.instance.to_dict())
+        patched.update_village("05", -150)
+        self.assertEqual(rows[1]["objective"], objective(solve_instance(patched, backend="mincostflow")))
+
+        patched = Instance.from_dict(self.instance.to_dict())
+        patched.remove_village("01")
+        self.assertEqual(rows[2]["objective"], objective(solve_instance(patched, backend="mincostflow")))
+        self.assertNotIn("01", rows[2]["solution"])
+
+        forbidden = {("04", "03"), ("01", "03")}
+        for source, target in forbidden:
+            self.assertNotIn(target, rows[3]["solution"][source])
+        self.assertEqual(rows[3]["objective"], objective(solve_instance(self.instance, forbidden, backend="mincostflow")))
+
+    def test_failed_scenario_is_reported(self):
+        rows = solve_scenarios(self.instance, [{"name": "broken", "production": {"05": -1000}}], backend="mincostflow", max_workers=1)
+        self.assertEqual(rows[1]["status"], "failed")
+        self.assertIn("negative", rows[1]["error"])
+        self.assertIn("broken", format_table(rows))
+
+    def test_unknown_village(self):
+        rows = solve_scenarios(self.instance, [{"remove": ["nope"]}], backend="mincostflow", max_workers=1)
+        self.assertEqual(rows[1]["error"], "Village 'nope' does not exist.")
+
+if __name__ == '__main__':
+    unittest.main()
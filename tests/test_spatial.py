@@ -0,0 +1,79 @@
+import unittest
+import numpy as np
+from game_assistant.metrics import REGISTRY
+from game_assistant.models import Village, Instance
+from game_assistant.optimal import InfeasibleError, candidate_arcs, solve_instance
+from game_assistant.spatial import SpatialIndex
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.points = rng.integers(-30, 30, size=(60, 2)).astype(float)
+        self.points[::9] = np.nan
+        self.index = SpatialIndex(self.points)
+        self.distance = np.hypot(*(self.points[:, None, :] - self.points[None, :, :]).transpose(2, 0, 1))
+
+    def test_radius_pairs_match_brute_force(self):
+        tail, head = self.index.radius_pairs(7.5)
+        placed = self.index.placed.tolist()
+        expected = {(i, j) for i in placed for j in placed if i != j and self.distance[i, j] <= 7.5}
+        self.assertEqual(set(zip(tail.tolist(), head.tolist())), expected)
+
+    def test_knn_pairs_are_nearest(self):
+        tail, head = self.index.knn_pairs(4)
+        for i in self.index.placed:
+            others = sorted(self.distance[i, j] for j in self.index.placed if j != i)
+            self.assertEqual(sorted(self.distance[i, head[tail == i]]), others[:4])
+        self.assertEqual(len(tail), 4 * len(self.index.placed))
+
+class TestSpatialSolve(unittest.TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        # The only arc between nearest neighbours out of Near is forbidden, so
+        # its neighbour has to be supplied from the far corner of the map.
+        self.instance = Instance(villages=[
+            Village(name="Near", production=5, coordinates=(0, 0)),
+            Village(name="Needy", production=-5, coordinates=(1, 0)),
+            Village(name="Far", production=5, coordinates=(90, 90)),
+            Village(name="FarRelay", production=0, coordinates=(91, 90)),
+            Village(name="Unplaced", production=-2),
+        ])
+        self.forbidden = {("Near", "Needy")}
+
+    def test_candidate_arcs_keep_unplaced_villages_connected(self):
+        tail, head, complete = candidate_arcs(self.instance.names, SpatialIndex(self.instance.coordinates), self.forbidden, 1)
+        arcs = set(zip(tail.tolist(), head.tolist()))
+        self.assertFalse(complete)
+        self.assertNotIn((0, 1), arcs)
+        self.assertNotIn((0, 2), arcs)
+        self.assertTrue(all((i, 4) in arcs and (4, i) in arcs for i in range(4)))
+
+    def test_infeasible_candidates_are_widened(self):
+        for backend in ('pulp', 'mincostflow'):
+            solution = solve_instance(self.instance, self.forbidden, backend=backend, neighbours=1)
+            self.assertEqual(solution["Far"].get("Needy", 0) + solution["FarRelay"].get("Needy", 0), 5, backend)
+            self.assertGreaterEqual(REGISTRY.get("game_assistant_solve_widenings_total", backend=backend), 1)
+
+    def test_infeasible_after_widening_raises(self):
+        with self.assertRaises(InfeasibleError):
+            solve_instance(self.instance, self.forbidden | {("Far", "Needy"), ("FarRelay", "Needy")},
+                           backend='mincostflow', radius=2)
+
+    def test_distance_objective_prefers_close_producers(self):
+        instance = Instance(villages=[
+            Village(name="A", production=4, coordinates=(0, 0)),
+            Village(name="B", production=4, coordinates=(10, 0)),
+            Village(name="C", production=-3, coordinates=(9, 0)),
+            Village(name="D", production=-3, coordinates=(1, 0)),
+        ])
+        for backend in ('pulp', 'mincostflow'):
+            solution = solve_instance(instance, backend=backend, objective='distance')
+            self.assertEqual(solution["A"], {"D": 3}, backend)
+            self.assertEqual(solution["B"], {"C": 3}, backend)
+
+    def test_distance_objective_needs_coordinates(self):
+        with self.assertRaisesRegex(ValueError, "'Unplaced' has none"):
+            solve_instance(self.instance, objective='distance')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+import unittest
+from game_assistant.jobs import JobManager
+from game_assistant.metrics import REGISTRY
+from game_assistant.startup import format_import_profile, import_profile, warm_up
+
+class TestStartup(unittest.TestCase):
+    def test_app_import_does_not_load_solver(self):
+        code = ("import sys, game_assistant.app; "
+                "print(sorted(m for m in ('pulp', 'game_assistant.optimal', 'wtforms') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_import_profile(self):
+        rows = import_profile('game_assistant.models')
+        modules = {row["module"]: row for row in rows}
+        self.assertEqual((modules["game_assistant.models"]["depth"], modules["numpy"]["depth"]), (0, 1))
+        self.assertGreaterEqual(modules["game_assistant.models"]["cumulative"], modules["numpy"]["cumulative"])
+        self.assertIn("all imports", format_import_profile(rows, limit=3))
+        with self.assertRaises(ValueError):
+            import_profile('game_assistant.missing')
+
+    def test_prewarm_records_warm_up(self):
+        jobs = JobManager()
+        seconds = jobs.prewarm(warm_up, 'mincostflow').result()
+        jobs.shutdown()
+        self.assertEqual(REGISTRY.get("game_assistant_solver_warmup_seconds", backend='mincostflow'), seconds)
+        with self.assertRaises(ValueError):
+            warm_up('missing')
+
+    def test_failed_prewarm_is_logged(self):
+        jobs = JobManager()
+        with self.assertLogs('game_assistant.jobs', level='ERROR') as logs:
+            future = jobs.prewarm(warm_up, 'missing')
+            jobs.shutdown()
+        self.assertIsInstance(future.exception(), ValueError)
+        self.assertIn("Prewarm failed: Unknown solver backend 'missing'", logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
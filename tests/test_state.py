@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from game_assistant.app import _STATE_LOCK, app, mutates_state
+from game_assistant.cache import VersionedRoutes
+from game_assistant.models import Instance
+from game_assistant.state import ConflictError, MemoryStore, SQLiteStore, StateStore
+from tests.helpers import sample_instance
+
+class TestSQLiteStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state.db")
+        self.store = SQLiteStore(self.path, history=3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_empty_store(self):
+        self.assertEqual(self.store.version(), 0)
+        version, instance, solution = self.store.load()
+        self.assertEqual((version, instance.villages, solution), (0, [], {}))
+
+    def test_commit_and_load(self):
+        self.assertEqual(self.store.commit(0, sample_instance(), {"A": {"B": 3}}), 1)
+        version, instance, solution = self.store.load()
+        self.assertEqual(version, 1)
+        self.assertEqual(instance.to_dict(), sample_instance().to_dict())
+        self.assertEqual(solution, {"A": {"B": 3}})
+
+    def test_stale_commit_conflicts(self):
+        self.store.commit(0, sample_instance(), {})
+        with self.assertRaises(ConflictError) as context:
+            self.store.commit(0, Instance(), {})
+        self.assertEqual((context.exception.expected, context.exception.actual), (0, 1))
+        self.assertEqual(len(self.store.load()[1].villages), 2)
+
+    def test_history_is_trimmed(self):
+        for version in range(5):
+            self.store.commit(version, sample_instance(), {})
+        self.assertEqual(self.store.load(3)[0], 3)
+        with self.assertRaises(ValueError):
+            self.store.load(2)
+
+    def test_shared_between_connections(self):
+        other = SQLiteStore(self.path)
+        self.store.commit(0, sample_instance(), {})
+        self.assertEqual(other.version(), 1)
+        other.commit(1, Instance(), {})
+        self.assertEqual(self.store.load()[1].villages, [])
+        journal_mode = sqlite3.connect(self.path).execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+
+class TestMemoryStore(unittest.TestCase):
+    def test_commit_and_conflict(self):
+        store = MemoryStore()
+        self.assertEqual(store.commit(0, sample_instance(), {}), 1)
+        with self.assertRaises(ConflictError):
+            store.commit(0, sample_instance(), {})
+        self.assertEqual(store.load()[1].names, ["A", "B"])
+
+class TestAppState(unittest.TestCase):
+    """Other workers are simulated by a second store on the same database."""
+
+    def setUp(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state.db")
+        app.config['STATE_STORE'] = SQLiteStore(self.path)
+        app.config['STATE_VERSION'] = None
+        app.config['INSTANCE'] = sample_instance()
+        app.config['OPTIMAL_ROUTES'] = VersionedRoutes()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['STATE_STORE'] = None
+        app.config.pop('STATE_VERSION', None)
+        self.directory.cleanup()
+
+    def test_seeds_and_commits_changes(self):
+        self.client.get('/api/villages')
+        self.assertEqual(app.config['STATE_STORE'].version(), 1)
+        self.client.post('/add_village', data={"name": "C", "production": 4})
+        version, instance, _ = SQLiteStore(self.path).load()
+        self.assertEqual(version, 2)
+        self.assertEqual(instance.names, ["A", "B", "C"])
+        self.client.get('/api/villages')
+        self.assertEqual(app.config['STATE_STORE'].version(), 2)
+
+    def test_reloads_other_workers_changes(self):
+        self.client.get('/api/villages')
+        other = SQLiteStore(self.path)
+        instance = sample_instance()
+        instance.remove_village("B")
+        other.commit(1, instance, {"A": {"A": 0}})
+        names = [village["name"] for village in self.client.get('/api/villages').get_json()["villages"]]
+        self.assertEqual(names, ["A"])
+        self.assertEqual(dict(app.config['OPTIMAL_ROUTES']), {"A": {"A": 0}})
+
+    def test_conflicting_change_is_rejected(self):
+        other = SQLiteStore(self.path)
+
+        @mutates_state
+        def racing_view():
+            # Another worker commits while this one is handling the request.
+            other.commit(other.version(), Instance(), {})
+            app.config['INSTANCE'].remove_village("B")
+            return "done"
+
+        with app.test_request_context('/'):
+            with self.assertRaises(ConflictError):
+                racing_view()
+        self.assertEqual(other.load()[1].villages, [])
+        self.client.get('/api/villages')
+        self.assertEqual(app.config['INSTANCE'].villages, [])
+
+    def test_solve_does_not_hold_the_state_lock(self):
+        locked = []
+
+        def try_lock():
+            acquired = _STATE_LOCK.acquire(timeout=1)
+            if acquired:
+                _STATE_LOCK.release()
+            locked.append(acquired)
+
+        def solve(instance):
+            # Another request thread must be able to sync meanwhile.
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return {"A": {"B": 3}, "B": {}}
+
+        cache = app.config['SOLUTION_CACHE']
+        with mock.patch.object(cache, 'get', return_value=None), mock.patch('game_assistant.optimal.solve_instance', solve):
+            self.client.get('/solve_instance')
+        self.assertEqual(locked, [True])
+        version, _, solution = SQLiteStore(self.path).load()
+        self.assertEqual((version, solution["A"]), (2, {"B": 3}))
+
+    def test_store_is_abstract(self):
+        with self.assertRaises(TypeError):
+            StateStore()
+
+if __name__ == '__main__':
+    unittest.main()
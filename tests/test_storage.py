@@ -0,0 +1,110 @@
+import io
+import os
+import tempfile
+import unittest
+import warnings
+from game_assistant.generate import generate_instance
+from game_assistant.models import Village, Instance
+from game_assistant.storage import (iter_villages_ndjson, load_instance, read_snapshot, save_instance,
+                                    save_snapshot)
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.instance, _ = generate_instance(50, route_density=0.05, zero_ratio=0.1, seed=3)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def test_round_trip_all_formats(self):
+        for name in ("instance.json", "instance.ndjson", "instance.jsonl", "instance.snap"):
+            save_instance(self.instance, self.path(name))
+            loaded = load_instance(self.path(name))
+            self.assertEqual(loaded.to_dict(), self.instance.to_dict(), name)
+            self.assertEqual(loaded.routes_matrix.tolist(), self.instance.routes_matrix.tolist(), name)
+
+    def test_snapshot_keeps_dangling_routes_and_route_order(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            instance = Instance(villages=[
+                Village(name="Été", production=10, routes={"B": 3, "Gone": 2}),
+                Village(name="B", production=-3, routes={}),
+            ])
+            save_snapshot(instance, self.path("dangling.snap"))
+            loaded = load_instance(self.path("dangling.snap"))
+        self.assertEqual(list(loaded.get_village("Été").routes.items()), [("B", 3), ("Gone", 2)])
+        self.assertEqual(loaded._dangling_routes, {"Gone": {"Été"}})
+        loaded.add_village(Village(name="Gone", production=-2))
+        self.assertEqual(loaded.routes_matrix[0, 2], 2)
+
+    def test_snapshot_villages_are_created_on_first_use(self):
+        save_snapshot(self.instance, self.path("lazy.snap"))
+        loaded = load_instance(self.path("lazy.snap"))
+        self.assertEqual(loaded.names, self.instance.names)
+        self.assertEqual(loaded.routes_matrix.tocsr()[1].tolist(), self.instance.routes_matrix.tocsr()[1].tolist())
+        self.assertIsNotNone(loaded._unloaded)
+        # The views read copies, so overwriting the mapped file does not change them.
+        save_snapshot(Instance(), self.path("lazy.snap"))
+        source, (target, amount) = next((v.name, next(iter(v.route_items()))) for v in self.instance.villages if v._routes)
+        for instance in (loaded, self.instance):
+            instance.update_route(source, target, amount + 1)
+            instance.remove_village(instance.names[-1])
+        self.assertEqual(loaded.to_dict(), self.instance.to_dict())
+        self.assertEqual(loaded.routes_matrix.tolist(), self.instance.routes_matrix.tolist())
+
+    def test_coordinates_round_trip(self):
+        instance = Instance(villages=[Village(name="A", production=1, coordinates=(3, -4)), Village(name="B", production=-1)])
+        for name in ("coords.json", "coords.ndjson", "coords.snap"):
+            save_instance(instance, self.path(name))
+            loaded = load_instance(self.path(name))
+            self.assertEqual([v.coordinates for v in loaded.villages], [(3, -4), None], name)
+
+    def test_resources_round_trip(self):
+        instance, _ = generate_instance(20, seed=4, resources=("wood", "iron"))
+        for name in ("resources.json", "resources.ndjson", "resources.snap"):
+            save_instance(instance, self.path(name))
+            loaded = load_instance(self.path(name))
+            self.assertEqual(loaded.resources, ["wood", "iron"], name)
+            self.assertEqual(loaded.resource_production().tolist(), instance.resource_production().tolist(), name)
+        self.assertEqual(read_snapshot(self.path("resources.snap"))["resources"]["iron"].tolist(),
+                         [village.resources.get("iron", 0) for village in instance.villages])
+
+    def test_read_snapshot_arrays(self):
+        save_snapshot(self.instance, self.path("instance.snap"))
+        data = read_snapshot(self.path("instance.snap"))
+        self.assertEqual(data["names"], [village.name for village in self.instance.villages])
+        self.assertEqual(data["production"].tolist(), [village.production for village in self.instance.villages])
+        self.assertEqual(int(data["route_indptr"][-1]), sum(len(village.routes) for village in self.instance.villages))
+
+    def test_batch_amounts_are_stored_as_integers(self):
+        instance = Instance(villages=[Village(name="A", production=2), Village(name="B", production=-2, routes={"A": 1})])
+        instance.apply_batch([{"op": "add_village", "name": "D", "production": 0, "routes": {"A": 2.0}},
+                              {"op": "update_village", "name": "B", "production": -2, "routes": {"A": 3.0}}])
+        self.assertEqual((instance.get_village("D").routes, instance.get_village("B").routes), ({"A": 2}, {"A": 3}))
+        save_snapshot(instance, self.path("batch.snap"))
+        self.assertEqual(load_instance(self.path("batch.snap")).to_dict(), instance.to_dict())
+
+    def test_snapshot_rejects_non_integer_values(self):
+        instance = Instance(villages=[Village(name="A", production=1, routes={"B": 1.5}), Village(name="B", production=-1)])
+        with self.assertRaises(ValueError):
+            save_snapshot(instance, self.path("float.snap"))
+
+    def test_ndjson_errors_report_line(self):
+        stream = io.StringIO('{"name": "A", "production": 1}\n\n{"name": "B",\n')
+        with self.assertRaisesRegex(ValueError, "Line 3"):
+            list(iter_villages_ndjson(stream))
+
+    def test_not_a_snapshot(self):
+        with open(self.path("other.snap"), 'wb') as file:
+            file.write(b"not a snapshot at all")
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path("other.snap"))
+
+    def test_missing_file_gives_empty_instance(self):
+        self.assertEqual(load_instance(self.path("missing.snap")).villages, [])
+
+if __name__ == '__main__':
+    unittest.main()
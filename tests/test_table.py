@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from game_assistant.table import VillageTable, as_production
+
+class TestVillageTable(unittest.TestCase):
+    def setUp(self):
+        self.table = VillageTable(["A", "B"], np.array([5, -3]))
+
+    def test_append_and_aggregates(self):
+        for i in range(20):
+            self.assertEqual(self.table.append(f"V{i}", i % 3 - 1), i + 2)
+        self.assertEqual(len(self.table), 22)
+        production = self.table.production
+        self.assertEqual(self.table.total(), int(production.sum()))
+        self.assertEqual(self.table.supply() - self.table.demand(), self.table.total())
+
+    def test_remove_and_compact(self):
+        self.table.append("C", 7)
+        self.table.remove(1)
+        self.assertEqual(self.table.total(), 12)
+        self.assertEqual(self.table.alive.tolist(), [True, False, True])
+        self.table.compact()
+        self.assertEqual(self.table.names, ["A", "C"])
+        self.assertEqual(self.table.production.tolist(), [5, 7])
+
+    def test_resource_columns(self):
+        self.table.set_resources(1, {"wood": 4})
+        self.table.append("C", 0, resources={"iron": -2})
+        self.assertEqual(self.table.resource_names, ["wood", "iron"])
+        self.assertEqual(self.table.resource_matrix(["iron", "wood", "clay"]).tolist(), [[0, 0, 0], [0, 4, 0], [-2, 0, 0]])
+        self.table.remove(1)
+        self.table.compact()
+        self.assertEqual((self.table.get_resources(0), self.table.get_resources(1)), ({}, {"iron": -2}))
+
+    def test_append_while_a_view_is_alive(self):
+        production = self.table.production
+        for i in range(40):
+            self.table.append(f"V{i}", 1)
+        self.assertEqual(production.tolist(), [5, -3])
+        self.assertEqual((len(self.table.production), self.table.total()), (42, 42))
+        self.assertEqual(self.table.get_production(41), 1)
+
+    def test_empty(self):
+        table = VillageTable()
+        self.assertEqual((len(table), table.total(), table.supply(), table.demand()), (0, 0, 0, 0))
+
+    def test_as_production(self):
+        self.assertEqual(as_production(np.int64(4)), 4)
+        self.assertEqual(as_production(-2.0), -2)
+        for value in (1.5, "3", True, None):
+            with self.assertRaises(ValueError):
+                as_production(value)
+
+if __name__ == '__main__':
+    unittest.main()